@@ -0,0 +1,75 @@
+"""Compare write time and file count of the zarr chunk layouts.
+
+Converts a synthetic MetaXpress export (or an existing one passed with
+`--image-dir`) once per chunk layout and reports the wall time of the
+conversion, of deleting the plate and the number of files written.
+
+    python benchmarks/benchmark_chunk_layout.py --wells 4 --n-z 20
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import write_metaxpress_plate
+
+WELL_NAMES = [f"{row}{col:02d}" for row in "BCDEFG" for col in range(2, 12)]
+
+
+def count_files(path: Path) -> int:
+    """Number of files below `path`."""
+    return sum(len(files) for _, _, files in os.walk(path))
+
+
+def main():
+    """Convert the plate once per chunk layout and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image-dir", help="Existing MetaXpress export to convert.")
+    parser.add_argument("--mode", default="MetaXpress MD Stack Acquisition")
+    parser.add_argument("--wells", type=int, default=2)
+    parser.add_argument("--grid", type=int, default=3, help="Fields per well side.")
+    parser.add_argument("--n-channels", type=int, default=2)
+    parser.add_argument("--n-z", type=int, default=10)
+    parser.add_argument("--tile-size", type=int, default=512)
+    parser.add_argument(
+        "--layouts", nargs="+", default=["Default", "FOV", "Well"], metavar="LAYOUT"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_dir = args.image_dir
+        if image_dir is None:
+            image_dir = write_metaxpress_plate(
+                Path(tmp_dir, "images"),
+                wells=tuple(WELL_NAMES[: args.wells]),
+                grid_shape=(args.grid, args.grid),
+                n_channels=args.n_channels,
+                n_z=args.n_z,
+                tile_shape=(args.tile_size, args.tile_size),
+            )
+
+        print(f"{'layout':<10}{'write [s]':>12}{'delete [s]':>12}{'files':>10}")
+        for layout in args.layouts:
+            zarr_dir = Path(tmp_dir, f"zarr-{layout}")
+            zarr_dir.mkdir()
+            start = time.perf_counter()
+            convert_ome_zarr(
+                zarr_urls=[],
+                zarr_dir=str(zarr_dir),
+                image_dir=str(image_dir),
+                mode=args.mode,
+                chunk_layout=layout,
+            )
+            write_time = time.perf_counter() - start
+            n_files = count_files(zarr_dir)
+            start = time.perf_counter()
+            shutil.rmtree(zarr_dir)
+            delete_time = time.perf_counter() - start
+            print(f"{layout:<10}{write_time:>12.2f}{delete_time:>12.2f}{n_files:>10}")
+
+
+if __name__ == "__main__":
+    main()
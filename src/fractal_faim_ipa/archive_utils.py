@@ -0,0 +1,215 @@
+"""Access files inside uncompressed tar and zip archives without extracting.
+
+Files in an archive are addressed by virtual paths, i.e. the path of the
+archive followed by the name of the member, e.g.
+`/data/run.tar/TimePoint_1/ZStep_1/plate_C03_s1_w1.TIF`.
+
+The offsets of all members are indexed once per archive and process. Members
+that are stored without compression are then read directly from their
+offset in the archive, compressed zip members are decompressed into memory.
+"""
+import io
+import os
+import re
+import struct
+import tarfile
+import zipfile
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import PurePosixPath
+from typing import NamedTuple, Optional, Union
+
+import tifffile
+
+ARCHIVE_SUFFIXES = (".tar", ".zip")
+
+# Archive suffixes are matched regardless of case, like in `is_archive`
+_ARCHIVE_PATH_RE = re.compile(
+    r"(?P<archive>.+?(?:{}))[\/\\](?P<member>.+)".format(
+        "|".join(re.escape(suffix) for suffix in ARCHIVE_SUFFIXES)
+    ),
+    re.IGNORECASE,
+)
+
+# Size of the fixed part of a zip local file header
+_ZIP_LOCAL_HEADER_SIZE = 30
+
+
+class ArchiveMember(NamedTuple):
+    """Location of a file within an archive."""
+
+    offset: int
+    size: int
+    stored: bool
+
+
+def is_archive(path: str) -> bool:
+    """Whether `path` points to a supported archive."""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def split_archive_path(path: str) -> Optional[tuple[str, str]]:
+    """Split a virtual path into the archive path and the member name.
+
+    Returns:
+        Tuple of archive path and member name or None if `path` does not
+        point into an archive.
+    """
+    match = _ARCHIVE_PATH_RE.fullmatch(str(path))
+    if match is None:
+        return None
+    return match["archive"], match["member"].replace("\\", "/")
+
+
+@lru_cache(maxsize=None)
+def get_index(archive_path: str) -> dict[str, ArchiveMember]:
+    """Offsets and sizes of all files in an archive, keyed by member name."""
+    if str(archive_path).lower().endswith(".zip"):
+        return _index_zip(archive_path)
+    return _index_tar(archive_path)
+
+
+def _index_tar(archive_path: str) -> dict[str, ArchiveMember]:
+    index = {}
+    with tarfile.open(archive_path, mode="r:") as tar:
+        for member in tar:
+            if member.isfile():
+                index[_normalize_member_name(member.name)] = ArchiveMember(
+                    offset=member.offset_data, size=member.size, stored=True
+                )
+    return index
+
+
+def _index_zip(archive_path: str) -> dict[str, ArchiveMember]:
+    index = {}
+    with zipfile.ZipFile(archive_path) as archive, open(archive_path, "rb") as fh:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            # The data follows the local header, whose variable length fields
+            # can differ from the ones in the central directory. Their lengths
+            # are stored in the last 4 bytes of the fixed part of the header.
+            fh.seek(info.header_offset + _ZIP_LOCAL_HEADER_SIZE - 4)
+            name_length, extra_length = struct.unpack("<HH", fh.read(4))
+            index[_normalize_member_name(info.filename)] = ArchiveMember(
+                offset=info.header_offset
+                + _ZIP_LOCAL_HEADER_SIZE
+                + name_length
+                + extra_length,
+                size=info.compress_size,
+                stored=info.compress_type == zipfile.ZIP_STORED,
+            )
+    return index
+
+
+def _normalize_member_name(name: str) -> str:
+    return str(PurePosixPath(name)).lstrip("/")
+
+
+def walk(archive_path: str):
+    """Equivalent of `os.walk` over the files in an archive.
+
+    Yields:
+        Tuples of virtual directory path, an empty list of sub-directories
+        and the filenames in that directory.
+    """
+    directories = defaultdict(list)
+    for member in get_index(archive_path):
+        parent = PurePosixPath(member).parent
+        directories[str(parent)].append(PurePosixPath(member).name)
+    for directory, filenames in sorted(directories.items()):
+        root = archive_path if directory == "." else f"{archive_path}/{directory}"
+        yield root, [], filenames
+
+
+@contextmanager
+def open_file(path: str) -> Iterator[Union[str, tifffile.FileHandle, io.BytesIO]]:
+    """Open `path` as a source that tifffile can read from.
+
+    Regular paths are passed through as is. Stored archive members are
+    opened as `tifffile.FileHandle` restricted to the member, compressed zip
+    members as in-memory buffer.
+    """
+    split = split_archive_path(path)
+    if split is None:
+        yield path
+        return
+    archive_path, member_name = split
+    try:
+        member = get_index(archive_path)[member_name]
+    except KeyError as e:
+        raise FileNotFoundError(f"{member_name} not found in {archive_path}.") from e
+    if member.stored:
+        with tifffile.FileHandle(
+            archive_path, offset=member.offset, size=member.size, name=member_name
+        ) as fh:
+            yield fh
+    else:
+        with zipfile.ZipFile(archive_path) as archive:
+            buffer = io.BytesIO(archive.read(member_name))
+        with buffer:
+            yield buffer
+
+
+def listdir(path: str) -> tuple[list[str], list[str]]:
+    """Names of the sub-directories and files of a directory in an archive.
+
+    Args:
+        path: Path of an archive or virtual path of a directory within it.
+    """
+    if is_archive(path):
+        archive_path, directory = str(path), ""
+    else:
+        archive_path, directory = split_archive_path(path)
+    prefix = f"{directory.strip('/')}/" if directory.strip("/") else ""
+    dirnames = set()
+    filenames = []
+    for member in get_index(archive_path):
+        if not member.startswith(prefix):
+            continue
+        name, *rest = member[len(prefix) :].split("/", 1)
+        if rest:
+            dirnames.add(name)
+        else:
+            filenames.append(name)
+    return sorted(dirnames), filenames
+
+
+def get_size(path: str) -> int:
+    """Size of a file in bytes, compressed size for compressed zip members."""
+    split = split_archive_path(path)
+    if split is None:
+        return os.path.getsize(path)
+    archive_path, member_name = split
+    return get_index(archive_path)[member_name].size
+
+
+def get_location(path: str) -> Optional[tuple[str, int]]:
+    """Path of the file on disk and offset at which the content of `path` starts.
+
+    Returns:
+        Tuple of file path and offset or None for compressed zip members,
+        whose content is not stored as is.
+    """
+    split = split_archive_path(path)
+    if split is None:
+        return str(path), 0
+    archive_path, member_name = split
+    member = get_index(archive_path)[member_name]
+    if not member.stored:
+        return None
+    return archive_path, member.offset
+
+
+def read_bytes(path: str) -> bytes:
+    """Read the content of a file, also from within an archive."""
+    with open_file(path) as source:
+        if isinstance(source, str):
+            with open(source, "rb") as fh:
+                return fh.read()
+        if isinstance(source, io.BytesIO):
+            return source.getvalue()
+        source.seek(0)
+        return source.read(source.size)
@@ -0,0 +1,80 @@
+"""Detect blank tiles while they are read.
+
+Sparse acquisitions contain tiles without signal, e.g. of missing sites or
+dark channels. Tiles whose maximum intensity is below the threshold set with
+`configure` are replaced by zeros, the fill value of the converted arrays.
+The converter does not write chunks that only contain the fill value, so
+regions covered by blank tiles take neither write time nor storage. Where a
+blank tile overlaps other tiles, only the other tiles are fused, see
+`translate_tiles_2d`.
+
+The threshold and the blank tiles found are per process. `configure` has to
+be called in every worker process, e.g. with `distributed.Client.run`.
+"""
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+from faim_ipa.stitching import stitching_utils
+from numpy.typing import NDArray
+
+logger = logging.getLogger(__name__)
+
+_threshold: Optional[float] = None
+_lock = threading.Lock()
+_blank_paths: set[str] = set()
+
+
+def configure(threshold: Optional[float]):
+    """Set the intensity threshold of blank tiles of this process.
+
+    None disables the detection.
+    """
+    global _threshold
+    _threshold = threshold
+
+
+def get_threshold() -> Optional[float]:
+    """Intensity threshold of blank tiles of this process."""
+    return _threshold
+
+
+def is_blank(path: str, data: NDArray) -> bool:
+    """Whether the data of the tile at `path` is blank, collecting it if so."""
+    threshold = _threshold
+    if threshold is None or data.size == 0 or data.max() >= threshold:
+        return False
+    with _lock:
+        _blank_paths.add(str(path))
+    return True
+
+
+def pop_blank_tiles() -> list[str]:
+    """Paths of the blank tiles of this process since the last call."""
+    with _lock:
+        paths = sorted(_blank_paths)
+        _blank_paths.clear()
+    return paths
+
+
+def translate_tiles_2d(
+    block_info, chunk_shape, tiles, *, build_acquisition_mask: bool = False
+):
+    """`stitching_utils.translate_tiles_2d` that masks out blank tiles.
+
+    The distance masks of blank tiles are cleared, such that their zeros are
+    not averaged into the pixels they share with other tiles.
+    """
+    warped_tiles, warped_distance_masks = stitching_utils.translate_tiles_2d(
+        block_info,
+        chunk_shape,
+        tiles,
+        build_acquisition_mask=build_acquisition_mask,
+    )
+    if _threshold is None or build_acquisition_mask:
+        return warped_tiles, warped_distance_masks
+    with _lock:
+        blank = [str(tile.path) in _blank_paths for tile in tiles]
+    warped_distance_masks[np.array(blank, dtype=bool)] = 0
+    return warped_tiles, warped_distance_masks
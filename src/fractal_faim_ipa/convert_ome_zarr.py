@@ -1,18 +1,27 @@
 # OME-Zarr creation from MD Image Express
+import json
 import logging
-import shutil
-from os.path import exists, join
-from typing import Any, Literal
-
-import distributed
-from faim_ipa.hcs.acquisition import TileAlignmentOptions
-from faim_ipa.hcs.converter import ConvertToNGFFPlate, NGFFPlate, PlateLayout
-from faim_ipa.stitching import stitching_utils
-from fractal_tasks_core.tables import write_table
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Literal, Optional
+
 from pydantic import validate_call
 
-from fractal_faim_ipa.md_converter_utils import ModeEnum
-from fractal_faim_ipa.roi_tables import create_ROI_tables
+from fractal_faim_ipa.input_models import ReadPolicy
+from fractal_faim_ipa.md_converter_utils import (
+    ChunkLayoutEnum,
+    ModeEnum,
+    detect_mode,
+)
+
+# The converter dependencies are imported where they are used, such that
+# importing the task for its signature (e.g. to build the manifest) is fast
+if TYPE_CHECKING:
+    import distributed
+    from faim_ipa.hcs.converter import PlateLayout
+
+    from fractal_faim_ipa.converter import ConvertToNGFFPlate
+    from fractal_faim_ipa.progress import ProgressReporter
+    from fractal_faim_ipa.resources import ResourceMonitor
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +44,8 @@ def convert_ome_zarr(
         "MetaXpress MD Single Plane Acquisition",
         "MetaXpress MD Single Plane Acquisition as 3D",
         "MetaXpress MD Mixed Acquisition",
+        "MetaXpress MD Stack and Projection Acquisition",
+        "auto",
     ],
     zarr_name: str = "Plate",
     tile_alignment: Literal["StageAlignment", "GridAlignment"] = "GridAlignment",
@@ -45,6 +56,23 @@ def convert_ome_zarr(
     overwrite: bool = False,
     binning: int = 1,
     parallelize: bool = True,
+    append_timepoints: bool = False,
+    append_acquisition: bool = False,
+    fov_images: bool = False,
+    chunk_layout: Literal["Default", "FOV", "Well"] = "Default",
+    metadata_executor: Literal["threads", "processes"] = "threads",
+    compute_histograms: bool = False,
+    write_mip: bool = False,
+    dry_run: bool = False,
+    prefetch_mb: int = 0,
+    background_correction_matrices: Optional[dict[str, str]] = None,
+    illumination_correction_matrices: Optional[dict[str, str]] = None,
+    progress_interval: int = 60,
+    progress_file: Optional[str] = None,
+    read_policy: Optional[ReadPolicy] = None,
+    blank_tile_threshold: Optional[float] = None,
+    sample_resources: bool = False,
+    trace_python_heap: bool = False,
 ) -> dict[str, Any]:
     """
     Create OME-Zarr plate from MD Image Xpress files.
@@ -57,13 +85,21 @@ def convert_ome_zarr(
             be processed. Not used by the converter task.
             (standard argument for Fractal tasks, managed by Fractal server).
         zarr_dir: path of the directory where the new OME-Zarrs will be
-            created.
+            created. Can also be an fsspec URL, e.g. `s3://bucket/prefix`.
             (standard argument for Fractal tasks, managed by Fractal server).
         image_dir: Path to the folder containing the images to be converted.
+            In MetaXpress modes, this can also be an uncompressed tar or zip
+            archive of that folder, which is read without extracting it.
         zarr_name: Name of the zarr plate file that will be created
         mode: Choose conversion mode. MetaXpress modes are used when data is
             exported via MetaXpress. Choose whether you have 3D data
             (StackAcquisition), 2D data (Single Plane Acquisition) or mixed.
+            "MetaXpress MD Stack and Projection Acquisition" converts the
+            stacks and additionally the projections exported by MetaXpress
+            as second image (the next well sub group, e.g. "1") from the same
+            scan.
+            "auto" detects the mode from the layout of the files and a few
+            TIFF headers, without scanning the whole acquisition.
         tile_alignment: Choose whether tiles are placed into the OME-Zarr as a
             grid or whether they are placed based on the position of field of
             views in the metadata (using fusion for shared areas).
@@ -73,47 +109,365 @@ def convert_ome_zarr(
         barcode: Barcode of the plate
         overwrite: Whether to overwrite the zarr file if it already exists
         binning: Binning factor to downsample the original image. If set to 2,
-            an image that is 2x2 downsampled in xy will be produced.
+            an image that is 2x2 downsampled in xy will be produced. In
+            MetaXpress modes, the tiles are binned when they are read.
         parallelize: The automatic distribute.Client option often fails to
             finish when running the task locally. Set parallelize to false to
             avoid that.
+        append_timepoints: Only convert the time points that are not yet part
+            of an existing plate and append them along the time axis (only
+            implemented in MetaXpress modes). The time axis is kept even if
+            there is a single time point, so also use this option for the
+            first conversion of a time-lapse experiment.
+        append_acquisition: Add the acquisition to an existing plate as the
+            next well sub group ("1", "2", ...), e.g. a further cycle of a
+            multiplexing experiment. Only the new images and their ROI
+            tables are written and the well metadata is extended, the
+            existing images are not touched. Creates the plate with well
+            sub group "0" if it does not exist yet. The index of the sub
+            group is recorded as "acquisition" in the well images, the
+            "acquisitions" of the plate and the image list attributes.
+        fov_images: Write each field of view as its own image (well sub
+            groups "0", "1", ...) instead of stitching the fields into one
+            image per well. The fields are neither warped nor fused, which
+            is the fastest conversion for workflows that process each field
+            separately. Each image gets a FOV_ROI_table with a single ROI
+            and the "fov" attribute (e.g. "FOV_1") in the image list.
+        chunk_layout: Layout of the zarr chunks. "Default" writes 2048x2048
+            chunks per z-plane, "FOV" writes one chunk per field of view with
+            up to 8 of its z-planes and "Well" one chunk per z-plane of a
+            well. Larger chunks result in fewer files, which makes writing,
+            copying and deleting plates faster on network and parallel file
+            systems, but each chunk is held in memory while it is written and
+            is read in full, also to access a single plane.
+        metadata_executor: Parse the tile positions from the TIFF metadata
+            with "threads" or "processes" (MetaXpress modes). Parsing is
+            CPU-bound, processes use all CPUs of the task for plates with
+            many files, threads are faster for small plates and on storage
+            with a high read latency.
+        compute_histograms: Collect per-channel intensity histograms while
+            converting. The OMERO display windows are set to the 0.1 and 99.9
+            percentiles of the plate intensities and the histograms of each
+            image are saved as "intensity_histogram" table. When appending
+            time points, histograms are only collected for new wells.
+        write_mip: Also write the maximum intensity projections of 3D
+            acquisitions to a separate plate "{zarr_name}_mip.zarr", computed
+            from the z-planes while they are converted.
+        dry_run: Only parse the metadata and read a few sample tiles to plan
+            the conversion, without creating the plate. The number of wells,
+            files, tiles, channels, z-planes and time points, the output
+            shapes, the estimated output size and peak memory per well and
+            the suggested `cpus_per_task` and `mem` are logged and written to
+            "{zarr_name}_plan.json" in `zarr_dir`. Parsing the metadata takes
+            as long as for the conversion.
+        prefetch_mb: Memory in MB used to read tiles ahead of the stitching,
+            which hides the read latency of network storage. Only used in
+            MetaXpress modes with parallelize set to false. 0 disables
+            prefetching.
+        background_correction_matrices: Paths of the background images
+            that are subtracted from the tiles, keyed by channel (e.g.
+            `{"w1": "/path/to/background_w1.tif"}`). Channels without a
+            matrix are not corrected. Only implemented in MetaXpress modes.
+        illumination_correction_matrices: Paths of the flat-field images
+            the tiles are divided by after the background subtraction, keyed
+            by channel like `background_correction_matrices`. Each matrix is
+            read once per worker. Only implemented in MetaXpress modes.
+        progress_interval: Seconds between the progress events of the
+            conversion (wells done, tiles/s, MB/s read and written and the
+            estimated remaining time). 0 only reports when a phase finishes.
+        progress_file: Path of a JSON-lines file the progress events are
+            appended to, in addition to the task log.
+        read_policy: Timeout, retries and duplicate reads of slow or hung
+            reads of the source files (MetaXpress modes), such that a few
+            slow files on network storage do not stall the whole plate. The
+            slowest reads are listed in the log after the conversion. None
+            uses the defaults of `ReadPolicy`.
+        blank_tile_threshold: Tiles whose maximum intensity is below this
+            value are treated as blank, e.g. of missing sites or dark
+            channels (MetaXpress modes). They are converted as zeros, such
+            that their chunks are not written, and fields of view without
+            any signal are listed in the "skipped_fovs" attribute of their
+            image. Chunks that only contain zeros are never written.
+        sample_resources: Sample the peak memory, open files and CPU
+            utilisation of the task process and of each Dask worker per
+            phase of the conversion. The summary is logged and written to
+            "{zarr_name}_resources.json" in `zarr_dir`, to choose the memory
+            and CPUs requested for the task.
+        trace_python_heap: Also trace the peak memory allocated by Python
+            with tracemalloc when sampling the resources, which slows the
+            conversion down.
 
     Returns:
         Metadata dictionary
     """
-    mode = ModeEnum(mode)
+    from faim_ipa.hcs.acquisition import TileAlignmentOptions
+    from faim_ipa.hcs.converter import PlateLayout
+
+    from fractal_faim_ipa import reads, resources, storage_utils
+    from fractal_faim_ipa.progress import ProgressReporter
+
+    mode = resolve_mode(mode, image_dir)
     layout = PlateLayout(layout)
     tile_alignment = TileAlignmentOptions(tile_alignment)
+    chunk_layout = ChunkLayoutEnum(chunk_layout)
     zarr_dir = zarr_dir.rstrip("/")
-
-    # TO REVIEW: Overwrite checks are not exposed in faim-hcs API
-    # Unclear how faim-hcs handles rerunning the plate creation
-    # (the Zarr file gets a newer timestamp at least)
-    # This block triggers a reset
-    if overwrite and exists(join(zarr_dir, zarr_name + ".zarr")):
-        # Remove zarr if it already exists.
-        shutil.rmtree(join(zarr_dir, zarr_name + ".zarr"))
+    validate_options(
+        mode,
+        append_timepoints=append_timepoints,
+        overwrite=overwrite,
+        write_mip=write_mip,
+        correction_matrices=bool(
+            background_correction_matrices or illumination_correction_matrices
+        ),
+        append_acquisition=append_acquisition,
+        fov_images=fov_images,
+        blank_tile_threshold=blank_tile_threshold,
+    )
 
     # Query handling (only implemented in MetaXpress modes)
     if query == "":
         query = None
 
-    plate_acquisition = mode.get_plate_acquisition(
-        acquisition_dir=image_dir,
-        alignment=tile_alignment,
-        query=query,
+    if read_policy is None:
+        read_policy = ReadPolicy()
+    reads.configure(read_policy)
+    with resources.monitoring(sample_resources, trace_python_heap) as monitor:
+        progress = ProgressReporter(interval=progress_interval, path=progress_file)
+        # MetaXpress tiles are binned when they are read, such that stitching
+        # and fusion work on the binned tiles. Other modes bin after stitching.
+        tile_binning = mode.tile_binning(binning)
+        with progress.phase("parse", plate=zarr_name):
+            plate_acquisition = mode.get_plate_acquisition(
+                acquisition_dir=image_dir,
+                alignment=tile_alignment,
+                query=query,
+                keep_time_axis=append_timepoints,
+                yx_binning=tile_binning,
+                metadata_executor=metadata_executor,
+                background_correction_matrices=background_correction_matrices,
+                illumination_correction_matrices=illumination_correction_matrices,
+            )
+            binning //= tile_binning
+            chunks, output_chunks = chunk_layout.get_chunks(
+                plate_acquisition, yx_binning=binning
+            )
+
+        if dry_run:
+            from fractal_faim_ipa import planning
+
+            plan = planning.create_plan(
+                plate_acquisition,
+                chunks=chunks,
+                output_chunks=output_chunks,
+                yx_binning=binning,
+                write_mip=write_mip,
+            )
+            if mode == ModeEnum.MetaXpressStackAndProjectionAcquisition:
+                projection_acquisition = plate_acquisition.get_projection_acquisition()
+                if projection_acquisition is not None:
+                    plan["projections"] = planning.create_plan(
+                        projection_acquisition,
+                        chunks=chunks,
+                        output_chunks=output_chunks,
+                        yx_binning=binning,
+                    )
+            plan_path = storage_utils.join(zarr_dir, f"{zarr_name}_plan.json")
+            storage_utils.write_text(plan_path, json.dumps(plan, indent=2))
+            logger.info(f"Conversion plan for {image_dir}: {json.dumps(plan)}")
+            logger.info(f"Conversion plan written to {plan_path}.")
+            write_resource_summary(
+                monitor, storage_utils.join(zarr_dir, f"{zarr_name}_resources.json")
+            )
+            return {"image_list_updates": []}
+
+        client = create_client(parallelize)
+        image_list_updates = convert_plate(
+            client=client,
+            plate_acquisition=plate_acquisition,
+            mode=mode,
+            zarr_dir=zarr_dir,
+            zarr_name=zarr_name,
+            image_dir=image_dir,
+            layout=layout,
+            order_name=order_name,
+            barcode=barcode,
+            overwrite=overwrite,
+            binning=binning,
+            append_timepoints=append_timepoints,
+            chunks=chunks,
+            output_chunks=output_chunks,
+            compute_histograms=compute_histograms,
+            write_mip=write_mip,
+            prefetch_mb=prefetch_mb,
+            progress=progress,
+            read_policy=read_policy,
+            append_acquisition=append_acquisition,
+            fov_images=fov_images,
+            blank_tile_threshold=blank_tile_threshold,
+        )
+        write_resource_summary(
+            monitor, storage_utils.join(zarr_dir, f"{zarr_name}_resources.json")
+        )
+        return {"image_list_updates": image_list_updates}
+
+
+def write_resource_summary(monitor: Optional["ResourceMonitor"], path: str):
+    """Log the resources of a conversion and write them to `path` as JSON."""
+    from fractal_faim_ipa import storage_utils
+    from fractal_faim_ipa.resources import format_summary
+
+    if monitor is None:
+        return
+    summary = monitor.summary()
+    logger.info(f"Resources of the conversion:\n{format_summary(summary)}")
+    storage_utils.write_text(path, json.dumps(summary, indent=2))
+    logger.info(f"Resources of the conversion written to {path}.")
+
+
+def resolve_mode(mode: str, image_dir: str) -> ModeEnum:
+    """Parse the conversion mode, detecting it from the files if "auto"."""
+    if mode == "auto":
+        mode = detect_mode(image_dir)
+        logger.info(f"Detected mode {mode.value!r} for {image_dir}.")
+    return ModeEnum(mode)
+
+
+def validate_options(
+    mode: ModeEnum,
+    *,
+    append_timepoints: bool,
+    overwrite: bool,
+    write_mip: bool,
+    correction_matrices: bool = False,
+    append_acquisition: bool = False,
+    fov_images: bool = False,
+    blank_tile_threshold: Optional[float] = None,
+):
+    """Raise a ValueError for options that can't be combined with each other."""
+    _validate_append_options(
+        mode,
+        append_timepoints=append_timepoints,
+        append_acquisition=append_acquisition,
+        overwrite=overwrite,
+        write_mip=write_mip,
+        fov_images=fov_images,
     )
+    if write_mip and not mode.is_3D:
+        raise ValueError("Projections can only be written for 3D acquisitions")
+    if correction_matrices and not mode.is_metaxpress:
+        raise ValueError("Correction matrices are only supported in MetaXpress modes")
+    if fov_images and mode == ModeEnum.MetaXpressStackAndProjectionAcquisition:
+        raise ValueError("Projections can't be converted to field images")
+    if blank_tile_threshold is not None and not mode.is_metaxpress:
+        raise ValueError("Blank tiles are only detected in MetaXpress modes")
+
+
+def _validate_append_options(
+    mode: ModeEnum,
+    *,
+    append_timepoints: bool,
+    append_acquisition: bool,
+    overwrite: bool,
+    write_mip: bool,
+    fov_images: bool,
+):
+    """Raise a ValueError for options that can't be combined with appending."""
+    if append_timepoints and not mode.is_metaxpress:
+        raise ValueError("Appending time points is only supported in MetaXpress modes")
+    if append_timepoints and overwrite:
+        raise ValueError("Time points can't be appended when overwriting the plate")
+    if write_mip and append_timepoints:
+        raise ValueError("Projections can't be written when appending time points")
+    if append_acquisition and append_timepoints:
+        raise ValueError("Time points can't be appended to a new acquisition")
+    if append_acquisition and overwrite:
+        raise ValueError("Acquisitions can't be appended when overwriting the plate")
+    if fov_images and append_timepoints:
+        raise ValueError("Time points can't be appended to field images")
+    if fov_images and append_acquisition:
+        raise ValueError("Acquisitions can't be appended to field images")
+
+
+def create_client(parallelize: bool) -> "distributed.Client":
+    """Dask client used to convert the plates."""
+    import distributed
 
     # The automatic distribute.Client option often fails to finish when
     # running the task locally. Set parallelize to false to avoid that.
     if parallelize:
-        client = distributed.Client()
-    else:
-        client = distributed.Client(
-            n_workers=1,
-            threads_per_worker=1,
-            processes=False,
-        )
+        return distributed.Client()
+    return distributed.Client(
+        n_workers=1,
+        threads_per_worker=1,
+        processes=False,
+    )
+
+
+def convert_plate(
+    *,
+    client: "distributed.Client",
+    plate_acquisition,
+    mode: ModeEnum,
+    zarr_dir: str,
+    zarr_name: str,
+    image_dir: str,
+    layout: "PlateLayout",
+    order_name: str,
+    barcode: str,
+    overwrite: bool,
+    binning: int,
+    append_timepoints: bool,
+    chunks,
+    output_chunks,
+    compute_histograms: bool,
+    write_mip: bool,
+    prefetch_mb: int = 0,
+    progress: Optional["ProgressReporter"] = None,
+    read_policy: Optional[ReadPolicy] = None,
+    append_acquisition: bool = False,
+    fov_images: bool = False,
+    blank_tile_threshold: Optional[float] = None,
+) -> list[dict[str, Any]]:
+    """Convert a parsed plate acquisition and write its ROI tables.
+
+    The `read_policy` is applied in all workers of the client, and the slow
+    reads of the plate are logged at the end. With `append_acquisition`, the
+    acquisition is written to the next free well sub group of an existing
+    plate. With `fov_images`, each field of view is written as its own image
+    with a FOV_ROI_table of a single ROI. Tiles below `blank_tile_threshold`
+    are converted as zeros and the fields of view without signal are
+    recorded, see `fractal_faim_ipa.blank_tiles`.
+
+    Returns:
+        The image list updates of the converted images.
+    """
+    from faim_ipa.hcs.converter import NGFFPlate
+    from faim_ipa.stitching import stitching_utils
+
+    from fractal_faim_ipa import blank_tiles, reads, storage_utils
+    from fractal_faim_ipa.converter import ConvertToNGFFPlate
+    from fractal_faim_ipa.progress import ProgressReporter
+
+    if progress is None:
+        progress = ProgressReporter()
+    if read_policy is not None:
+        client.run(reads.configure, read_policy)
+    # Reset by every conversion, such that no threshold of a previous plate
+    # is left in the workers
+    blank_tiles.configure(blank_tile_threshold)
+    client.run(blank_tiles.configure, blank_tile_threshold)
+    mip_zarr_name = zarr_name + "_mip"
+
+    # TO REVIEW: Overwrite checks are not exposed in faim-hcs API
+    # Unclear how faim-hcs handles rerunning the plate creation
+    # (the Zarr file gets a newer timestamp at least)
+    # This block triggers a reset
+    if overwrite:
+        for name in [zarr_name, mip_zarr_name] if write_mip else [zarr_name]:
+            plate_path = storage_utils.join(zarr_dir, name + ".zarr")
+            if storage_utils.exists(plate_path):
+                # Remove zarr if it already exists.
+                storage_utils.remove(plate_path)
 
     converter = ConvertToNGFFPlate(
         ngff_plate=NGFFPlate(
@@ -124,71 +478,380 @@ def convert_ome_zarr(
             barcode=barcode,
         ),
         yx_binning=binning,
-        warp_func=stitching_utils.translate_tiles_2d,
+        warp_func=blank_tiles.translate_tiles_2d,
         fuse_func=stitching_utils.fuse_mean,
         client=client,
     )
+    well_acquisitions = plate_acquisition.get_well_acquisitions(selection=None)
+    plate, mip_plate, well_sub_group = _create_plates(
+        converter,
+        plate_acquisition,
+        zarr_dir=zarr_dir,
+        zarr_name=zarr_name,
+        image_dir=image_dir,
+        write_mip=write_mip,
+        append_acquisition=append_acquisition,
+    )
+    # Appended acquisitions are told apart by the index of their sub group
+    acquisition = int(well_sub_group) if append_acquisition else None
 
-    plate = converter.create_zarr_plate(plate_acquisition)
+    # Run conversion.
+    with progress.phase("convert", plate=zarr_name, n_wells=len(well_acquisitions)):
+        converter.run(
+            plate=plate,
+            plate_acquisition=plate_acquisition,
+            well_sub_group=well_sub_group,
+            append_timepoints=append_timepoints,
+            chunks=chunks,
+            output_chunks=output_chunks,
+            compute_histograms=compute_histograms,
+            mip_plate=mip_plate,
+            prefetch_bytes=prefetch_mb * 1_000_000,
+            progress=progress,
+            fov_images=fov_images,
+            acquisition=acquisition,
+            # max_layer=2, # check whether that should be exposed
+        )
+
+    # Write ROI tables to the images (tables of appended wells are replaced)
+    with progress.phase("tables", plate=zarr_name, n_wells=len(well_acquisitions)):
+        image_list_updates = _write_roi_tables(
+            plate=plate,
+            mip_plate=mip_plate,
+            plate_acquisition=plate_acquisition,
+            zarr_dir=zarr_dir,
+            zarr_name=zarr_name,
+            well_sub_group=well_sub_group,
+            fov_images=fov_images,
+            overwrite=overwrite or append_timepoints,
+            is_3D=mode.is_3D,
+            acquisition=acquisition,
+            progress=progress,
+        )
+
+    # The projections exported by MetaXpress become the next image per well
+    if mode == ModeEnum.MetaXpressStackAndProjectionAcquisition:
+        image_list_updates.extend(
+            _convert_projections(
+                converter=converter,
+                plate=plate,
+                plate_acquisition=plate_acquisition,
+                image_dir=image_dir,
+                zarr_url=f"{zarr_dir}/{zarr_name}.zarr",
+                chunks=chunks,
+                output_chunks=output_chunks,
+                append_timepoints=append_timepoints,
+                compute_histograms=compute_histograms,
+                overwrite=overwrite,
+                prefetch_mb=prefetch_mb,
+                progress=progress,
+                plate_name=zarr_name,
+                well_sub_group=str(int(well_sub_group) + 1),
+                acquisition=None if acquisition is None else acquisition + 1,
+            )
+        )
+
+    if blank_tile_threshold is not None:
+        record_skipped_fovs(
+            plate=plate,
+            well_acquisitions=well_acquisitions,
+            blank_paths=set(_gather(client, blank_tiles.pop_blank_tiles)),
+            well_sub_group=well_sub_group,
+            fov_images=fov_images,
+            plate_name=zarr_name,
+        )
+    reads.log_slow_reads(_gather(client, reads.pop_slow_reads), plate=zarr_name)
+    return image_list_updates
+
+
+def _gather(client: "distributed.Client", pop: Callable[[], list]) -> list:
+    """Items popped by `pop` in this process and in all workers of `client`."""
+    items = list(pop())
+    for worker_items in client.run(pop).values():
+        items.extend(worker_items)
+    return items
+
+
+def _create_plates(
+    converter: "ConvertToNGFFPlate",
+    plate_acquisition,
+    *,
+    zarr_dir: str,
+    zarr_name: str,
+    image_dir: str,
+    write_mip: bool,
+    append_acquisition: bool,
+):
+    """Create or open the plate and the projection plate.
+
+    Returns:
+        The plate, the projection plate (None if not written) and the well
+        sub group the acquisition is written to.
+    """
+    from fractal_faim_ipa import storage_utils
 
-    # TODO: Remove hard-coded well sub group? Or make flexible for multiplexing
     well_sub_group = "0"
-    well_acquisitions = plate_acquisition.get_well_acquisitions(selection=None)
+    plate_exists = storage_utils.exists(
+        storage_utils.join(zarr_dir, zarr_name + ".zarr")
+    )
+    plate = converter.create_zarr_plate(plate_acquisition)
+    mip_plate = None
+    if write_mip:
+        mip_plate = converter.create_zarr_plate(
+            plate_acquisition, name=zarr_name + "_mip"
+        )
+    if append_acquisition and plate_exists:
+        well_acquisitions = plate_acquisition.get_well_acquisitions(selection=None)
+        well_sub_group = converter.get_next_well_sub_group(plate)
+        logger.info(
+            f"Adding {image_dir} to {zarr_name} as well sub group {well_sub_group}."
+        )
+        for target in [plate] if mip_plate is None else [plate, mip_plate]:
+            converter.add_wells_to_plate(target, well_acquisitions)
+    return plate, mip_plate, well_sub_group
 
-    plate_name = zarr_name + ".zarr"
 
-    image_list_updates = []
-    # TODO: Add more robust handling for dimensionality detection
-    if (
-        mode == ModeEnum.SinglePlaneAcquisition
-        or mode == ModeEnum.MetaXpressSinglePlaneAcquisition
-        or mode == ModeEnum.MetaXpressSinglePlaneAcquisition_as3D
-    ):
-        is_3D = False
+def _write_roi_tables(
+    *,
+    plate,
+    mip_plate,
+    plate_acquisition,
+    zarr_dir: str,
+    zarr_name: str,
+    well_sub_group: str,
+    fov_images: bool,
+    overwrite: bool,
+    is_3D: bool,
+    acquisition: Optional[int],
+    progress: "ProgressReporter",
+) -> list[dict[str, Any]]:
+    """Write the ROI tables of the converted images and their projections.
+
+    Returns:
+        The image list updates of the images and their projections.
+    """
+    from fractal_faim_ipa.roi_tables import create_field_ROI_tables, create_ROI_tables
+
+    if fov_images:
+        field_roi_tables = create_field_ROI_tables(plate_acquisition)
     else:
-        is_3D = True
+        roi_tables = create_ROI_tables(plate_acquisition=plate_acquisition)
+    image_list_updates = []
+    for well_acquisition in plate_acquisition.get_well_acquisitions(selection=None):
+        if fov_images:
+            images = [
+                (str(field_index), tables, {"fov": f"FOV_{field_index + 1}"})
+                for field_index, tables in enumerate(
+                    field_roi_tables[well_acquisition.name]
+                )
+            ]
+        else:
+            images = [(well_sub_group, roi_tables[well_acquisition.name], {})]
+        if acquisition is not None:
+            images = [
+                (sub_group, tables, {**attributes, "acquisition": acquisition})
+                for sub_group, tables, attributes in images
+            ]
+        for sub_group, image_tables, attributes in images:
+            image_list_updates.extend(
+                _write_image_roi_tables(
+                    plate=plate,
+                    mip_plate=mip_plate,
+                    well_acquisition=well_acquisition,
+                    sub_group=sub_group,
+                    image_tables=image_tables,
+                    attributes=attributes,
+                    zarr_dir=zarr_dir,
+                    zarr_name=zarr_name,
+                    overwrite=overwrite,
+                    is_3D=is_3D,
+                )
+            )
+        progress.well_done()
+    return image_list_updates
 
-    # Run conversion.
-    converter.run(
-        plate=plate,
-        plate_acquisition=plate_acquisition,
-        well_sub_group=well_sub_group,
-        # chunks=(1, 512, 512), # check whether that should be exposed
-        # max_layer=2, # check whether that should be exposed
+
+def _write_image_roi_tables(
+    *,
+    plate,
+    mip_plate,
+    well_acquisition,
+    sub_group: str,
+    image_tables: dict,
+    attributes: dict[str, Any],
+    zarr_dir: str,
+    zarr_name: str,
+    overwrite: bool,
+    is_3D: bool,
+) -> list[dict[str, Any]]:
+    """Write the ROI tables of one image and of its projection, if any.
+
+    Returns:
+        The image list updates of the image and its projection.
+    """
+    from fractal_tasks_core.roi import convert_ROIs_from_3D_to_2D
+    from fractal_tasks_core.tables import write_table
+
+    row, col = well_acquisition.get_row_col()
+    plate_name = zarr_name + ".zarr"
+    for table_name, table in image_tables.items():
+        write_table(
+            image_group=plate[row][col][sub_group],
+            table_name=table_name,
+            table=table,
+            overwrite=overwrite,
+            table_type="roi_table",
+            table_attrs=None,
+        )
+
+    # Create the metadata dictionary: needs a list of all the images
+    zarr_url = f"{zarr_dir}/{plate_name}/{row}/{col}/{sub_group}"
+    image_list_updates = [
+        {
+            "zarr_url": zarr_url,
+            "attributes": {"plate": plate_name, "well": f"{row}{col}", **attributes},
+            "types": {"is_3D": is_3D},
+        }
+    ]
+    if mip_plate is None:
+        return image_list_updates
+
+    mip_plate_name = zarr_name + "_mip.zarr"
+    for table_name, table in image_tables.items():
+        write_table(
+            image_group=mip_plate[row][col][sub_group],
+            table_name=table_name,
+            table=convert_ROIs_from_3D_to_2D(
+                table,
+                pixel_size_z=well_acquisition.get_z_spacing(),
+            ),
+            overwrite=overwrite,
+            table_type="roi_table",
+            table_attrs=None,
+        )
+    image_list_updates.append(
+        {
+            "zarr_url": f"{zarr_dir}/{mip_plate_name}/{row}/{col}/{sub_group}",
+            "origin": zarr_url,
+            "attributes": {
+                "plate": mip_plate_name,
+                "well": f"{row}{col}",
+                **attributes,
+            },
+            "types": {"is_3D": False},
+        }
     )
+    return image_list_updates
+
+
+def record_skipped_fovs(
+    *,
+    plate,
+    well_acquisitions,
+    blank_paths: set[str],
+    well_sub_group: str,
+    fov_images: bool,
+    plate_name: str,
+):
+    """List the fields of view of which all tiles are blank in their images.
+
+    The fields are named like the ROIs of the FOV_ROI_table and saved in the
+    "skipped_fovs" attribute of the image they belong to.
+    """
+    from fractal_faim_ipa.roi_tables import get_fields
 
-    # Write ROI tables to the images
-    roi_tables = create_ROI_tables(plate_acquisition=plate_acquisition)
+    skipped_fovs = []
     for well_acquisition in well_acquisitions:
-        # Write the tables
-        well_rc = well_acquisition.get_row_col()
-        image_group = plate[well_rc[0]][well_rc[1]][well_sub_group]
-        tables = roi_tables[well_acquisition.name].keys()
-        for table_name in tables:
+        row, col = well_acquisition.get_row_col()
+        image_fovs = {}
+        for field_index, tiles in enumerate(get_fields(well_acquisition.get_tiles())):
+            sub_group = str(field_index) if fov_images else well_sub_group
+            fovs = image_fovs.setdefault(sub_group, [])
+            if all(str(tile.path) in blank_paths for tile in tiles):
+                fovs.append(f"FOV_{field_index + 1}")
+                skipped_fovs.append(f"{row}{col} FOV_{field_index + 1}")
+        for sub_group, fovs in image_fovs.items():
+            plate[row][col][sub_group].attrs["skipped_fovs"] = fovs
+    if len(blank_paths) > 0:
+        logger.info(
+            f"{plate_name}: {len(blank_paths)} blank tiles, "
+            f"{len(skipped_fovs)} fields of view without signal"
+            + (f": {', '.join(skipped_fovs)}" if skipped_fovs else ".")
+        )
+
+
+def _convert_projections(
+    *,
+    converter: "ConvertToNGFFPlate",
+    plate,
+    plate_acquisition,
+    image_dir: str,
+    zarr_url: str,
+    chunks,
+    output_chunks,
+    append_timepoints: bool,
+    compute_histograms: bool,
+    overwrite: bool,
+    progress: "ProgressReporter",
+    plate_name: str,
+    prefetch_mb: int = 0,
+    well_sub_group: str = "1",
+    acquisition: Optional[int] = None,
+) -> list[dict[str, Any]]:
+    """Convert the projections of a stack acquisition to `well_sub_group`.
+
+    The projections are annotated as `acquisition`, if given.
+    """
+    from fractal_tasks_core.tables import write_table
+
+    from fractal_faim_ipa.roi_tables import create_ROI_tables
+
+    projection_acquisition = plate_acquisition.get_projection_acquisition()
+    if projection_acquisition is None:
+        logger.warning(f"No projections found in {image_dir}.")
+        return []
+    with progress.phase(
+        "projections",
+        plate=plate_name,
+        n_wells=len(projection_acquisition.get_well_acquisitions()),
+    ):
+        converter.run(
+            plate=plate,
+            plate_acquisition=projection_acquisition,
+            well_sub_group=well_sub_group,
+            append_timepoints=append_timepoints,
+            chunks=chunks,
+            output_chunks=output_chunks,
+            compute_histograms=compute_histograms,
+            prefetch_bytes=prefetch_mb * 1_000_000,
+            progress=progress,
+            acquisition=acquisition,
+        )
+    roi_tables = create_ROI_tables(plate_acquisition=projection_acquisition)
+    image_list_updates = []
+    for well_acquisition in projection_acquisition.get_well_acquisitions():
+        row, col = well_acquisition.get_row_col()
+        for table_name, table in roi_tables[well_acquisition.name].items():
             write_table(
-                image_group=image_group,
+                image_group=plate[row][col][well_sub_group],
                 table_name=table_name,
-                table=roi_tables[well_acquisition.name][table_name],
-                overwrite=overwrite,
+                table=table,
+                overwrite=overwrite or append_timepoints,
                 table_type="roi_table",
                 table_attrs=None,
             )
-
-        # Create the metadata dictionary: needs a list of all the images
-        well_id = f"{well_rc[0]}{well_rc[1]}"
-        zarr_url = f"{zarr_dir}/{plate_name}/{well_rc[0]}/{well_rc[1]}/{well_sub_group}"
         image_list_updates.append(
             {
-                "zarr_url": zarr_url,
+                "zarr_url": f"{zarr_url}/{row}/{col}/{well_sub_group}",
                 "attributes": {
-                    "plate": plate_name,
-                    "well": well_id,
+                    "plate": zarr_url.split("/")[-1],
+                    "well": f"{row}{col}",
+                    **({} if acquisition is None else {"acquisition": acquisition}),
                 },
-                "types": {"is_3D": is_3D},
+                "types": {"is_3D": False},
             }
         )
-
-    return {"image_list_updates": image_list_updates}
+    return image_list_updates
 
 
 if __name__ == "__main__":
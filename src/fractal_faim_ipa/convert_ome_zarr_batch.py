@@ -0,0 +1,242 @@
+# OME-Zarr creation of several MD Image Express plates in one task
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Literal, Optional
+
+from pydantic import validate_call
+
+from fractal_faim_ipa.convert_ome_zarr import (
+    convert_plate,
+    create_client,
+    resolve_mode,
+    validate_options,
+    write_resource_summary,
+)
+from fractal_faim_ipa.input_models import PlateInput, ReadPolicy
+from fractal_faim_ipa.md_converter_utils import ChunkLayoutEnum
+
+logger = logging.getLogger(__name__)
+
+
+@validate_call
+def convert_ome_zarr_batch(
+    *,
+    zarr_urls: list[str],
+    zarr_dir: str,
+    plates: list[PlateInput],
+    mode: Literal[
+        "MD Stack Acquisition",
+        "MD Single Plane Acquisition",
+        "MD Mixed Acquisition",
+        "MetaXpress MD Stack Acquisition",
+        "MetaXpress MD Single Plane Acquisition",
+        "MetaXpress MD Single Plane Acquisition as 3D",
+        "MetaXpress MD Mixed Acquisition",
+        "MetaXpress MD Stack and Projection Acquisition",
+        "auto",
+    ] = "auto",
+    tile_alignment: Literal["StageAlignment", "GridAlignment"] = "GridAlignment",
+    layout: Literal[96, 384] = 96,
+    query: str = "",
+    order_name: str = "example-order",
+    overwrite: bool = False,
+    binning: int = 1,
+    parallelize: bool = True,
+    append_timepoints: bool = False,
+    append_acquisition: bool = False,
+    fov_images: bool = False,
+    chunk_layout: Literal["Default", "FOV", "Well"] = "Default",
+    metadata_executor: Literal["threads", "processes"] = "threads",
+    compute_histograms: bool = False,
+    write_mip: bool = False,
+    prefetch_mb: int = 0,
+    background_correction_matrices: Optional[dict[str, str]] = None,
+    illumination_correction_matrices: Optional[dict[str, str]] = None,
+    progress_interval: int = 60,
+    progress_file: Optional[str] = None,
+    read_policy: Optional[ReadPolicy] = None,
+    blank_tile_threshold: Optional[float] = None,
+    sample_resources: bool = False,
+    trace_python_heap: bool = False,
+) -> dict[str, Any]:
+    """
+    Create OME-Zarr plates from several MD Image Xpress acquisitions.
+
+    This is a non-parallel task => the plates are converted one after the
+    other with the same Dask client, while the metadata of the next plate is
+    parsed in the background. The TIFF metadata cache is shared by all
+    plates. See "FAIM IPA OME-Zarr Converter" for the conversion options.
+
+    Args:
+        zarr_urls: List of paths or urls to the individual OME-Zarr image to
+            be processed. Not used by the converter task.
+            (standard argument for Fractal tasks, managed by Fractal server).
+        zarr_dir: path of the directory where the new OME-Zarrs will be
+            created. Can also be an fsspec URL, e.g. `s3://bucket/prefix`.
+            (standard argument for Fractal tasks, managed by Fractal server).
+        plates: Image folders and names of the plates to convert.
+        mode: Conversion mode of all plates, "auto" detects the mode of each
+            plate from its files.
+        tile_alignment: Choose whether tiles are placed into the OME-Zarr as a
+            grid or whether they are placed based on the position of field of
+            views in the metadata (using fusion for shared areas).
+        layout: Plate layout for the Zarr files. Valid options are 96 and 384
+        query: Pandas query to filter the file lists.
+        order_name: Name of the order
+        overwrite: Whether to overwrite zarr files that already exist
+        binning: Binning factor to downsample the original images.
+        parallelize: The automatic distribute.Client option often fails to
+            finish when running the task locally. Set parallelize to false to
+            avoid that.
+        append_timepoints: Only convert the time points that are not yet part
+            of the existing plates and append them along the time axis.
+        append_acquisition: Add each acquisition to its existing plate as the
+            next well sub group, e.g. a further multiplexing cycle, without
+            rewriting the existing images. The index of the sub group is
+            recorded as "acquisition".
+        fov_images: Write each field of view as its own image instead of
+            stitching the fields into one image per well.
+        chunk_layout: Layout of the zarr chunks: "Default", "FOV" or "Well".
+        metadata_executor: Parse the tile positions from the TIFF metadata
+            with "threads" or "processes" (MetaXpress modes).
+        compute_histograms: Collect per-channel intensity histograms while
+            converting and set the OMERO display windows from them.
+        write_mip: Also write the maximum intensity projections of 3D
+            acquisitions to a separate plate "{zarr_name}_mip.zarr".
+        prefetch_mb: Memory in MB used to read tiles ahead of the stitching
+            (MetaXpress modes with parallelize set to false).
+        background_correction_matrices: Paths of the background images
+            that are subtracted from the tiles, keyed by channel (e.g. "w1").
+        illumination_correction_matrices: Paths of the flat-field images
+            the tiles are divided by, keyed by channel (e.g. "w1").
+        progress_interval: Seconds between the progress events of each plate.
+            0 only reports when a phase finishes.
+        progress_file: Path of a JSON-lines file the progress events are
+            appended to, in addition to the task log.
+        read_policy: Timeout, retries and duplicate reads of slow or hung
+            reads of the source files (MetaXpress modes). The slowest reads
+            of each plate are listed in the log. None uses the defaults of
+            `ReadPolicy`.
+        blank_tile_threshold: Tiles whose maximum intensity is below this
+            value are converted as zeros and not written (MetaXpress modes).
+            Fields of view without signal are listed in the "skipped_fovs"
+            attribute of their image.
+        sample_resources: Sample the peak memory, open files and CPU
+            utilisation of the task process and of each Dask worker per
+            phase and plate. The summary is logged and written to
+            "batch_resources.json" in `zarr_dir`.
+        trace_python_heap: Also trace the peak memory allocated by Python
+            with tracemalloc when sampling the resources.
+
+    Returns:
+        Metadata dictionary with the image list updates of all plates.
+    """
+    from faim_ipa.hcs.acquisition import TileAlignmentOptions
+    from faim_ipa.hcs.converter import PlateLayout
+
+    from fractal_faim_ipa import reads, resources, storage_utils
+    from fractal_faim_ipa.progress import ProgressReporter
+
+    layout = PlateLayout(layout)
+    tile_alignment = TileAlignmentOptions(tile_alignment)
+    chunk_layout = ChunkLayoutEnum(chunk_layout)
+    zarr_dir = zarr_dir.rstrip("/")
+    if query == "":
+        query = None
+
+    zarr_names = [plate.zarr_name for plate in plates]
+    if len(set(zarr_names)) != len(zarr_names):
+        raise ValueError(f"The names of the plates must be unique, got {zarr_names}")
+    # Fail on invalid options before the first plate is converted
+    modes = [resolve_mode(mode, plate.image_dir) for plate in plates]
+    for plate_mode in modes:
+        validate_options(
+            plate_mode,
+            append_timepoints=append_timepoints,
+            overwrite=overwrite,
+            write_mip=write_mip,
+            correction_matrices=bool(
+                background_correction_matrices or illumination_correction_matrices
+            ),
+            append_acquisition=append_acquisition,
+            fov_images=fov_images,
+            blank_tile_threshold=blank_tile_threshold,
+        )
+
+    def scan(index):
+        tile_binning = modes[index].tile_binning(binning)
+        plate_acquisition = modes[index].get_plate_acquisition(
+            acquisition_dir=plates[index].image_dir,
+            alignment=tile_alignment,
+            query=query,
+            keep_time_axis=append_timepoints,
+            yx_binning=tile_binning,
+            metadata_executor=metadata_executor,
+            background_correction_matrices=background_correction_matrices,
+            illumination_correction_matrices=illumination_correction_matrices,
+        )
+        chunks, output_chunks = chunk_layout.get_chunks(
+            plate_acquisition, yx_binning=binning // tile_binning
+        )
+        return plate_acquisition, chunks, output_chunks
+
+    if read_policy is None:
+        read_policy = ReadPolicy()
+    reads.configure(read_policy)
+    progress = ProgressReporter(interval=progress_interval, path=progress_file)
+    image_list_updates = []
+    if len(plates) == 0:
+        return {"image_list_updates": image_list_updates}
+
+    monitoring = resources.monitoring(sample_resources, trace_python_heap)
+    client = create_client(parallelize)
+    with monitoring as monitor, client, ThreadPoolExecutor(1) as executor:
+        next_scan = executor.submit(scan, 0)
+        for index, plate in enumerate(plates):
+            plate_acquisition, chunks, output_chunks = next_scan.result()
+            # The next plate is parsed while the current one is converted
+            if index + 1 < len(plates):
+                next_scan = executor.submit(scan, index + 1)
+            logger.info(
+                f"Converting plate {index + 1}/{len(plates)} {plate.zarr_name} "
+                f"from {plate.image_dir}."
+            )
+            image_list_updates.extend(
+                convert_plate(
+                    client=client,
+                    plate_acquisition=plate_acquisition,
+                    mode=modes[index],
+                    zarr_dir=zarr_dir,
+                    zarr_name=plate.zarr_name,
+                    image_dir=plate.image_dir,
+                    layout=layout,
+                    order_name=order_name,
+                    barcode=plate.barcode,
+                    overwrite=overwrite,
+                    binning=binning // modes[index].tile_binning(binning),
+                    append_timepoints=append_timepoints,
+                    chunks=chunks,
+                    output_chunks=output_chunks,
+                    compute_histograms=compute_histograms,
+                    write_mip=write_mip,
+                    prefetch_mb=prefetch_mb,
+                    progress=progress,
+                    read_policy=read_policy,
+                    append_acquisition=append_acquisition,
+                    fov_images=fov_images,
+                    blank_tile_threshold=blank_tile_threshold,
+                )
+            )
+        write_resource_summary(
+            monitor, storage_utils.join(zarr_dir, "batch_resources.json")
+        )
+        return {"image_list_updates": image_list_updates}
+
+
+if __name__ == "__main__":
+    from fractal_tasks_core.tasks._utils import run_fractal_task
+
+    run_fractal_task(
+        task_function=convert_ome_zarr_batch,
+        logger_name=logger.name,
+    )
@@ -0,0 +1,913 @@
+"""OME-Zarr plate conversion on top of the faim-ipa converter."""
+import logging
+from collections import Counter
+from contextlib import nullcontext
+
+import dask.array as da
+import numpy as np
+import zarr
+from dask import delayed
+from dask.distributed import wait
+from faim_ipa import dask_utils
+from faim_ipa.hcs import converter
+from faim_ipa.hcs.plate import get_rows_and_columns
+from fractal_tasks_core.tables import write_table
+from ome_zarr.io import parse_url
+from ome_zarr.writer import write_plate_metadata, write_well_metadata
+
+from fractal_faim_ipa import intensity_stats, prefetch, storage_utils
+from fractal_faim_ipa.imagexpress_zmb import ImageXpressTile
+from fractal_faim_ipa.roi_tables import get_fields
+
+logger = logging.getLogger(__name__)
+
+
+class ConvertToNGFFPlate(converter.ConvertToNGFFPlate):
+    """Convert a plate acquisition to an NGFF plate.
+
+    Extends the faim-ipa converter such that:
+    * the (t, c) slices of all wells are written concurrently, instead of
+      converting one well after the other. This keeps the workers busy when
+      only a few wells with many time points or channels are converted.
+    * the zarr chunks can differ from the blocks used for stitching, e.g. to
+      write one chunk per field of view with several z-planes.
+    * new time points can be appended to the wells of an existing plate
+      instead of rewriting them.
+    * further acquisitions (e.g. multiplexing cycles) can be added to an
+      existing plate as the next well sub group, see
+      `get_next_well_sub_group`.
+    * the plate can be written to fsspec URLs, e.g. `s3://bucket/plate.zarr`.
+    * per-channel intensity histograms can be collected from the data that
+      is written, to set the OMERO display windows without re-reading it.
+    * maximum intensity projections can be written to a second plate from
+      the z-planes that are written.
+    * the source files can be read ahead in the order they are stitched.
+    * the resolution pyramid is computed from the full resolution blocks
+      while they are written, instead of reading each level back from the
+      zarr array.
+    * each field of view can be written as its own well image, without
+      stitching the fields, see `fov_images` of `run`.
+    """
+
+    def create_zarr_plate(self, plate_acquisition, wells=None, name=None):
+        """Create an empty NGFF zarr plate, or open it if it already exists.
+
+        Args:
+            plate_acquisition: A single plate acquisition.
+            wells: List of wells to build. If None, all wells are built.
+            name: Name of the plate. Defaults to the name of the NGFF plate.
+
+        Returns:
+            zarr.Group of the plate.
+        """
+        name = self._ngff_plate.name if name is None else name
+        plate_path = storage_utils.join(self._ngff_plate.root_dir, name + ".zarr")
+        if storage_utils.exists(plate_path):
+            return zarr.group(store=parse_url(plate_path, mode="w").store)
+
+        storage_utils.makedirs(plate_path)
+        plate = zarr.group(store=parse_url(plate_path, mode="w").store)
+        rows, cols = get_rows_and_columns(layout=self._ngff_plate.layout)
+        write_plate_metadata(
+            plate,
+            columns=cols,
+            rows=rows,
+            wells=[f"{w[0]}/{w[1:]}" for w in plate_acquisition.get_well_names(wells)],
+            name=name,
+            field_count=1,
+        )
+        attrs = plate.attrs.asdict()
+        attrs["order_name"] = self._ngff_plate.order_name
+        attrs["barcode"] = self._ngff_plate.barcode
+        plate.attrs.put(attrs)
+        return plate
+
+    def run(
+        self,
+        plate,
+        plate_acquisition,
+        wells=None,
+        well_sub_group="0",
+        chunks=(2048, 2048),
+        max_layer=3,
+        storage_options=None,
+        *,
+        build_acquisition_mask=False,
+        append_timepoints=False,
+        output_chunks=None,
+        compute_histograms=False,
+        mip_plate=None,
+        prefetch_bytes=0,
+        progress=None,
+        fov_images=False,
+        acquisition=None,
+    ):
+        """Convert a plate acquisition to an NGFF plate.
+
+        Args:
+            plate: zarr.Group of the plate.
+            plate_acquisition: A single plate acquisition.
+            wells: List of wells to convert. If None, all wells are converted.
+            well_sub_group: Name of the well subgroup.
+            chunks: Chunk size in (Z)YX.
+            max_layer: Maximum layer of the resolution pyramid layers.
+            storage_options: Zarr storage options.
+            build_acquisition_mask: Writes a boolean mask instead of the image
+                data, indicating where the image data is present.
+            append_timepoints: Only write the time points that are missing in
+                wells that already exist in the plate. Wells that are not part
+                of the plate yet are converted in full.
+            output_chunks: Chunk size in (Z)YX of the written zarr arrays.
+                Defaults to `chunks`.
+            compute_histograms: Collect per-channel intensity histograms of
+                the converted wells, set the OMERO display windows to the
+                percentiles of the plate histograms and write the well
+                histograms to an "intensity_histogram" table.
+            mip_plate: zarr.Group of a plate to write the maximum intensity
+                projections along z to. The projections keep a z axis of
+                length 1. Not supported together with `append_timepoints`.
+            prefetch_bytes: Memory used to read the tiles of the converted
+                wells ahead, see `fractal_faim_ipa.prefetch`. Only used if a
+                single Dask worker thread runs in this process. 0 disables
+                prefetching.
+            progress: `fractal_faim_ipa.progress.ProgressReporter` that counts
+                the wells, tiles and bytes as the writes complete.
+            fov_images: Write each field of view of a well as its own image,
+                in the well sub groups "0", "1", ... in the order of
+                `fractal_faim_ipa.roi_tables.get_fields`, instead of stitching
+                the fields into one image in `well_sub_group`. The tiles are
+                stacked along t, c and z as they are, without warping or
+                fusing them. Not supported together with `append_timepoints`.
+            acquisition: Index of the acquisition, e.g. the multiplexing
+                cycle, that is written to the well images and listed in the
+                "acquisitions" of the plate metadata. None omits it.
+
+        Returns:
+            zarr.Group of the plate.
+        """
+        assert 2 <= len(chunks) <= 3, "Chunks must be 2D or 3D."
+        assert len(chunks) == len(
+            plate_acquisition.get_well_acquisitions()[0].get_tiles()[0].shape
+        ), "Chunks must have the same number of dimensions as the tile shape."
+        well_acquisitions = plate_acquisition.get_well_acquisitions(wells)
+        if output_chunks is None:
+            output_chunks = chunks
+
+        if append_timepoints and fov_images:
+            raise ValueError("Time points can't be appended to field images")
+        if append_timepoints:
+            well_acquisitions = self._append_to_existing_images(
+                plate, plate_acquisition, well_acquisitions, well_sub_group, chunks
+            )
+        if acquisition is not None and not build_acquisition_mask:
+            for target in [plate] if mip_plate is None else [plate, mip_plate]:
+                self.add_acquisition_to_plate(target, acquisition)
+
+        compute_histograms = compute_histograms and not build_acquisition_mask
+        images = self._list_images(well_acquisitions, well_sub_group, fov_images)
+        images_per_well = Counter(image[0].name for image in images)
+        groups, mip_groups, shapes, mip_shapes, histograms = self._submit_images(
+            images,
+            plate,
+            mip_plate,
+            plate_acquisition,
+            chunks,
+            output_chunks,
+            storage_options,
+            max_layer=max_layer,
+            build_acquisition_mask=build_acquisition_mask,
+            compute_histograms=compute_histograms,
+            fov_images=fov_images,
+            acquisition=acquisition,
+            prefetch_bytes=prefetch_bytes,
+            progress=progress,
+        )
+
+        if fov_images:
+            field_count = max(images_per_well.values(), default=1)
+            for target in [plate] if mip_plate is None else [plate, mip_plate]:
+                self._set_field_count(target, field_count)
+
+        # Projections are annotated like the images they belong to
+        image_well_acquisitions = [image[0] for image in images]
+        self._write_image_metadata(
+            groups + mip_groups,
+            image_well_acquisitions + image_well_acquisitions[: len(mip_groups)],
+            shapes + mip_shapes,
+            max_layer,
+            plate_acquisition,
+        )
+        for group, well_acquisition in zip(groups, image_well_acquisitions):
+            self._record_time_points(group, well_acquisition)
+        if compute_histograms and len(groups) > 0:
+            self._write_intensity_statistics(
+                groups,
+                {path: future.result() for path, future in histograms.items()},
+            )
+
+        return plate
+
+    def _submit_images(
+        self,
+        images,
+        plate,
+        mip_plate,
+        plate_acquisition,
+        chunks,
+        output_chunks,
+        storage_options,
+        *,
+        max_layer,
+        build_acquisition_mask,
+        compute_histograms,
+        fov_images,
+        acquisition,
+        prefetch_bytes,
+        progress,
+    ):
+        """Write the arrays of `images` and wait until they are stored.
+
+        Returns:
+            The image groups, the projection groups, the shapes of the
+            images, the shapes of the projections and the futures of the
+            histograms keyed by image group path.
+        """
+        groups = []
+        mip_groups = []
+        shapes = []
+        mip_shapes = []
+        futures = []
+        histograms = {}
+        images_per_well = Counter(image[0].name for image in images)
+        prefetch_tiles = [tile for _, _, tiles in images for tile in tiles]
+        with self._prefetch(prefetch_tiles, prefetch_bytes):
+            for well_acquisition, sub_group, tiles in images:
+                group, mip_group = self._create_image_groups(
+                    plate,
+                    mip_plate,
+                    well_acquisition,
+                    sub_group,
+                    add_to_well_images=not build_acquisition_mask,
+                    acquisition=acquisition,
+                )
+                groups.append(group)
+                if mip_group is not None:
+                    mip_groups.append(mip_group)
+                image = self._build_image(
+                    tiles,
+                    chunks,
+                    plate_acquisition,
+                    well_acquisition,
+                    fov_images=fov_images,
+                    build_acquisition_mask=build_acquisition_mask,
+                )
+                (
+                    store_futures,
+                    histograms[group.path],
+                    level_shapes,
+                ) = self._submit_image(
+                    group,
+                    image,
+                    output_chunks,
+                    storage_options,
+                    well_acquisition,
+                    compute_histograms=compute_histograms,
+                    mip_group=mip_group,
+                    max_layer=max_layer,
+                )
+                futures.extend(store_futures)
+                shapes.append(level_shapes[0])
+                mip_shapes.extend(level_shapes[1:])
+                if progress is not None:
+                    self._track_progress(
+                        progress,
+                        store_futures,
+                        tiles,
+                        level_shapes,
+                        itemsize=group["0"].dtype.itemsize,
+                        read_tiles=not build_acquisition_mask,
+                        n_wells=1 / images_per_well[well_acquisition.name],
+                    )
+            wait(futures)
+        return groups, mip_groups, shapes, mip_shapes, histograms
+
+    def _append_to_existing_images(
+        self, plate, plate_acquisition, well_acquisitions, well_sub_group, chunks
+    ):
+        """Append the time points of the wells that already exist in the plate.
+
+        Returns:
+            The well acquisitions that are not part of the plate yet, which
+            are added to the plate metadata and have to be converted in full.
+        """
+        new_well_acquisitions = []
+        for well_acquisition in well_acquisitions:
+            row, col = well_acquisition.get_row_col()
+            image_path = f"{row}/{col}/{well_sub_group}"
+            if f"{image_path}/0" in plate:
+                self._append_timepoints(
+                    plate[image_path], chunks, plate_acquisition, well_acquisition
+                )
+            else:
+                new_well_acquisitions.append(well_acquisition)
+        self.add_wells_to_plate(plate, new_well_acquisitions)
+        return new_well_acquisitions
+
+    def _create_image_groups(
+        self,
+        plate,
+        mip_plate,
+        well_acquisition,
+        sub_group,
+        *,
+        add_to_well_images,
+        acquisition,
+    ):
+        """Image group of a well and of its projection (None without `mip_plate`)."""
+        groups = [
+            self._create_well_group(
+                target,
+                well_acquisition,
+                sub_group,
+                add_to_well_images=add_to_well_images,
+                acquisition=acquisition,
+            )[sub_group]
+            for target in ([plate] if mip_plate is None else [plate, mip_plate])
+        ]
+        return groups[0], groups[1] if len(groups) > 1 else None
+
+    def _build_image(
+        self,
+        tiles,
+        chunks,
+        plate_acquisition,
+        well_acquisition,
+        *,
+        fov_images,
+        build_acquisition_mask,
+    ):
+        """Dask array of a field image or of the stitched well image."""
+        if fov_images:
+            return self._field_image(
+                tiles,
+                well_acquisition,
+                n_tcz=plate_acquisition.get_common_well_shape()[:3],
+                build_acquisition_mask=build_acquisition_mask,
+            )
+        return self._drop_missing_axes(
+            self._stitch_well_image(
+                chunks,
+                well_acquisition,
+                output_shape=plate_acquisition.get_common_well_shape(),
+                build_acquisition_mask=build_acquisition_mask,
+            ),
+            well_acquisition,
+        )
+
+    def _write_image_metadata(
+        self, groups, well_acquisitions, shapes, max_layer, plate_acquisition
+    ):
+        """Write the NGFF metadata of the images after their arrays."""
+        datasets = [{"path": str(path)} for path in range(max_layer + 1)]
+        for group, well_acquisition, group_shapes in zip(
+            groups, well_acquisitions, shapes
+        ):
+            self._write_metadata(
+                group,
+                max_layer,
+                group_shapes,
+                datasets,
+                plate_acquisition,
+                well_acquisition,
+            )
+
+    def _create_well_group(
+        self,
+        plate,
+        well_acquisition,
+        well_sub_group,
+        *,
+        add_to_well_images=True,
+        acquisition=None,
+    ):
+        """Create the well group and list `well_sub_group` in its images.
+
+        The image is annotated with its `acquisition`, if given.
+        """
+        row, col = well_acquisition.get_row_col()
+        well_group = plate.require_group(row).require_group(col)
+        well_group.require_group(well_sub_group)
+        if add_to_well_images:
+            images = well_group.attrs.asdict().get("well", {}).get("images", [])
+            image = {"path": well_sub_group}
+            if acquisition is not None:
+                image["acquisition"] = acquisition
+            write_well_metadata(well_group, [*images, image])
+        return well_group
+
+    @staticmethod
+    def add_acquisition_to_plate(plate, acquisition):
+        """List `acquisition` in the "acquisitions" of the plate metadata."""
+        plate_attrs = plate.attrs["plate"]
+        acquisitions = plate_attrs.get("acquisitions", [])
+        if any(entry["id"] == acquisition for entry in acquisitions):
+            return
+        plate_attrs["acquisitions"] = sorted(
+            [*acquisitions, {"id": acquisition}], key=lambda entry: entry["id"]
+        )
+        plate.attrs["plate"] = plate_attrs
+
+    @staticmethod
+    def _list_images(well_acquisitions, well_sub_group, fov_images):
+        """The images to write, with the tiles they are built from.
+
+        Returns:
+            (well acquisition, well sub group, tiles) of each image. The
+            tiles are listed in the order they are read.
+        """
+        if fov_images:
+            return [
+                (well_acquisition, str(field_index), tiles)
+                for well_acquisition in well_acquisitions
+                for field_index, tiles in enumerate(
+                    get_fields(well_acquisition.get_tiles())
+                )
+            ]
+        # The (t, c) slices of a well are stitched plane by plane
+        return [
+            (
+                well_acquisition,
+                well_sub_group,
+                sorted(
+                    well_acquisition.get_tiles(),
+                    key=lambda tile: (
+                        tile.position.time or 0,
+                        tile.position.channel or 0,
+                        tile.position.z,
+                        tile.position.y,
+                        tile.position.x,
+                    ),
+                ),
+            )
+            for well_acquisition in well_acquisitions
+        ]
+
+    def _field_image(self, tiles, well_acquisition, n_tcz, build_acquisition_mask):
+        """Image of a single field of view, stacked from its tiles.
+
+        Each tile becomes one block of the image, (t, c, z) positions without
+        a tile are filled with zeros.
+
+        Args:
+            tiles: Tiles of the field, see `roi_tables.get_fields`.
+            well_acquisition: Well acquisition of the field.
+            n_tcz: Number of time points, channels and z-planes of the image.
+            build_acquisition_mask: Writes a boolean mask instead of the
+                image data, without reading the tiles.
+
+        Returns:
+            Dask array with the axes of the well acquisition.
+        """
+        shape_yx = tuple(tiles[0].shape[-2:])
+        if any(tuple(tile.shape[-2:]) != shape_yx for tile in tiles):
+            raise ValueError(
+                f"The tiles of a field of well {well_acquisition.name} differ "
+                "in shape."
+            )
+        dtype = bool if build_acquisition_mask else well_acquisition.get_dtype()
+        n_t, n_c, n_z = n_tcz
+        planes = {
+            (tile.position.time or 0, tile.position.channel or 0, tile.position.z): tile
+            for tile in tiles
+        }
+        timepoints = []
+        for t in range(n_t):
+            channels = []
+            for c in range(n_c):
+                blocks = []
+                z = 0
+                while z < n_z:
+                    tile = planes.get((t, c, z))
+                    if tile is None:
+                        blocks.append(da.zeros((1, *shape_yx), dtype=dtype))
+                        z += 1
+                        continue
+                    tile_shape = (1,) * (3 - len(tile.shape)) + tuple(tile.shape)
+                    blocks.append(
+                        da.from_delayed(
+                            delayed(_load_tile_zyx, pure=True)(
+                                tile, build_acquisition_mask
+                            ),
+                            shape=tile_shape,
+                            dtype=dtype,
+                        )
+                    )
+                    z += tile_shape[0]
+                channels.append(da.concatenate(blocks)[:n_z])
+            timepoints.append(da.stack(channels))
+        return self._drop_missing_axes(da.stack(timepoints), well_acquisition)
+
+    @staticmethod
+    def _set_field_count(plate, field_count):
+        """Raise the maximum number of fields per well of the plate metadata."""
+        plate_attrs = plate.attrs["plate"]
+        plate_attrs["field_count"] = max(plate_attrs.get("field_count", 1), field_count)
+        plate.attrs["plate"] = plate_attrs
+
+    def _submit_image(
+        self,
+        group,
+        image,
+        output_chunks,
+        storage_options,
+        well_acquisition,
+        compute_histograms=False,
+        mip_group=None,
+        max_layer=0,
+    ):
+        """Submit writing the image of a well and its resolution pyramid.
+
+        Histograms, the projection to `mip_group` and the pyramid levels up
+        to `max_layer` are computed together with the writes, such that the
+        blocks of the image are only computed once.
+
+        Returns:
+            Futures of the writes of the individual (t, c) slices, the
+            future of the channel histograms (None if not computed) and the
+            shapes of the pyramid levels of the image and of the projection.
+        """
+        n_leading_axes = self._n_leading_axes(well_acquisition)
+        stores, image_shapes = self._pyramid_stores(
+            group, image, output_chunks, max_layer, storage_options, n_leading_axes
+        )
+        shapes = [image_shapes]
+        axes = well_acquisition.get_axes()
+        if mip_group is not None:
+            mip = image.max(axis=axes.index("z"), keepdims=True)
+            mip_stores, mip_shapes = self._pyramid_stores(
+                mip_group,
+                mip,
+                output_chunks,
+                max_layer,
+                storage_options,
+                n_leading_axes,
+            )
+            stores.extend(mip_stores)
+            shapes.append(mip_shapes)
+        if not compute_histograms:
+            return self._client.compute(stores), None, shapes
+        histograms = intensity_stats.channel_histograms(
+            image, channel_axis=axes.index("c") if "c" in axes else None
+        )
+        *futures, histograms_future = self._client.compute([*stores, histograms])
+        return futures, histograms_future, shapes
+
+    def _pyramid_stores(
+        self, group, image, chunks, max_layer, storage_options, n_leading_axes
+    ):
+        """Lazy writes of `image` and its resolution pyramid to `group`.
+
+        Each level is coarsened from the blocks of the previous level, such
+        that all levels are written in the same pass without reading the
+        written data back.
+
+        Returns:
+            Delayed writes of all levels and the shapes of the levels.
+        """
+        stores = []
+        shapes = []
+        for path in range(max_layer + 1):
+            if path > 0:
+                image = self._coarsen(image)
+            target = self._create_array(
+                group, str(path), image, chunks, storage_options, n_leading_axes
+            )
+            stores.extend(self._slice_stores(image, target, n_leading_axes))
+            shapes.append(image.shape)
+        return stores, shapes
+
+    @staticmethod
+    def _coarsen(image):
+        """Next pyramid level of `image`, halving the y and x axes."""
+        return da.coarsen(
+            reduction=dask_utils.mean_cast_to(image.dtype),
+            x=image,
+            axes={
+                image.ndim - 2: 2,
+                image.ndim - 1: 2,
+            },
+            trim_excess=True,
+        )
+
+    @staticmethod
+    def _track_progress(
+        progress, futures, tiles, level_shapes, itemsize, read_tiles, n_wells=1.0
+    ):
+        """Count the tiles and bytes of an image as its writes complete."""
+        read_bytes = 0
+        if read_tiles:
+            read_bytes = itemsize * sum(
+                np.prod(tile.shape) * getattr(tile, "yx_binning", 1) ** 2
+                for tile in tiles
+            )
+        written_bytes = itemsize * sum(
+            np.prod(shape) for shapes in level_shapes for shape in shapes
+        )
+        progress.track(
+            futures,
+            n_tiles=len(tiles),
+            read_bytes=int(read_bytes),
+            written_bytes=int(written_bytes),
+            n_wells=n_wells,
+        )
+
+    def _prefetch(self, tiles, max_bytes):
+        """Context reading `tiles` ahead, in the order they are given.
+
+        The images are submitted in order, see `_list_images`.
+        """
+        if max_bytes <= 0:
+            return nullcontext()
+        if not all(isinstance(tile, ImageXpressTile) for tile in tiles):
+            logger.warning("Prefetching is only supported in MetaXpress modes.")
+            return nullcontext()
+        workers = self._client.scheduler_info()["workers"]
+        # Parallel workers consume the tiles out of order, such that the
+        # prefetcher would read tiles that are not needed next
+        if not all(address.startswith("inproc://") for address in workers) or (
+            sum(worker["nthreads"] for worker in workers.values()) > 1
+        ):
+            logger.warning(
+                "Tiles are only prefetched if a single Dask worker thread runs "
+                "in the converting process, e.g. with parallelize=False."
+            )
+            return nullcontext()
+        return prefetch.prefetching([tile.path for tile in tiles], max_bytes)
+
+    def _create_array(
+        self, group, path, image, chunks, storage_options, n_leading_axes
+    ):
+        """Create an empty zarr array to write `image` to.
+
+        `chunks` are matched to the spatial axes of `image` and clipped to
+        its shape, such that e.g. well-sized chunks also fit the smaller
+        pyramid levels.
+        """
+        spatial_shape = image.shape[n_leading_axes:]
+        chunks = (1,) * (len(spatial_shape) - len(chunks)) + tuple(chunks)
+        chunks = tuple(
+            min(c, s) for c, s in zip(chunks[-len(spatial_shape) :], spatial_shape)
+        )
+        options = self._get_storage_options(storage_options, image.shape, chunks)
+        return group.create(
+            name=path,
+            shape=image.shape,
+            dtype=image.dtype,
+            **options,
+        )
+
+    @staticmethod
+    def _slice_stores(image, target, n_leading_axes, t_offset=0):
+        """Lazy writes of `image` to `target` as independent (t, c) slices.
+
+        Args:
+            image: Dask array to write.
+            target: zarr array to write to.
+            n_leading_axes: Number of leading (t, c) axes of `image`.
+            t_offset: Offset of `image` along the time axis of `target`.
+
+        Returns:
+            Delayed writes, one per (t, c) slice.
+        """
+        image = image.rechunk(target.chunks)
+        offsets = [t_offset] + [0] * (n_leading_axes - 1)
+        stores = []
+        for index in np.ndindex(image.shape[:n_leading_axes]):
+            source_region = tuple(slice(i, i + 1) for i in index)
+            target_region = tuple(
+                slice(i + offset, i + offset + 1) for i, offset in zip(index, offsets)
+            )
+            stores.append(
+                da.store(
+                    image[source_region],
+                    target,
+                    regions=target_region,
+                    lock=False,
+                    compute=False,
+                )
+            )
+        return stores
+
+    @staticmethod
+    def _write_intensity_statistics(groups, histograms):
+        """Set the OMERO display windows and write the histogram tables.
+
+        The windows are computed from the histograms of all `groups`, such
+        that all wells are displayed with the same contrast limits.
+        """
+        plate_histograms = np.sum(list(histograms.values()), axis=0)
+        windows = [intensity_stats.get_window(h) for h in plate_histograms]
+        for group in groups:
+            omero = group.attrs["omero"]
+            # The histograms are indexed like the channels of the image, which
+            # include inactive empty channels
+            channels = omero["channels"]
+            active = [i for i, channel in enumerate(channels) if channel["active"]]
+            for i in active:
+                start, end = windows[i]
+                channels[i]["window"]["start"] = start
+                channels[i]["window"]["end"] = end
+            group.attrs["omero"] = omero
+            write_table(
+                image_group=group,
+                table_name="intensity_histogram",
+                table=intensity_stats.create_histogram_table(
+                    histograms[group.path][active],
+                    [channels[i]["wavelength_id"] for i in active],
+                ),
+                overwrite=True,
+                table_attrs={
+                    "type": "intensity_histogram",
+                    "window_percentiles": list(intensity_stats.WINDOW_PERCENTILES),
+                },
+            )
+
+    @staticmethod
+    def _n_leading_axes(well_acquisition):
+        """Number of (t, c) axes in front of the spatial axes."""
+        return len([axis for axis in well_acquisition.get_axes() if axis in "tc"])
+
+    def _append_timepoints(self, group, chunks, plate_acquisition, well_acquisition):
+        """Write the time points of a well that are missing in `group`.
+
+        The time points are placed by their TimePoint number, relative to the
+        first time point of the image (see `_record_time_points`), such that
+        an acquisition with only the later time points can be appended. Time
+        points that were completely written before are skipped, time points
+        that are present but were not completed (e.g. of an interrupted
+        conversion) are rewritten.
+
+        The arrays of all pyramid levels are resized along the time axis. All
+        levels are coarsened from the new stitched time points and written
+        in the same pass.
+
+        Raises:
+            ValueError: If the acquisition starts before the first time point
+                of the image or leaves a gap after its last complete one.
+        """
+        name = well_acquisition.name
+        if "t" not in well_acquisition.get_axes():
+            raise ValueError(
+                f"Can't append time points to well {name}: "
+                "the acquisition has no time axis."
+            )
+        stitched_well_da = self._stitch_well_image(
+            chunks,
+            well_acquisition,
+            output_shape=plate_acquisition.get_common_well_shape(),
+            build_acquisition_mask=False,
+        )
+        image = self._drop_missing_axes(stitched_well_da, well_acquisition)
+        level_0 = group["0"]
+        if image.shape[1:] != level_0.shape[1:]:
+            raise ValueError(
+                f"Can't append time points to well {name}: "
+                f"the existing image has shape {level_0.shape}, but the "
+                f"acquisition has shape {image.shape}."
+            )
+        # Images written before the time points were recorded start at
+        # TimePoint 1 and are complete
+        time_points = group.attrs.get(
+            "time_points", {"first": 1, "n_complete": level_0.shape[0]}
+        )
+        first_time_point = self._get_first_time_point(well_acquisition)
+        start = first_time_point - time_points["first"]
+        n_complete = time_points["n_complete"]
+        if start < 0:
+            raise ValueError(
+                f"Can't append time points to well {name}: the acquisition "
+                f"starts at TimePoint {first_time_point}, before the first "
+                f"time point {time_points['first']} of the image."
+            )
+        if start > n_complete:
+            raise ValueError(
+                f"Can't append time points to well {name}: the acquisition "
+                f"starts at TimePoint {first_time_point}, but the image is only "
+                f"complete up to TimePoint {time_points['first'] + n_complete - 1}."
+            )
+        # Time points of the well, the common shape may be longer
+        stop = start + well_acquisition.get_shape()[0]
+        if stop <= n_complete:
+            logger.info(f"No new time points for well {name}.")
+            return
+
+        logger.info(f"Writing time points {n_complete} to {stop - 1} of well {name}.")
+        paths = [
+            dataset["path"] for dataset in group.attrs["multiscales"][0]["datasets"]
+        ]
+        new_timepoints = image[n_complete - start : stop - start]
+        n_total = max(level_0.shape[0], stop)
+        stores = []
+        for level, path in enumerate(paths):
+            if level > 0:
+                new_timepoints = self._coarsen(new_timepoints)
+            target = group[path]
+            target.resize(n_total, *target.shape[1:])
+            stores.extend(
+                self._slice_stores(
+                    new_timepoints,
+                    target,
+                    self._n_leading_axes(well_acquisition),
+                    t_offset=n_complete,
+                )
+            )
+        wait(self._client.compute(stores))
+        group.attrs["time_points"] = {
+            "first": time_points["first"],
+            "n_complete": stop,
+        }
+
+    @staticmethod
+    def _get_first_time_point(well_acquisition):
+        """TimePoint number of the first time point of a well.
+
+        Acquisitions that don't parse the TimePoint folders start at 1.
+        """
+        get_first_time_point = getattr(well_acquisition, "get_first_time_point", None)
+        first_time_point = (
+            None if get_first_time_point is None else get_first_time_point()
+        )
+        return 1 if first_time_point is None else first_time_point
+
+    def _record_time_points(self, group, well_acquisition):
+        """Save the first TimePoint and the number of complete time points.
+
+        Appending time points places the new ones relative to these. Images
+        without a time axis are skipped.
+        """
+        if "t" not in well_acquisition.get_axes():
+            return
+        group.attrs["time_points"] = {
+            "first": self._get_first_time_point(well_acquisition),
+            "n_complete": well_acquisition.get_shape()[0],
+        }
+
+    @staticmethod
+    def add_wells_to_plate(plate, well_acquisitions):
+        """Add the wells that are not yet listed in the plate metadata.
+
+        Raises:
+            ValueError: If a well is not part of the rows and columns of the
+                plate. The plate metadata is left unchanged in that case.
+        """
+        plate_attrs = plate.attrs["plate"]
+        well_paths = {well["path"] for well in plate_attrs["wells"]}
+        row_names = [r["name"] for r in plate_attrs["rows"]]
+        column_names = [c["name"] for c in plate_attrs["columns"]]
+        new_wells = []
+        for well_acquisition in well_acquisitions:
+            row, col = well_acquisition.get_row_col()
+            if f"{row}/{col}" in well_paths:
+                continue
+            if row not in row_names or col not in column_names:
+                raise ValueError(
+                    f"Well {row}{col} is not part of the layout of the existing "
+                    f"plate with the rows {row_names} and columns "
+                    f"{column_names}."
+                )
+            well_paths.add(f"{row}/{col}")
+            new_wells.append(
+                {
+                    "path": f"{row}/{col}",
+                    "rowIndex": row_names.index(row),
+                    "columnIndex": column_names.index(col),
+                }
+            )
+        plate_attrs["wells"].extend(new_wells)
+        plate.attrs["plate"] = plate_attrs
+
+    @staticmethod
+    def get_next_well_sub_group(plate) -> str:
+        """First numeric well sub group that is not used by any well of a plate.
+
+        Sub groups listed in the well metadata and groups that exist without
+        being listed (e.g. of an interrupted conversion) are both taken.
+        """
+        used = []
+        for well in plate.attrs["plate"]["wells"]:
+            if well["path"] not in plate:
+                continue
+            well_group = plate[well["path"]]
+            images = well_group.attrs.asdict().get("well", {}).get("images", [])
+            used.extend(image["path"] for image in images)
+            used.extend(well_group.group_keys())
+        numbers = [int(path) for path in used if path.isdigit()]
+        return str(max(numbers, default=-1) + 1)
+
+
+def _load_tile_zyx(tile, build_acquisition_mask=False):
+    """Image data of a tile with a z axis, or a mask of ones."""
+    shape = (1,) * (3 - len(tile.shape)) + tuple(tile.shape)
+    if build_acquisition_mask:
+        return np.ones(shape, dtype=bool)
+    return tile.load_data().reshape(shape)
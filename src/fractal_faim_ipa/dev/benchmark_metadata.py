@@ -0,0 +1,110 @@
+"""Compare the executors that parse the tile positions of an acquisition.
+
+Writes a synthetic MetaXpress export and parses it with every executor of
+`fractal_faim_ipa.tile_positions`, starting with an empty metadata cache
+for every run. For example:
+
+    python -m fractal_faim_ipa.dev.benchmark_metadata --wells 24 --z-planes 10
+"""
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from faim_ipa.hcs.acquisition import TileAlignmentOptions
+
+from fractal_faim_ipa import tiff_utils
+from fractal_faim_ipa.dev.synthetic_plate import write_metaxpress_plate
+from fractal_faim_ipa.md_converter_utils import ModeEnum
+
+logger = logging.getLogger(__name__)
+
+
+def benchmark(
+    image_dir: str,
+    executors: tuple[str, ...] = ("threads", "processes"),
+    repeats: int = 3,
+) -> list[dict[str, Any]]:
+    """Time parsing `image_dir` as MetaXpress stack acquisition.
+
+    Returns:
+        The fastest of `repeats` runs of each executor, with the number of
+        tiles and the tiles parsed per second.
+    """
+    results = []
+    for executor in executors:
+        seconds = []
+        for _ in range(repeats):
+            tiff_utils._load_metaseries_tiff_metadata.cache_clear()
+            start = time.perf_counter()
+            plate_acquisition = (
+                ModeEnum.MetaXpressStackAcquisition.get_plate_acquisition(
+                    acquisition_dir=image_dir,
+                    alignment=TileAlignmentOptions.GRID,
+                    metadata_executor=executor,
+                )
+            )
+            seconds.append(time.perf_counter() - start)
+        n_tiles = sum(
+            len(well.get_tiles()) for well in plate_acquisition.get_well_acquisitions()
+        )
+        results.append(
+            {
+                "executor": executor,
+                "n_tiles": n_tiles,
+                "seconds": round(min(seconds), 3),
+                "tiles_per_s": round(n_tiles / min(seconds), 1),
+            }
+        )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> list[dict[str, Any]]:
+    """Run the metadata benchmark from the command line and return the results.
+
+    Args:
+        argv: Command line arguments, `sys.argv[1:]` if None.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m fractal_faim_ipa.dev.benchmark_metadata",
+        description="Compare parsing the tile positions with threads and processes.",
+    )
+    parser.add_argument(
+        "image_dir",
+        nargs="?",
+        help="MetaXpress stack acquisition, a synthetic one by default.",
+    )
+    parser.add_argument("--wells", type=int, default=8)
+    parser.add_argument("--grid", type=int, nargs=2, default=(3, 3))
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--z-planes", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_dir = args.image_dir
+        if image_dir is None:
+            image_dir = write_metaxpress_plate(
+                Path(tmp_dir) / "images",
+                wells=tuple(
+                    f"{'ABCDEFGH'[i // 12]}{i % 12 + 1:02d}" for i in range(args.wells)
+                ),
+                grid_shape=tuple(args.grid),
+                n_channels=args.channels,
+                n_z=args.z_planes,
+                tile_shape=(16, 16),
+            )
+        results = benchmark(str(image_dir), repeats=args.repeats)
+    for result in results:
+        logger.info(
+            f"{result['executor']:>10}: {result['seconds']:8.3f} s, "
+            f"{result['tiles_per_s']:10.1f} tiles/s ({result['n_tiles']} tiles)"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
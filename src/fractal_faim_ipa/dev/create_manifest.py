@@ -2,6 +2,11 @@
 
 from fractal_tasks_core.dev.create_manifest import create_manifest
 
+PACKAGE = "fractal_faim_ipa"
+CUSTOM_PYDANTIC_MODELS = [
+    (PACKAGE, "input_models.py", "PlateInput"),
+    (PACKAGE, "input_models.py", "ReadPolicy"),
+]
+
 if __name__ == "__main__":
-    PACKAGE = "fractal_faim_ipa"
-    create_manifest(package=PACKAGE)
+    create_manifest(package=PACKAGE, custom_pydantic_models=CUSTOM_PYDANTIC_MODELS)
@@ -0,0 +1,136 @@
+"""Write small synthetic MetaXpress exports for tests and benchmarks."""
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+import tifffile
+
+_PLANE_INFO_TEMPLATE = """<MetaData>
+<prop id="Description" type="string" value="Synthetic MetaXpress export"/>
+<prop id="MetaDataVersion" type="float" value="1"/>
+<prop id="ApplicationName" type="string" value="MetaMorph"/>
+<prop id="ApplicationVersion" type="string" value="6.5.2.351"/>
+<PlaneInfo>
+<prop id="plane-type" type="string" value="plane"/>
+<prop id="pixel-size-x" type="int" value="{size_x}"/>
+<prop id="pixel-size-y" type="int" value="{size_y}"/>
+<prop id="bits-per-pixel" type="int" value="16"/>
+<prop id="spatial-calibration-state" type="bool" value="on"/>
+<prop id="spatial-calibration-x" type="float" value="{calibration}"/>
+<prop id="spatial-calibration-y" type="float" value="{calibration}"/>
+<prop id="spatial-calibration-units" type="string" value="um"/>
+<prop id="image-name" type="string" value="{illumination}"/>
+<prop id="stage-position-x" type="float" value="{stage_x}"/>
+<prop id="stage-position-y" type="float" value="{stage_y}"/>
+<prop id="stage-label" type="string" value="{well} : Site {site}"/>
+<prop id="z-position" type="float" value="{stage_z}"/>
+<prop id="wavelength" type="float" value="{wavelength}"/>
+<prop id="_IllumSetting_" type="string" value="{illumination}"/>
+<prop id="_MagNA_" type="float" value="0.75"/>
+<prop id="_MagSetting_" type="string" value="20X Plan Apo Lambda"/>
+<custom-prop id="Exposure Time" type="string" value="15 ms"/>
+<custom-prop id="ImageXpress Micro X" type="float" value="{stage_x}"/>
+<custom-prop id="ImageXpress Micro Y" type="float" value="{stage_y}"/>
+<custom-prop id="ImageXpress Micro Z" type="float" value="{stage_z}"/>
+<custom-prop id="ShadingCorrection" type="string" value="Off"/>
+<custom-prop id="SiteX" type="float" value="{site_x}"/>
+<custom-prop id="SiteY" type="float" value="{site_y}"/>
+{z_step}</PlaneInfo>
+<SetInfo>
+<prop id="number-of-planes" type="int" value="1"/>
+</SetInfo>
+</MetaData>"""
+
+_WAVELENGTHS = [452, 536, 624, 692]
+
+
+def tile_value(t: int, c: int, z: int, field: int) -> int:
+    """Constant intensity of a synthetic tile, encoding its position."""
+    return 1000 * t + 100 * c + 10 * z + field
+
+
+def write_metaxpress_plate(
+    root_dir: Union[Path, str],
+    *,
+    name: str = "Synthetic",
+    wells: tuple[str, ...] = ("C03",),
+    grid_shape: tuple[int, int] = (1, 2),
+    n_channels: int = 2,
+    n_z: int = 3,
+    timepoints: tuple[int, ...] = (1,),
+    tile_shape: tuple[int, int] = (64, 64),
+    calibration: float = 0.5,
+    z_step: float = 1.5,
+    projection_channels: tuple[int, ...] = (),
+) -> Path:
+    """Write a synthetic MetaXpress export of z-stacks.
+
+    The layout matches the exports parsed by
+    `fractal_faim_ipa.imagexpress_zmb`, i.e.
+    `{root_dir}/TimePoint_{t}/ZStep_{z}/{name}_{well}_s{field}_w{channel}.TIF`.
+    Every tile is filled with the constant value returned by `tile_value`
+    for its (time point, channel, z-plane, field), such that tests can check
+    where tiles ended up.
+
+    Args:
+        root_dir: Directory the export is written to.
+        name: Plate name used as filename prefix.
+        wells: Names of the wells to write.
+        grid_shape: Number of fields per well along (y, x).
+        n_channels: Number of channels.
+        n_z: Number of z-planes.
+        timepoints: Time point indices (as used in `TimePoint_{t}`).
+        tile_shape: Shape of a single tile in (y, x).
+        calibration: Pixel size in micrometer.
+        z_step: Distance between z-planes in micrometer.
+        projection_channels: Channel indices (1-based) that are written as
+            projections, i.e. duplicated into every z-step without a
+            "Z Step" attribute.
+
+    Returns:
+        Path to the written export.
+    """
+    root_dir = Path(root_dir)
+    for t in timepoints:
+        for z in range(1, n_z + 1):
+            z_dir = root_dir / f"TimePoint_{t}" / f"ZStep_{z}"
+            z_dir.mkdir(parents=True, exist_ok=True)
+            for w_index, well in enumerate(wells):
+                for field in range(grid_shape[0] * grid_shape[1]):
+                    site_y, site_x = divmod(field, grid_shape[1])
+                    for c in range(1, n_channels + 1):
+                        projection = c in projection_channels
+                        plane = 0 if projection else z
+                        description = _PLANE_INFO_TEMPLATE.format(
+                            size_x=tile_shape[1],
+                            size_y=tile_shape[0],
+                            calibration=calibration,
+                            illumination=f"Channel_{c}",
+                            wavelength=_WAVELENGTHS[(c - 1) % len(_WAVELENGTHS)],
+                            well=well,
+                            site=field + 1,
+                            site_x=site_x + 1,
+                            site_y=site_y + 1,
+                            stage_x=(w_index * 10 + site_x)
+                            * tile_shape[1]
+                            * calibration,
+                            stage_y=site_y * tile_shape[0] * calibration,
+                            stage_z=100 + plane * z_step,
+                            z_step=""
+                            if projection
+                            else f'<custom-prop id="Z Step" type="float" '
+                            f'value="{z}"/>\n',
+                        )
+                        data = np.full(
+                            tile_shape,
+                            tile_value(t, c, plane, field + 1),
+                            dtype=np.uint16,
+                        )
+                        tifffile.imwrite(
+                            z_dir / f"{name}_{well}_s{field + 1}_w{c}.TIF",
+                            data,
+                            software="MetaSeries",
+                            description=description,
+                            metadata=None,
+                        )
+    return root_dir
@@ -8,4 +8,9 @@ TASK_LIST = [
         executable="convert_ome_zarr.py",
         meta={"cpus_per_task": 8, "mem": 32000},
     ),
+    NonParallelTask(
+        name="FAIM IPA OME-Zarr Batch Converter",
+        executable="convert_ome_zarr_batch.py",
+        meta={"cpus_per_task": 8, "mem": 32000},
+    ),
 ]
@@ -11,13 +11,14 @@ from faim_ipa.hcs.acquisition import (
     WellAcquisition,
 )
 from faim_ipa.io.metadata import ChannelMetadata
-from faim_ipa.io.metaseries import load_metaseries_tiff_metadata
 from faim_ipa.utils import rgb_to_hex, wavelength_to_rgb
-from tqdm import tqdm
 
+from fractal_faim_ipa import archive_utils
 from fractal_faim_ipa.imagexpress_zmb.ImageXpressWellAcquisition import (
     ImageXpressWellAcquisition,
 )
+from fractal_faim_ipa.tile_positions import load_tile_positions
+from fractal_faim_ipa.tiff_utils import load_metaseries_tiff_metadata
 
 
 class ImageXpressPlateAcquisition(PlateAcquisition):
@@ -28,8 +29,14 @@ class ImageXpressPlateAcquisition(PlateAcquisition):
         background_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         illumination_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         query: str = None,
+        keep_time_axis: bool = False,
+        yx_binning: int = 1,
+        metadata_executor: str = "threads",
     ):
         self._query = query
+        self._keep_time_axis = keep_time_axis
+        self._yx_binning = yx_binning
+        self._metadata_executor = metadata_executor
         super().__init__(
             acquisition_dir=acquisition_dir,
             alignment=alignment,
@@ -63,7 +70,11 @@ class ImageXpressPlateAcquisition(PlateAcquisition):
         filename_re: re.Pattern,
     ) -> list[list[dict[dict, str]]]:
         files = []
-        for root, _, filenames in os.walk(root_dir):
+        if archive_utils.is_archive(root_dir):
+            walk = archive_utils.walk(str(root_dir))
+        else:
+            walk = os.walk(root_dir)
+        for root, _, filenames in walk:
             m_root = root_re.fullmatch(root)
             if m_root:
                 for f in filenames:
@@ -88,15 +99,23 @@ class ImageXpressPlateAcquisition(PlateAcquisition):
         raise NotImplementedError
 
     def _build_well_acquisitions(self, files: pd.DataFrame) -> list[WellAcquisition]:
+        # The positions of all wells are read in one pass with the executor
+        positions = load_tile_positions(
+            files["path"].to_numpy(), executor=self._metadata_executor
+        )
         wells = []
-        for well in tqdm(files["well"].unique()):
+        for well in files["well"].unique():
+            in_well = (files["well"] == well).to_numpy()
             wells.append(
                 ImageXpressWellAcquisition(
-                    files=files[files["well"] == well],
+                    files=files[in_well],
                     alignment=self._alignment,
                     z_spacing=self._get_z_spacing(),
                     background_correction_matrices=self._background_correction_matrices,
                     illumination_correction_matrices=self._illumination_correction_matrices,
+                    keep_time_axis=self._keep_time_axis,
+                    yx_binning=self._yx_binning,
+                    positions=positions[in_well],
                 )
             )
 
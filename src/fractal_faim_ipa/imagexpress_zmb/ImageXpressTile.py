@@ -0,0 +1,120 @@
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+from faim_ipa.stitching.tile import Tile, TilePosition
+from numpy.typing import NDArray
+
+from fractal_faim_ipa import blank_tiles
+from fractal_faim_ipa.tiff_utils import imread, load_correction_matrix
+
+
+class ImageXpressTile(Tile):
+    """Tile of an ImageXpress acquisition.
+
+    The image data is read with `fractal_faim_ipa.tiff_utils`, such that
+    tiles can also point to files within tar or zip archives.
+
+    The correction matrices are loaded once per process and applied to the
+    image data in a single buffer. Blank tiles are read as zeros, see
+    `fractal_faim_ipa.blank_tiles`. With `yx_binning`, the image data is
+    binned right after it is read and corrected. `shape` and `position`
+    refer to the binned image.
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str],
+        shape: tuple[int, int],
+        position: TilePosition,
+        background_correction_matrix_path: Union[Path, str, None] = None,
+        illumination_correction_matrix_path: Union[Path, str, None] = None,
+        yx_binning: int = 1,
+    ):
+        super().__init__(
+            path=path,
+            shape=shape,
+            position=position,
+            background_correction_matrix_path=background_correction_matrix_path,
+            illumination_correction_matrix_path=illumination_correction_matrix_path,
+        )
+        self.yx_binning = yx_binning
+
+    def load_data(self) -> NDArray:
+        """Read the tile, correct it and bin it in yx.
+
+        Blank tiles (see `fractal_faim_ipa.blank_tiles`) are returned as
+        zeros without being corrected. Otherwise the background and
+        illumination corrections are applied before the binning.
+        """
+        data = imread(self.path)
+        if blank_tiles.is_blank(self.path, data):
+            *leading_shape, n_y, n_x = data.shape
+            return np.zeros(
+                (*leading_shape, n_y // self.yx_binning, n_x // self.yx_binning),
+                dtype=data.dtype,
+            )
+        data = self._apply_corrections(data)
+        return bin_yx(data, self.yx_binning)
+
+    def _apply_corrections(self, data: NDArray) -> NDArray:
+        """Subtract the background and divide by the illumination matrix.
+
+        Both corrections are computed in place in one float32 copy of the
+        data, which is clipped to the range of the data type and cast back
+        once.
+        """
+        background_path = self.background_correction_matrix_path
+        illumination_path = self.illumination_correction_matrix_path
+        if background_path is None and illumination_path is None:
+            return data
+        corrected = data.astype(np.float32)
+        if background_path is not None:
+            np.subtract(
+                corrected,
+                self._load_matrix(background_path, data.shape),
+                out=corrected,
+            )
+        if illumination_path is not None:
+            np.divide(
+                corrected,
+                self._load_matrix(illumination_path, data.shape),
+                out=corrected,
+            )
+        if np.issubdtype(data.dtype, np.integer):
+            info = np.iinfo(data.dtype)
+            np.clip(corrected, info.min, info.max, out=corrected)
+        return corrected.astype(data.dtype)
+
+    @staticmethod
+    def _load_matrix(path: Union[Path, str], shape: tuple[int, ...]) -> NDArray:
+        matrix = load_correction_matrix(path)
+        if matrix.shape != shape:
+            raise ValueError(
+                f"Correction matrix {path} has shape {matrix.shape}, "
+                f"but the image has shape {shape}."
+            )
+        return matrix
+
+
+def bin_yx(data: NDArray, factor: int) -> NDArray:
+    """Average blocks of `factor` x `factor` pixels along the last two axes.
+
+    Excess pixels at the lower and right border are trimmed. Integer data is
+    summed in 64 bit and divided without rounding, like the mean of
+    `faim_ipa.dask_utils.mean_cast_to`.
+    """
+    if factor == 1:
+        return data
+    *leading_shape, n_y, n_x = data.shape
+    n_y, n_x = n_y // factor, n_x // factor
+    blocks = data[..., : n_y * factor, : n_x * factor].reshape(
+        *leading_shape, n_y, factor, n_x, factor
+    )
+    if np.issubdtype(data.dtype, np.integer):
+        sum_dtype = (
+            np.int64 if np.issubdtype(data.dtype, np.signedinteger) else np.uint64
+        )
+        block_sums = blocks.sum(axis=(-3, -1), dtype=sum_dtype)
+        return (block_sums // (factor * factor)).astype(data.dtype)
+    return blocks.mean(axis=(-3, -1)).astype(data.dtype)
@@ -1,16 +1,24 @@
 from pathlib import Path
 from typing import Optional, Union
 
-import dask
-import dask.array as da
 import numpy as np
 import pandas as pd
 from faim_ipa.hcs.acquisition import TileAlignmentOptions, WellAcquisition
-from faim_ipa.io.metaseries import load_metaseries_tiff_metadata
 from faim_ipa.stitching.tile import Tile, TilePosition
 
+from fractal_faim_ipa.imagexpress_zmb.ImageXpressTile import ImageXpressTile
+from fractal_faim_ipa.tile_positions import load_tile_positions
+from fractal_faim_ipa.tiff_utils import load_metaseries_tiff_metadata
+
 
 class ImageXpressWellAcquisition(WellAcquisition):
+    """Well of an ImageXpress acquisition.
+
+    The tile sizes and positions are passed as `positions` (see
+    `tile_positions.load_tile_positions`) if they were read for all wells of
+    the plate at once, otherwise they are read from the files.
+    """
+
     def __init__(
         self,
         files: pd.DataFrame,
@@ -18,8 +26,14 @@ class ImageXpressWellAcquisition(WellAcquisition):
         z_spacing: Optional[float],
         background_correction_matrices: dict[str, Union[Path, str]] = None,
         illumination_correction_matrices: dict[str, Union[Path, str]] = None,
+        keep_time_axis: bool = False,
+        yx_binning: int = 1,
+        positions: Optional[np.ndarray] = None,
     ) -> None:
+        self._positions = positions
         self._z_spacing = z_spacing
+        self._keep_time_axis = keep_time_axis
+        self._yx_binning = yx_binning
         super().__init__(
             files=files,
             alignment=alignment,
@@ -28,29 +42,9 @@ class ImageXpressWellAcquisition(WellAcquisition):
         )
 
     def _assemble_tiles(self) -> list[Tile]:
-        def _load_positions(fn):
-            metadata = load_metaseries_tiff_metadata(fn)
-            out = np.array(
-                [
-                    metadata["pixel-size-y"],
-                    metadata["pixel-size-x"],
-                    int(
-                        metadata["stage-position-y"] / metadata["spatial-calibration-y"]
-                    ),
-                    int(
-                        metadata["stage-position-x"] / metadata["spatial-calibration-x"]
-                    ),
-                ]
-            )
-            return out
-
-        fns = self._files.path.to_numpy()
-        lazy_positions = [dask.delayed(_load_positions)(fn) for fn in fns]
-        arrays = [
-            da.from_delayed(lazy_position, dtype=int, shape=(4,))
-            for lazy_position in lazy_positions
-        ]
-        positions = da.stack(arrays, axis=0).compute()
+        positions = self._positions
+        if positions is None:
+            positions = load_tile_positions(self._files.path.to_numpy())
 
         tiles = []
         for (_i, row), pos in zip(self._files.iterrows(), positions):
@@ -62,38 +56,55 @@ class ImageXpressWellAcquisition(WellAcquisition):
             else:
                 z = row["z"] if row["z"] is not None else 1
 
+            # Channels without a matrix are not corrected
             bgcm = None
             if self._background_correction_matrices is not None:
-                bgcm = self._background_correction_matrices[channel]
+                bgcm = self._background_correction_matrices.get(channel)
 
             icm = None
             if self._illumination_correction_matrices is not None:
-                icm = self._illumination_correction_matrices[channel]
+                icm = self._illumination_correction_matrices.get(channel)
 
             tiles.append(
-                Tile(
+                ImageXpressTile(
                     path=file,
-                    shape=(pos[0], pos[1]),
+                    shape=(pos[0] // self._yx_binning, pos[1] // self._yx_binning),
                     position=TilePosition(
                         time=time_point,
                         channel=int(channel[1:]),
                         z=z,
-                        y=pos[2],
-                        x=pos[3],
+                        y=pos[2] // self._yx_binning,
+                        x=pos[3] // self._yx_binning,
                     ),
                     background_correction_matrix_path=bgcm,
                     illumination_correction_matrix_path=icm,
+                    yx_binning=self._yx_binning,
                 )
             )
         return tiles
 
     def get_yx_spacing(self) -> tuple[float, float]:
         metadata = load_metaseries_tiff_metadata(self._files.iloc[0]["path"])
-        return (metadata["spatial-calibration-y"], metadata["spatial-calibration-x"])
+        return (
+            metadata["spatial-calibration-y"] * self._yx_binning,
+            metadata["spatial-calibration-x"] * self._yx_binning,
+        )
 
     def get_z_spacing(self) -> Optional[float]:
         return self._z_spacing
 
+    def get_first_time_point(self) -> Optional[int]:
+        """Number of the first TimePoint folder of the well.
+
+        None if the files are not sorted into TimePoint folders.
+        """
+        if "t" not in self._files.columns:
+            return None
+        time_points = self._files["t"].dropna()
+        if len(time_points) == 0:
+            return None
+        return int(time_points.astype(int).min())
+
     def get_axes(self) -> list[str]:
         axes = ["y", "x"]
 
@@ -103,7 +114,10 @@ class ImageXpressWellAcquisition(WellAcquisition):
         if self._files["channel"].nunique() > 1:
             axes = ["c", *axes]
 
-        if "t" in self._files.columns and self._files["t"].nunique() > 1:
+        # Keeping a time axis of length 1 allows appending time points later
+        if "t" in self._files.columns and (
+            self._files["t"].nunique() > 1 or self._keep_time_axis
+        ):
             axes = ["t", *axes]
 
         return axes
@@ -6,9 +6,9 @@ from typing import Optional, Union
 import numpy as np
 import pandas as pd
 from faim_ipa.hcs.acquisition import TileAlignmentOptions
-from faim_ipa.io.metaseries import load_metaseries_tiff_metadata
 
 from fractal_faim_ipa.imagexpress_zmb import ImageXpressPlateAcquisition
+from fractal_faim_ipa.tiff_utils import load_metaseries_tiff_metadata
 
 
 class MixedAcquisition(ImageXpressPlateAcquisition):
@@ -46,6 +46,9 @@ class MixedAcquisition(ImageXpressPlateAcquisition):
         background_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         illumination_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         query: str = None,
+        keep_time_axis: bool = False,
+        yx_binning: int = 1,
+        metadata_executor: str = "threads",
     ):
         super().__init__(
             acquisition_dir=acquisition_dir,
@@ -53,6 +56,9 @@ class MixedAcquisition(ImageXpressPlateAcquisition):
             background_correction_matrices=background_correction_matrices,
             illumination_correction_matrices=illumination_correction_matrices,
             query=query,
+            keep_time_axis=keep_time_axis,
+            yx_binning=yx_binning,
+            metadata_executor=metadata_executor,
         )
 
     def _parse_files(self) -> pd.DataFrame:
@@ -91,6 +97,9 @@ class MixedAcquisition(ImageXpressPlateAcquisition):
         subset = files[files["channel"] == channel_with_stack]
         subset = subset[subset["well"] == np.sort(subset["well"].unique())[0]]
         subset = subset[subset["field"] == np.sort(subset["field"].unique())[0]]
+        # Only use the first time point, otherwise planes of later time points
+        # are interleaved with the first stack
+        subset = subset[subset["t"] == np.sort(subset["t"].unique())[0]]
 
         plane_positions = []
 
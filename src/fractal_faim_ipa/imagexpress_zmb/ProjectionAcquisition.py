@@ -0,0 +1,79 @@
+import re
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+from faim_ipa.hcs.acquisition import TileAlignmentOptions
+
+from fractal_faim_ipa.imagexpress_zmb import ImageXpressPlateAcquisition
+
+
+class ProjectionAcquisition(ImageXpressPlateAcquisition):
+    """Projections exported by MetaXpress alongside the z-stacks.
+
+    MetaXpress writes a copy of each projection to every ZStep_* folder. They
+    are identified while parsing a `StackAcquisition` (projections have no
+    "Z Step" metadata), which passes the files of the first z-step on to
+    this acquisition. The directory is not scanned again.
+
+    Channels are renumbered consecutively, starting at w1, as the projected
+    channels are usually a subset of all channels. The correction matrices
+    are keyed by the original channels.
+    """
+
+    def __init__(
+        self,
+        acquisition_dir: Union[Path, str],
+        alignment: TileAlignmentOptions,
+        files: pd.DataFrame,
+        background_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
+        illumination_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
+        keep_time_axis: bool = False,
+        yx_binning: int = 1,
+        metadata_executor: str = "threads",
+    ):
+        channels = sorted(files["channel"].unique(), key=lambda c: int(c[1:]))
+        new_channels = {channel: f"w{i + 1}" for i, channel in enumerate(channels)}
+        self._projection_files = files.assign(
+            channel=files["channel"].map(new_channels)
+        )
+        super().__init__(
+            acquisition_dir=acquisition_dir,
+            alignment=alignment,
+            background_correction_matrices=_rename_channels(
+                background_correction_matrices, new_channels
+            ),
+            illumination_correction_matrices=_rename_channels(
+                illumination_correction_matrices, new_channels
+            ),
+            keep_time_axis=keep_time_axis,
+            yx_binning=yx_binning,
+            metadata_executor=metadata_executor,
+        )
+
+    def _parse_files(self) -> pd.DataFrame:
+        return self._projection_files
+
+    def _get_root_re(self) -> re.Pattern:
+        return re.compile(r".*[\/\\]TimePoint_(?P<t>\d+)[\/\\]ZStep_(?!0)(?P<z>\d+)")
+
+    def _get_filename_re(self) -> re.Pattern:
+        return re.compile(
+            r"(?P<name>.*)_(?P<well>[A-Z]+\d{2})_(?P<field>s\d+)_(?P<channel>w[1-9]{1})(?P<ext>.TIF)"
+        )
+
+    def _get_z_spacing(self) -> Optional[float]:
+        return None
+
+
+def _rename_channels(
+    matrices: Optional[dict[str, Union[Path, str]]], new_channels: dict[str, str]
+) -> Optional[dict[str, Union[Path, str]]]:
+    """Key the correction matrices of the projected channels by their new name."""
+    if matrices is None:
+        return None
+    return {
+        new_channels[channel]: path
+        for channel, path in matrices.items()
+        if channel in new_channels
+    }
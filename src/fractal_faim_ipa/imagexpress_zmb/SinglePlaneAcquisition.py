@@ -42,6 +42,9 @@ class SinglePlaneAcquisition(ImageXpressPlateAcquisition):
         background_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         illumination_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         query: str = None,
+        keep_time_axis: bool = False,
+        yx_binning: int = 1,
+        metadata_executor: str = "threads",
     ):
         super().__init__(
             acquisition_dir=acquisition_dir,
@@ -49,6 +52,9 @@ class SinglePlaneAcquisition(ImageXpressPlateAcquisition):
             background_correction_matrices=background_correction_matrices,
             illumination_correction_matrices=illumination_correction_matrices,
             query=query,
+            keep_time_axis=keep_time_axis,
+            yx_binning=yx_binning,
+            metadata_executor=metadata_executor,
         )
 
     def _get_root_re(self) -> re.Pattern:
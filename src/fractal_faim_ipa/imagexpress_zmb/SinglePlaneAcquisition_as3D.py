@@ -9,8 +9,7 @@ from fractal_faim_ipa.imagexpress_zmb import ImageXpressPlateAcquisition
 
 
 class SinglePlaneAcquisition_as3D(ImageXpressPlateAcquisition):
-    """XXX
-    """
+    """XXX"""
 
     _z_spacing: float = None
 
@@ -21,6 +20,9 @@ class SinglePlaneAcquisition_as3D(ImageXpressPlateAcquisition):
         background_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         illumination_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         query: str = None,
+        keep_time_axis: bool = False,
+        yx_binning: int = 1,
+        metadata_executor: str = "threads",
     ):
         super().__init__(
             acquisition_dir=acquisition_dir,
@@ -28,19 +30,23 @@ class SinglePlaneAcquisition_as3D(ImageXpressPlateAcquisition):
             background_correction_matrices=background_correction_matrices,
             illumination_correction_matrices=illumination_correction_matrices,
             query=query,
+            keep_time_axis=keep_time_axis,
+            yx_binning=yx_binning,
+            metadata_executor=metadata_executor,
         )
 
     def _parse_files(self) -> pd.DataFrame:
         files = super()._parse_files()
         if len(files.z.unique()) != 1:
-            raise RuntimeError("More than one z-plane found. One can filter the files using a query, e.g. query=\"z=='0'\"")
+            raise RuntimeError(
+                "More than one z-plane found. One can filter the files using a "
+                "query, e.g. query=\"z=='0'\""
+            )
         self._z_spacing = self._compute_z_spacing(files)
         return files
 
     def _get_root_re(self) -> re.Pattern:
-        return re.compile(
-            r".*[\/\\]TimePoint_(?P<t>\d+)[\/\\]ZStep_(?P<z>\d+)"
-        )
+        return re.compile(r".*[\/\\]TimePoint_(?P<t>\d+)[\/\\]ZStep_(?P<z>\d+)")
 
     def _get_filename_re(self) -> re.Pattern:
         return re.compile(
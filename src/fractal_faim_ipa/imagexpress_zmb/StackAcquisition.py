@@ -6,9 +6,12 @@ from typing import Optional, Union
 import numpy as np
 import pandas as pd
 from faim_ipa.hcs.acquisition import TileAlignmentOptions
-from faim_ipa.io.metaseries import load_metaseries_tiff_metadata
 
 from fractal_faim_ipa.imagexpress_zmb import ImageXpressPlateAcquisition
+from fractal_faim_ipa.imagexpress_zmb.ProjectionAcquisition import (
+    ProjectionAcquisition,
+)
+from fractal_faim_ipa.tiff_utils import load_metaseries_tiff_metadata
 
 
 class StackAcquisition(ImageXpressPlateAcquisition):
@@ -35,9 +38,13 @@ class StackAcquisition(ImageXpressPlateAcquisition):
 
     Image data is stored in {name}_{well}_{field}_w{channel}{md_id}.tif.
     The *_thumb*.tif files, used by Molecular Devices as preview, are ignored.
+
+    Projections are removed from the stack acquisition. With
+    `keep_projections`, they are kept for `get_projection_acquisition`.
     """
 
     _z_spacing: float = None
+    _projection_files: Optional[pd.DataFrame] = None
 
     def __init__(
         self,
@@ -46,13 +53,21 @@ class StackAcquisition(ImageXpressPlateAcquisition):
         background_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         illumination_correction_matrices: Optional[dict[str, Union[Path, str]]] = None,
         query: str = None,
+        keep_time_axis: bool = False,
+        yx_binning: int = 1,
+        metadata_executor: str = "threads",
+        keep_projections: bool = False,
     ):
+        self._keep_projections = keep_projections
         super().__init__(
             acquisition_dir=acquisition_dir,
             alignment=alignment,
             background_correction_matrices=background_correction_matrices,
             illumination_correction_matrices=illumination_correction_matrices,
             query=query,
+            keep_time_axis=keep_time_axis,
+            yx_binning=yx_binning,
+            metadata_executor=metadata_executor,
         )
 
     def _parse_files(self) -> pd.DataFrame:
@@ -60,6 +75,7 @@ class StackAcquisition(ImageXpressPlateAcquisition):
         files = super()._parse_files()
         # single-planes and projections are unnecessarily duplicated
         # -> remove duplicates from files & remove all projections
+        projection_files = []
         for c in files.channel.unique():
             file = files[
                 (files.channel == c) & (files.z != "0") & (files.z != "1")
@@ -71,10 +87,39 @@ class StackAcquisition(ImageXpressPlateAcquisition):
                 if metadata["Z Step"] == 1:
                     files = files[~((files["channel"] == c) & (files["z"] != "1"))]
             else:
+                if self._keep_projections:
+                    projection_files.append(
+                        files[(files["channel"] == c) & (files["z"] == "1")]
+                    )
                 files = files[~(files["channel"] == c)]
+        if len(projection_files) > 0:
+            self._projection_files = pd.concat(projection_files).drop(columns="z")
         self._z_spacing = self._compute_z_spacing(files)
         return files
 
+    def get_projection_acquisition(self) -> Optional[ProjectionAcquisition]:
+        """Acquisition of the projections that were exported with the stacks.
+
+        The projections are taken from the files classified while parsing
+        the stacks, without scanning the acquisition again.
+
+        Returns:
+            None if the acquisition contains no projections or
+            `keep_projections` is not set.
+        """
+        if self._projection_files is None:
+            return None
+        return ProjectionAcquisition(
+            acquisition_dir=self._acquisition_dir,
+            alignment=self._alignment,
+            files=self._projection_files,
+            background_correction_matrices=self._background_correction_matrices,
+            illumination_correction_matrices=self._illumination_correction_matrices,
+            keep_time_axis=self._keep_time_axis,
+            yx_binning=self._yx_binning,
+            metadata_executor=self._metadata_executor,
+        )
+
     def _get_root_re(self) -> re.Pattern:
         return re.compile(r".*[\/\\]TimePoint_(?P<t>\d+)[\/\\]ZStep_(?!0)(?P<z>\d+)")
 
@@ -92,6 +137,9 @@ class StackAcquisition(ImageXpressPlateAcquisition):
         subset = files[files["channel"] == channel_with_stack]
         subset = subset[subset["well"] == np.sort(subset["well"].unique())[0]]
         subset = subset[subset["field"] == np.sort(subset["field"].unique())[0]]
+        # Only use the first time point, otherwise planes of later time points
+        # are interleaved with the first stack
+        subset = subset[subset["t"] == np.sort(subset["t"].unique())[0]]
 
         plane_positions = []
 
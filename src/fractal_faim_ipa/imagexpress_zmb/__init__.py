@@ -1,6 +1,8 @@
 from .ImageXpressPlateAcquisition import ImageXpressPlateAcquisition  # noqa: F401
 from .ImageXpressWellAcquisition import ImageXpressWellAcquisition  # noqa: F401
+from .ImageXpressTile import ImageXpressTile  # noqa: F401
 from .SinglePlaneAcquisition import SinglePlaneAcquisition  # noqa: F401
 from .SinglePlaneAcquisition_as3D import SinglePlaneAcquisition_as3D  # noqa: F401
+from .ProjectionAcquisition import ProjectionAcquisition  # noqa: F401
 from .StackAcquisition import StackAcquisition  # noqa: F401
 from .MixedAcquisition import MixedAcquisition  # noqa: F401
@@ -0,0 +1,42 @@
+"""Pydantic models of the task arguments."""
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PlateInput(BaseModel):
+    """A plate to convert in a batch.
+
+    Attributes:
+        image_dir: Path to the folder containing the images to be converted.
+        zarr_name: Name of the zarr plate file that will be created.
+        barcode: Barcode of the plate.
+    """
+
+    image_dir: str
+    zarr_name: str
+    barcode: str = "example-barcode"
+
+
+class ReadPolicy(BaseModel):
+    """How reads of source files are guarded against slow or hung storage.
+
+    Attributes:
+        timeout: Seconds after which a read attempt is abandoned. None waits
+            indefinitely.
+        max_retries: Number of further attempts after an attempt failed or
+            timed out.
+        backoff: Seconds to wait before the first retry, doubled for every
+            further retry.
+        speculation_factor: A duplicate read of the same file is started when
+            an attempt takes longer than this multiple of the median read
+            time, and the first result is used. 0 disables duplicate reads.
+        min_speculation_delay: Minimum seconds before a duplicate read is
+            started.
+    """
+
+    timeout: Optional[float] = 120
+    max_retries: int = 2
+    backoff: float = 1.0
+    speculation_factor: float = 10
+    min_speculation_delay: float = 5.0
@@ -0,0 +1,78 @@
+"""Per-channel intensity histograms and display windows."""
+from typing import Optional
+
+import anndata as ad
+import dask
+import dask.array as da
+import numpy as np
+import pandas as pd
+
+# Percentiles of the plate intensities used as OMERO display window
+WINDOW_PERCENTILES = (0.1, 99.9)
+
+
+def _bincount(block: np.ndarray, n_bins: int, dtype: np.dtype) -> np.ndarray:
+    # Blocks of empty channels may not have the dtype of the image
+    return np.bincount(block.astype(dtype, copy=False).ravel(), minlength=n_bins)
+
+
+def channel_histograms(image: da.Array, channel_axis: Optional[int]) -> da.Array:
+    """Histograms of the intensities of each channel of an integer image.
+
+    Every intensity value is counted in its own bin. The histograms are built
+    from the blocks of `image`, such that they are computed from the same
+    in-memory blocks as the data written to disk, if computed together.
+
+    Args:
+        image: Dask array of unsigned integer type.
+        channel_axis: Index of the channel axis, None if `image` has a single
+            channel.
+
+    Returns:
+        Dask array of shape (channels, intensity values).
+    """
+    if not np.issubdtype(image.dtype, np.unsignedinteger):
+        raise ValueError(f"Histograms require unsigned integer data, got {image.dtype}")
+    if channel_axis is None:
+        image = image[np.newaxis]
+        channel_axis = 0
+    image = da.moveaxis(image, channel_axis, 0)
+    n_bins = int(np.iinfo(image.dtype).max) + 1
+    histograms = []
+    for channel in range(image.shape[0]):
+        partial_histograms = [
+            da.from_delayed(
+                dask.delayed(_bincount)(block, n_bins, image.dtype),
+                shape=(n_bins,),
+                dtype=np.int64,
+            )
+            for block in image[channel].to_delayed(optimize_graph=False).ravel()
+        ]
+        histograms.append(da.stack(partial_histograms).sum(axis=0))
+    return da.stack(histograms)
+
+
+def get_window(
+    histogram: np.ndarray, percentiles: tuple[float, float] = WINDOW_PERCENTILES
+) -> tuple[int, int]:
+    """Intensities at the lower and upper `percentiles` of a histogram."""
+    cumulative = np.cumsum(histogram)
+    if cumulative[-1] == 0:
+        return 0, len(histogram) - 1
+    start, end = np.searchsorted(
+        cumulative, np.array(percentiles) / 100 * cumulative[-1], side="left"
+    )
+    return int(start), int(end)
+
+
+def create_histogram_table(histograms: np.ndarray, channel_labels: list[str]):
+    """Table of the intensity histograms with one column per channel.
+
+    Rows correspond to intensity values, up to the highest intensity present.
+    """
+    n_values = np.flatnonzero(histograms.any(axis=0)).max(initial=0) + 1
+    return ad.AnnData(
+        X=histograms[:, :n_values].T,
+        obs=pd.DataFrame(index=[str(value) for value in range(n_values)]),
+        var=pd.DataFrame(index=channel_labels),
+    )
@@ -1,14 +1,17 @@
 """MD Converter utils."""
+import os
+import re
 from enum import Enum
 
-from faim_ipa.hcs.imagexpress import (
-    MixedAcquisition,
-    SinglePlaneAcquisition,
-    StackAcquisition,
+# Image files of MD exports end with a unique id, MetaXpress exports don't
+_MD_FILENAME_RE = re.compile(
+    r".*_[A-Z]+\d{2}_?(?:s\d+)?_?(?P<channel>w[1-9])(?!_thumb)"
+    r"[0-9A-F]{8}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{12}\.tif"
 )
-
-import fractal_faim_ipa
-import fractal_faim_ipa.imagexpress_zmb
+_METAXPRESS_FILENAME_RE = re.compile(r".*_[A-Z]+\d{2}_s\d+_(?P<channel>w[1-9])\.TIF")
+_Z_STEP_RE = re.compile(r"ZStep_(?P<z>\d+)")
+# Maximum depth below the acquisition directory to look for image files
+_MAX_DETECTION_DEPTH = 5
 
 
 class ModeEnum(Enum):
@@ -23,9 +26,64 @@ class ModeEnum(Enum):
         "MetaXpress MD Single Plane Acquisition as 3D"
     )
     MetaXpressMixedAcquisition = "MetaXpress MD Mixed Acquisition"
+    MetaXpressStackAndProjectionAcquisition = (
+        "MetaXpress MD Stack and Projection Acquisition"
+    )
+
+    @property
+    def is_metaxpress(self) -> bool:
+        """Whether the mode parses MetaXpress exports (`imagexpress_zmb`)."""
+        return self.value.startswith("MetaXpress")
+
+    @property
+    def is_3D(self) -> bool:
+        """Whether the mode converts z-stacks."""
+        return self not in (
+            ModeEnum.SinglePlaneAcquisition,
+            ModeEnum.MetaXpressSinglePlaneAcquisition,
+            ModeEnum.MetaXpressSinglePlaneAcquisition_as3D,
+        )
+
+    def tile_binning(self, binning: int) -> int:
+        """Part of `binning` that is applied to the tiles when they are read.
+
+        MetaXpress tiles are binned before stitching, the images of the other
+        modes are binned after stitching by the converter.
+        """
+        return binning if self.is_metaxpress else 1
+
+    def get_plate_acquisition(
+        self,
+        acquisition_dir,
+        alignment,
+        query=None,
+        keep_time_axis=False,
+        yx_binning=1,
+        background_correction_matrices=None,
+        illumination_correction_matrices=None,
+        metadata_executor="threads",
+    ):
+        """Run acquisition function for chosen mode.
+
+        `query`, `keep_time_axis`, `yx_binning`, the correction matrices
+        (paths keyed by channel, e.g. "w1") and `metadata_executor` are only
+        supported by the MetaXpress modes. Their tiles are binned when they
+        are read, see `tile_binning`. Their tile positions are parsed with
+        threads or processes, see `fractal_faim_ipa.tile_positions`.
+        In "MetaXpress MD Stack and Projection Acquisition" mode, the stacks are
+        returned and the projections are available from their
+        `get_projection_acquisition`.
+        """
+        # The acquisition classes are only imported when they are used, as
+        # they import most of the converter dependencies
+        from faim_ipa.hcs.imagexpress import (
+            MixedAcquisition,
+            SinglePlaneAcquisition,
+            StackAcquisition,
+        )
+
+        import fractal_faim_ipa.imagexpress_zmb
 
-    def get_plate_acquisition(self, acquisition_dir, alignment, query=None):
-        """Run acquisition function for chosen mode."""
         if self == ModeEnum.StackAcquisition:
             return StackAcquisition(acquisition_dir, alignment)
         elif self == ModeEnum.SinglePlaneAcquisition:
@@ -34,19 +92,214 @@ class ModeEnum(Enum):
             return MixedAcquisition(acquisition_dir, alignment)
         elif self == ModeEnum.MetaXpressStackAcquisition:
             return fractal_faim_ipa.imagexpress_zmb.StackAcquisition(
-                acquisition_dir, alignment, query=query
+                acquisition_dir,
+                alignment,
+                query=query,
+                keep_time_axis=keep_time_axis,
+                yx_binning=yx_binning,
+                metadata_executor=metadata_executor,
+                background_correction_matrices=background_correction_matrices,
+                illumination_correction_matrices=illumination_correction_matrices,
+            )
+        elif self == ModeEnum.MetaXpressStackAndProjectionAcquisition:
+            return fractal_faim_ipa.imagexpress_zmb.StackAcquisition(
+                acquisition_dir,
+                alignment,
+                query=query,
+                keep_time_axis=keep_time_axis,
+                yx_binning=yx_binning,
+                metadata_executor=metadata_executor,
+                background_correction_matrices=background_correction_matrices,
+                illumination_correction_matrices=illumination_correction_matrices,
+                keep_projections=True,
             )
         elif self == ModeEnum.MetaXpressSinglePlaneAcquisition:
             return fractal_faim_ipa.imagexpress_zmb.SinglePlaneAcquisition(
-                acquisition_dir, alignment, query=query
+                acquisition_dir,
+                alignment,
+                query=query,
+                keep_time_axis=keep_time_axis,
+                yx_binning=yx_binning,
+                metadata_executor=metadata_executor,
+                background_correction_matrices=background_correction_matrices,
+                illumination_correction_matrices=illumination_correction_matrices,
             )
         elif self == ModeEnum.MetaXpressMixedAcquisition:
             return fractal_faim_ipa.imagexpress_zmb.MixedAcquisition(
-                acquisition_dir, alignment, query=query
+                acquisition_dir,
+                alignment,
+                query=query,
+                keep_time_axis=keep_time_axis,
+                yx_binning=yx_binning,
+                metadata_executor=metadata_executor,
+                background_correction_matrices=background_correction_matrices,
+                illumination_correction_matrices=illumination_correction_matrices,
             )
         elif self == ModeEnum.MetaXpressSinglePlaneAcquisition_as3D:
             return fractal_faim_ipa.imagexpress_zmb.SinglePlaneAcquisition_as3D(
-                acquisition_dir, alignment, query=query
+                acquisition_dir,
+                alignment,
+                query=query,
+                keep_time_axis=keep_time_axis,
+                yx_binning=yx_binning,
+                metadata_executor=metadata_executor,
+                background_correction_matrices=background_correction_matrices,
+                illumination_correction_matrices=illumination_correction_matrices,
             )
         else:
             raise NotImplementedError(f"MD Converter was not implemented for {self=}")
+
+
+def detect_mode(acquisition_dir: str) -> ModeEnum:
+    """Detect the acquisition mode from a few directories and TIFF headers.
+
+    Only the first directory on the way to the image files is listed at
+    each level, such that the detection does not depend on the size of the
+    plate. MD exports are told apart from MetaXpress exports by their file
+    names, stacks from single planes by the `ZStep_{z}` directories. An
+    acquisition is mixed if some channels are not part of the second
+    z-step or, in MetaXpress exports, are single planes duplicated into
+    every z-step.
+    """
+    directory = str(acquisition_dir)
+    for _ in range(_MAX_DETECTION_DEPTH):
+        dirnames, filenames = _listdir(directory)
+        z_steps = {
+            int(match["z"]): name
+            for name in dirnames
+            if (match := _Z_STEP_RE.fullmatch(name))
+        }
+        channels = _match_channels(directory, filenames)
+        if z_steps or channels:
+            break
+        if len(dirnames) == 0:
+            break
+        directory = os.path.join(directory, dirnames[0])
+
+    # Channels of the planes, keyed by z-step
+    planes = {}
+    for z, name in sorted(z_steps.items())[:3]:
+        z_dir = os.path.join(directory, name)
+        planes[z] = _match_channels(z_dir, _listdir(z_dir)[1])
+    samples = [*channels.values(), *(f for c in planes.values() for f in c.values())]
+    if len(samples) == 0:
+        raise ValueError(f"Could not detect the acquisition mode of {acquisition_dir}.")
+    if _MD_FILENAME_RE.fullmatch(os.path.basename(samples[0])) is not None:
+        return _detect_md_mode(planes, channels)
+    return _detect_metaxpress_mode(planes)
+
+
+def _detect_md_mode(
+    planes: dict[int, dict[str, str]], channels: dict[str, str]
+) -> ModeEnum:
+    """Mode of an MD export from the channels of its first z-steps.
+
+    `channels` are the channels whose files are not in a z-step directory.
+    """
+    stack_planes = [plane for z, plane in planes.items() if z > 0]
+    if len(stack_planes) == 0:
+        return ModeEnum.SinglePlaneAcquisition
+    if len(stack_planes) == 1:
+        return ModeEnum.StackAcquisition
+    all_channels = set(channels).union(*stack_planes)
+    if all_channels <= set(stack_planes[1]):
+        return ModeEnum.StackAcquisition
+    return ModeEnum.MixedAcquisition
+
+
+def _detect_metaxpress_mode(planes: dict[int, dict[str, str]]) -> ModeEnum:
+    """Mode of a MetaXpress export from the channels of its first z-steps."""
+    from fractal_faim_ipa.tiff_utils import load_metaseries_tiff_metadata
+
+    stack_planes = [plane for z, plane in planes.items() if z > 0]
+    if len(stack_planes) == 0:
+        return ModeEnum.MetaXpressSinglePlaneAcquisition
+    if len(stack_planes) == 1:
+        if 0 in planes:
+            return ModeEnum.MetaXpressSinglePlaneAcquisition
+        return ModeEnum.MetaXpressSinglePlaneAcquisition_as3D
+    if not set(stack_planes[0]) <= set(stack_planes[1]):
+        return ModeEnum.MetaXpressMixedAcquisition
+    for path in stack_planes[1].values():
+        # Single planes are duplicated into every z-step with "Z Step" 1,
+        # projections have no "Z Step" at all
+        if load_metaseries_tiff_metadata(path).get("Z Step", 1) == 1:
+            return ModeEnum.MetaXpressMixedAcquisition
+    return ModeEnum.MetaXpressStackAcquisition
+
+
+def _listdir(directory: str) -> tuple[list[str], list[str]]:
+    """Sorted sub-directories and files of a directory, also within archives."""
+    from fractal_faim_ipa import archive_utils
+
+    if archive_utils.is_archive(directory) or archive_utils.split_archive_path(
+        directory
+    ):
+        return archive_utils.listdir(directory)
+    dirnames = []
+    filenames = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                dirnames.append(entry.name)
+            else:
+                filenames.append(entry.name)
+    return sorted(dirnames), filenames
+
+
+def _match_channels(directory: str, filenames: list[str]) -> dict[str, str]:
+    """Path of the first image file of each channel, keyed by channel."""
+    channels = {}
+    for filename in sorted(filenames):
+        match = _MD_FILENAME_RE.fullmatch(filename) or (
+            _METAXPRESS_FILENAME_RE.fullmatch(filename)
+        )
+        if match is not None:
+            channels.setdefault(match["channel"], os.path.join(directory, filename))
+    return channels
+
+
+# Maximum number of z-planes in a chunk of the "FOV" layout, i.e. 64 MB for
+# 2048 x 2048 uint16 tiles
+MAX_FOV_CHUNK_Z = 8
+
+
+class ChunkLayoutEnum(Enum):
+    """Handle selection of the zarr chunk layout."""
+
+    Default = "Default"
+    FOV = "FOV"
+    Well = "Well"
+
+    def get_chunks(self, plate_acquisition, yx_binning=1):
+        """Chunk sizes used for stitching and for the written zarr arrays.
+
+        "FOV" writes one chunk per field of view containing up to
+        `MAX_FOV_CHUNK_Z` of its z-planes, "Well" writes one chunk per z-plane
+        of a well. Chunks with more planes result in fewer files, but each
+        chunk is held in memory while it is written and read in full, also
+        by readers that only need a single plane. A chunk containing all
+        z-planes of a whole well would have to be held in memory at once.
+        The zarr chunks refer to the image after `yx_binning`.
+
+        Returns:
+            Tuple of the stitching chunks in YX and the zarr chunks in (Z)YX.
+        """
+        if self == ChunkLayoutEnum.Default:
+            return (2048, 2048), (2048, 2048)
+        _, _, n_z, well_y, well_x = plate_acquisition.get_common_well_shape()
+        if self == ChunkLayoutEnum.FOV:
+            well_acquisition = plate_acquisition.get_well_acquisitions()[0]
+            tile_shape = tuple(well_acquisition.get_tiles()[0].shape[-2:])
+            return tile_shape, (
+                min(n_z, MAX_FOV_CHUNK_Z),
+                *(max(s // yx_binning, 1) for s in tile_shape),
+            )
+        elif self == ChunkLayoutEnum.Well:
+            return (2048, 2048), (
+                1,
+                max(well_y // yx_binning, 1),
+                max(well_x // yx_binning, 1),
+            )
+        else:
+            raise NotImplementedError(f"Chunk layout {self=} is not implemented")
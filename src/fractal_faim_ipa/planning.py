@@ -0,0 +1,158 @@
+"""Estimate the output size and resources of a conversion without running it.
+
+The plan only relies on the parsed metadata of the plate acquisition and a
+few sampled tiles, which are read to determine the data type and to measure
+how well the data compresses and how fast it is read. The metadata of every
+tile is parsed, as the well shapes depend on all tile positions, so planning
+costs as much as the metadata parsing of the conversion.
+"""
+import math
+import time
+
+import numpy as np
+from numcodecs import Blosc
+
+# Resources of the converter in the task list, used as upper bound
+DEFAULT_CPUS = 8
+# Memory used besides the image data, e.g. by the scheduler and the metadata
+BASE_MEMORY_MB = 2000
+# Compressor of the written arrays, see `ConvertToNGFFPlate._get_storage_options`
+COMPRESSOR = Blosc(cname="zstd", clevel=3, shuffle=Blosc.SHUFFLE)
+# Bytes per pixel and tile that are needed on top of the image data to fuse
+# the tiles of a block: distance masks, fusion weights and weighted tiles
+_FUSION_BYTES_PER_PIXEL = 24
+
+
+def create_plan(
+    plate_acquisition,
+    *,
+    chunks: tuple[int, ...],
+    output_chunks: tuple[int, ...],
+    yx_binning: int = 1,
+    max_layer: int = 3,
+    write_mip: bool = False,
+    n_samples: int = 4,
+) -> dict:
+    """Plan the conversion of a plate acquisition.
+
+    Args:
+        plate_acquisition: A single plate acquisition.
+        chunks: Chunk size in (Z)YX used for stitching.
+        output_chunks: Chunk size in (Z)YX of the written zarr arrays.
+        yx_binning: Binning factor of the written images.
+        max_layer: Maximum layer of the resolution pyramid layers.
+        write_mip: Whether the maximum intensity projections are written.
+        n_samples: Number of tiles that are read to estimate the compression
+            ratio and the read throughput.
+
+    Returns:
+        Dictionary with the number of wells, files, tiles, channels, z-planes
+        and time points, the array shapes of the pyramid levels (the same
+        for every well), the estimated output size in bytes, the estimated
+        peak memory per well in bytes, a rough runtime estimate in seconds
+        and the suggested `cpus_per_task` and `mem` (in MB) of the task.
+    """
+    well_acquisitions = plate_acquisition.get_well_acquisitions()
+    tiles = [tile for well in well_acquisitions for tile in well.get_tiles()]
+    axes = well_acquisitions[0].get_axes()
+    n_t, n_c, n_z, n_y, n_x = plate_acquisition.get_common_well_shape()
+    samples = [
+        tiles[i]
+        for i in np.unique(np.linspace(0, len(tiles) - 1, n_samples).astype(int))
+    ]
+    dtype, compression_ratio, seconds_per_byte = _sample_tiles(samples)
+
+    full_shape = dict(
+        zip(
+            "tczyx",
+            (n_t, n_c, n_z, n_y // yx_binning, n_x // yx_binning),
+            strict=True,
+        )
+    )
+    level_shapes = _level_shapes([full_shape[axis] for axis in axes], max_layer)
+    image_shapes = [level_shapes]
+    plan_shapes = {"image": level_shapes}
+    if write_mip:
+        mip_shape = {**full_shape, "z": 1}
+        mip_shapes = _level_shapes([mip_shape[axis] for axis in axes], max_layer)
+        image_shapes.append(mip_shapes)
+        plan_shapes["mip"] = mip_shapes
+    bytes_per_well = dtype.itemsize * sum(
+        math.prod(shape) for shapes in image_shapes for shape in shapes
+    )
+    uncompressed_bytes = len(well_acquisitions) * bytes_per_well
+
+    # Each task fuses the tiles of a stitching block and writes a chunk
+    n_leading_axes = len([axis for axis in axes if axis in "tc"])
+    spatial_shape = level_shapes[0][n_leading_axes:]
+    block_pixels = math.prod(_clip(chunks, [n_z, n_y, n_x][-len(chunks) :]))
+    tile_shape = tiles[0].shape
+    tiles_per_plane = len(tiles) / (len(well_acquisitions) * n_t * n_c * n_z)
+    tiles_per_block = min(
+        tiles_per_plane,
+        math.prod(
+            math.ceil(c / s) + 1
+            for c, s in zip(chunks[-2:], tile_shape[-2:], strict=True)
+        ),
+    )
+    output_chunk_pixels = math.prod(_clip(output_chunks, spatial_shape))
+    memory_per_task = int(
+        tiles_per_block * math.prod(tile_shape) * dtype.itemsize
+        + tiles_per_block * block_pixels * (dtype.itemsize + _FUSION_BYTES_PER_PIXEL)
+        + 2 * output_chunk_pixels * dtype.itemsize
+    )
+    tasks_per_well = math.prod(level_shapes[0][:n_leading_axes]) * math.prod(
+        math.ceil(s / c)
+        for s, c in zip(spatial_shape, _clip(output_chunks, spatial_shape), strict=True)
+    )
+    cpus = min(DEFAULT_CPUS, len(well_acquisitions) * tasks_per_well)
+
+    return {
+        "n_wells": len(well_acquisitions),
+        "n_files": len({str(tile.path) for tile in tiles}),
+        "n_tiles": len(tiles),
+        "n_timepoints": int(n_t),
+        "n_channels": int(n_c),
+        "n_z_planes": int(n_z),
+        "axes": "".join(axes),
+        "dtype": dtype.name,
+        "shapes": plan_shapes,
+        "uncompressed_bytes": int(uncompressed_bytes),
+        "compressed_bytes": int(uncompressed_bytes / compression_ratio),
+        "compression_ratio": round(compression_ratio, 2),
+        "peak_memory_per_well_bytes": int(memory_per_task * min(cpus, tasks_per_well)),
+        "runtime_seconds": round(uncompressed_bytes * seconds_per_byte / cpus, 1),
+        "cpus_per_task": int(cpus),
+        "mem": _round_up(BASE_MEMORY_MB + cpus * memory_per_task / 1e6, 1000),
+    }
+
+
+def _sample_tiles(tiles) -> tuple[np.dtype, float, float]:
+    """Data type, compression ratio and seconds to read and compress a byte."""
+    raw_bytes = 0
+    compressed_bytes = 0
+    start = time.perf_counter()
+    for tile in tiles:
+        data = np.ascontiguousarray(tile.load_data())
+        raw_bytes += data.nbytes
+        compressed_bytes += len(COMPRESSOR.encode(data))
+    elapsed = time.perf_counter() - start
+    return data.dtype, raw_bytes / compressed_bytes, elapsed / raw_bytes
+
+
+def _level_shapes(shape: list[int], max_layer: int) -> list[list[int]]:
+    """Shapes of the pyramid levels, halving y and x from level to level."""
+    shapes = [[int(s) for s in shape]]
+    for _ in range(max_layer):
+        shapes.append(shapes[-1][:-2] + [s // 2 for s in shapes[-1][-2:]])
+    return shapes
+
+
+def _clip(chunks, shape) -> list[int]:
+    """Chunks padded with leading 1s and clipped to the spatial `shape`."""
+    chunks = [1] * (len(shape) - len(chunks)) + list(chunks)
+    return [min(c, s) for c, s in zip(chunks[-len(shape) :], shape, strict=True)]
+
+
+def _round_up(value: float, multiple: int) -> int:
+    return int(math.ceil(value / multiple) * multiple)
@@ -0,0 +1,142 @@
+"""Read source files ahead of the converter.
+
+While a block is stitched, a thread pool reads the files of the tiles that
+are needed next into a memory-capped buffer, such that the read latency of
+network and object storage is hidden behind the stitching. Files are read
+in the order the converter consumes them. Files that are requested before
+they are scheduled are read directly instead of waiting for the prefetcher.
+
+The prefetcher lives in the process that reads the tiles, i.e. it is only
+effective if the Dask workers run in the same process (threads). The
+converter only prefetches with a single worker thread, since parallel
+workers do not consume the files in the order they are read ahead.
+"""
+import logging
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+from fractal_faim_ipa import archive_utils, reads
+
+logger = logging.getLogger(__name__)
+
+# Prefetcher consulted by `take`, set while `prefetching` is active
+_active: Optional["Prefetcher"] = None
+
+
+class Prefetcher:
+    """Read files in a given order into a buffer of limited size.
+
+    Args:
+        paths: Paths of the files in the order they are consumed.
+        max_bytes: Maximum number of bytes buffered or being read.
+        n_threads: Number of files read concurrently.
+    """
+
+    def __init__(self, paths: Iterable[str], max_bytes: int, n_threads: int = 4):
+        self._paths = list(dict.fromkeys(str(path) for path in paths))
+        self._max_bytes = max_bytes
+        self._reserved_bytes = 0
+        self._next = 0
+        # Reads that were submitted and the bytes reserved for them
+        self._scheduled: dict[str, tuple[Future, int]] = {}
+        self._skipped: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            n_threads, thread_name_prefix="tile-prefetch"
+        )
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def start(self):
+        """Start reading files until the buffer is full."""
+        with self._lock:
+            self._schedule()
+
+    def close(self):
+        """Stop reading ahead and release the buffer."""
+        with self._lock:
+            self._next = len(self._paths)
+            for future, _ in self._scheduled.values():
+                future.cancel()
+        self._executor.shutdown(wait=True)
+        self._scheduled.clear()
+        logger.info(f"Prefetched {self.n_hits} files, read {self.n_misses} directly.")
+
+    def take(self, path: str) -> Optional[bytes]:
+        """Content of a file, or None if it was not scheduled for reading.
+
+        Files that are being read are waited for up to the timeout of the
+        `reads.ReadPolicy`, after which None is returned, such that the file
+        is read again directly. A file is only served once, its memory is
+        released afterwards.
+        """
+        path = str(path)
+        with self._lock:
+            scheduled = self._scheduled.pop(path, None)
+            if scheduled is None:
+                self._skipped.add(path)
+                self.n_misses += 1
+                return None
+        future, size = scheduled
+        try:
+            content = future.result(timeout=reads.get_policy().timeout)
+        except Exception:
+            content = None
+        with self._lock:
+            self._reserved_bytes -= size
+            if content is None:
+                self.n_misses += 1
+            else:
+                self.n_hits += 1
+            self._schedule()
+        return content
+
+    def _schedule(self):
+        """Submit reads until `max_bytes` are reserved. Requires the lock."""
+        while self._next < len(self._paths):
+            path = self._paths[self._next]
+            if path in self._skipped:
+                self._next += 1
+                continue
+            try:
+                size = archive_utils.get_size(path)
+            except (OSError, KeyError):
+                # Unreadable files are reported when the tile is loaded
+                self._next += 1
+                continue
+            # A file that is larger than the buffer is read if nothing else is
+            if self._reserved_bytes > 0 and self._reserved_bytes + size > (
+                self._max_bytes
+            ):
+                return
+            future = self._executor.submit(archive_utils.read_bytes, path)
+            self._reserved_bytes += size
+            self._scheduled[path] = (future, size)
+            self._next += 1
+
+
+@contextmanager
+def prefetching(
+    paths: Iterable[str], max_bytes: int, n_threads: int = 4
+) -> Iterator[Prefetcher]:
+    """Read `paths` ahead while the context is active, see `take`."""
+    global _active
+    prefetcher = Prefetcher(paths, max_bytes=max_bytes, n_threads=n_threads)
+    prefetcher.start()
+    _active = prefetcher
+    try:
+        yield prefetcher
+    finally:
+        _active = None
+        prefetcher.close()
+
+
+def take(path: str) -> Optional[bytes]:
+    """Content of a prefetched file, or None if it has to be read directly."""
+    prefetcher = _active
+    if prefetcher is None:
+        return None
+    return prefetcher.take(path)
@@ -0,0 +1,339 @@
+"""Profile a conversion.
+
+Runs `convert_ome_zarr` on an image directory or on a synthetic plate and
+writes a report of the hot spots of each phase of the conversion (see
+`fractal_faim_ipa.progress`):
+
+* the functions with the highest own time in the converting process, from
+  cProfile, e.g. parsing the metadata and submitting the conversion,
+* the lines the Dask workers spent most time in, from the statistical
+  profiler of the workers, e.g. reading and fusing the tiles,
+* the Dask tasks with the longest total run time, from the task stream,
+* the peak resident memory of the process and its children.
+
+The report is written to `report.txt` and `report.json`, together with the
+cProfile statistics of each phase (`{index}_{phase}.prof`). For example:
+
+    python -m fractal_faim_ipa.profile /path/to/images --report-dir report
+    python -m fractal_faim_ipa.profile --synthetic --wells 4 --report-dir report
+"""
+import argparse
+import cProfile
+import json
+import logging
+import pstats
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Optional
+
+import dask
+import distributed
+from dask.utils import key_split
+
+from fractal_faim_ipa import progress
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import write_metaxpress_plate
+from fractal_faim_ipa.resources import ResourceSampler
+
+logger = logging.getLogger(__name__)
+
+# Length of the profile cycles of the workers, such that short phases are
+# covered by the worker profiles
+_WORKER_PROFILE_CYCLE = "100ms"
+
+
+class PhaseProfiler:
+    """Profile each phase of a conversion, see `progress.observing`.
+
+    Args:
+        rss_sampler: Sampler of the memory of the process.
+        report_dir: Directory the cProfile statistics are written to.
+        n_hot_spots: Number of hot spots reported per phase and source.
+    """
+
+    def __init__(
+        self, rss_sampler: ResourceSampler, report_dir: Path, n_hot_spots: int
+    ):
+        self._rss_sampler = rss_sampler
+        self._report_dir = report_dir
+        self._n_hot_spots = n_hot_spots
+        self.phases: list[dict[str, Any]] = []
+
+    @contextmanager
+    def __call__(self, phase: str, plate: str):
+        """Context profiling the phase `phase` of the conversion of `plate`."""
+        client = _get_client()
+        profiler = cProfile.Profile()
+        start = time.time()
+        task_stream = (
+            nullcontext() if client is None else distributed.get_task_stream(client)
+        )
+        with task_stream as tasks:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+        stop = time.time()
+
+        stats_path = self._report_dir / f"{len(self.phases):02d}_{phase}.prof"
+        profiler.dump_stats(stats_path)
+        result = {
+            "phase": phase,
+            "plate": plate,
+            "seconds": round(stop - start, 3),
+            "peak_rss_bytes": self._rss_sampler.peak(start, stop),
+            "stats": stats_path.name,
+            "functions": _hot_functions(profiler, self._n_hot_spots),
+            "worker_lines": [],
+            "tasks": [],
+        }
+        if client is not None:
+            result["worker_lines"] = _hot_lines(
+                client.profile(start=start, stop=stop), self._n_hot_spots
+            )
+            result["tasks"] = _task_summary(tasks.data, self._n_hot_spots)
+        self.phases.append(result)
+
+
+def profile_conversion(
+    image_dir: str,
+    zarr_dir: str,
+    report_dir: str,
+    n_hot_spots: int = 20,
+    **options,
+) -> dict[str, Any]:
+    """Run `convert_ome_zarr` and write the profiling report.
+
+    Args:
+        image_dir: Directory of the images to convert.
+        zarr_dir: Directory the plate is written to.
+        report_dir: Directory the report is written to.
+        n_hot_spots: Number of hot spots reported per phase and source.
+        options: Further arguments of `convert_ome_zarr`.
+
+    Returns:
+        The report, as written to `report.json`.
+    """
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    options.setdefault("mode", "auto")
+    options.setdefault("parallelize", False)
+    with dask.config.set(
+        {"distributed.worker.profile.cycle": _WORKER_PROFILE_CYCLE}
+    ), ResourceSampler() as rss_sampler:
+        profiler = PhaseProfiler(rss_sampler, report_dir, n_hot_spots)
+        start = time.time()
+        with progress.observing(profiler):
+            convert_ome_zarr(
+                zarr_urls=[], zarr_dir=zarr_dir, image_dir=image_dir, **options
+            )
+        seconds = time.time() - start
+        client = _get_client()
+        if client is not None:
+            client.close()
+
+    report = {
+        "image_dir": image_dir,
+        "options": options,
+        "seconds": round(seconds, 3),
+        "peak_rss_bytes": rss_sampler.peak(),
+        "phases": profiler.phases,
+    }
+    with open(report_dir / "report.json", "w") as f:
+        json.dump(report, f, indent=2)
+    with open(report_dir / "report.txt", "w") as f:
+        f.write(format_report(report))
+    return report
+
+
+def format_report(report: dict[str, Any]) -> str:
+    """Human readable summary of a profiling report."""
+    lines = [
+        f"Conversion of {report['image_dir']} with {report['options']}",
+        f"Total: {report['seconds']:.1f} s, "
+        f"peak RSS {report['peak_rss_bytes'] / 1e6:.0f} MB",
+    ]
+    for phase in report["phases"]:
+        lines += [
+            "",
+            f"== {phase['plate']} {phase['phase']}: {phase['seconds']:.1f} s, "
+            f"peak RSS {phase['peak_rss_bytes'] / 1e6:.0f} MB "
+            f"(cProfile statistics: {phase['stats']})",
+            "-- Functions in the converting process (own time, calls):",
+        ]
+        lines += [
+            f"{f['own_s']:10.3f} s {f['calls']:10d}  {f['function']}"
+            for f in phase["functions"]
+        ]
+        if phase["worker_lines"]:
+            lines.append("-- Lines in the Dask workers (share of samples):")
+            lines += [
+                f"{line['fraction']:10.1%}  {line['location']}"
+                for line in phase["worker_lines"]
+            ]
+        if phase["tasks"]:
+            lines.append("-- Dask tasks (total compute time, count):")
+            lines += [
+                f"{task['compute_s']:10.3f} s {task['count']:10d}  {task['name']}"
+                for task in phase["tasks"]
+            ]
+    return "\n".join(lines) + "\n"
+
+
+def _get_client() -> Optional[distributed.Client]:
+    try:
+        return distributed.default_client()
+    except ValueError:
+        return None
+
+
+def _hot_functions(profiler: cProfile.Profile, n: int) -> list[dict[str, Any]]:
+    """Functions with the highest own time."""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:n]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": n_calls,
+            "own_s": round(own_time, 4),
+            "cumulative_s": round(cumulative_time, 4),
+        }
+        for (filename, line, name), (_, n_calls, own_time, cumulative_time, _) in rows
+    ]
+
+
+def _hot_lines(tree: dict, n: int) -> list[dict[str, Any]]:
+    """Lines of a `distributed` profile tree with the most own samples."""
+    own_samples = Counter()
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        children = list(node["children"].values())
+        own = node["count"] - sum(child["count"] for child in children)
+        if own > 0 and node is not tree:
+            description = node["description"]
+            own_samples[
+                f"{description['filename']}:{description['line_number']}"
+                f"({description['name']})"
+            ] += own
+        nodes.extend(children)
+    return [
+        {
+            "location": location,
+            "samples": samples,
+            "fraction": round(samples / tree["count"], 4),
+        }
+        for location, samples in own_samples.most_common(n)
+    ]
+
+
+def _task_summary(task_stream: list[dict], n: int) -> list[dict[str, Any]]:
+    """Total compute time and count of the tasks, grouped by name."""
+    compute_seconds = defaultdict(float)
+    counts = Counter()
+    for task in task_stream:
+        name = key_split(task["key"])
+        counts[name] += 1
+        for startstop in task["startstops"]:
+            if startstop["action"] == "compute":
+                compute_seconds[name] += startstop["stop"] - startstop["start"]
+    names = sorted(compute_seconds, key=compute_seconds.get, reverse=True)[:n]
+    return [
+        {
+            "name": name,
+            "count": counts[name],
+            "compute_s": round(compute_seconds[name], 4),
+        }
+        for name in names
+    ]
+
+
+def _parse_option(option: str) -> tuple[str, Any]:
+    name, _, value = option.partition("=")
+    try:
+        return name, json.loads(value)
+    except json.JSONDecodeError:
+        return name, value
+
+
+def main(argv: Optional[list[str]] = None) -> dict[str, Any]:
+    """Profile a conversion from the command line and return the report.
+
+    Args:
+        argv: Command line arguments, `sys.argv[1:]` if None. Run
+            `python -m fractal_faim_ipa.profile --help` for the options.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m fractal_faim_ipa.profile",
+        description="Profile the conversion of an MD Image Xpress acquisition.",
+    )
+    parser.add_argument(
+        "image_dir", nargs="?", help="Images to convert, see --synthetic."
+    )
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Convert a synthetic MetaXpress export instead of image_dir.",
+    )
+    parser.add_argument(
+        "--wells",
+        type=int,
+        default=2,
+        help="Number of synthetic wells, filled row by row into a 96-well plate.",
+    )
+    parser.add_argument("--grid", type=int, nargs=2, default=(2, 2))
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--z-planes", type=int, default=5)
+    parser.add_argument("--tile-size", type=int, default=512)
+    parser.add_argument(
+        "--zarr-dir", help="Output directory, a temporary directory by default."
+    )
+    parser.add_argument("--report-dir", default="profile_report")
+    parser.add_argument("--hot-spots", type=int, default=20)
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Argument of convert_ome_zarr (JSON value), e.g. mode='\"auto\"' "
+        "or binning=2. Can be repeated.",
+    )
+    args = parser.parse_args(argv)
+    if (args.image_dir is None) == (not args.synthetic):
+        parser.error("Pass either image_dir or --synthetic.")
+    if not 1 <= args.wells <= 96:
+        parser.error("--wells must be between 1 and 96.")
+
+    logging.basicConfig(level=logging.INFO)
+    options = dict(_parse_option(option) for option in args.option)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        zarr_dir = args.zarr_dir or str(Path(tmp_dir) / "zarr")
+        image_dir = args.image_dir
+        if args.synthetic:
+            image_dir = write_metaxpress_plate(
+                Path(tmp_dir) / "images",
+                wells=tuple(
+                    f"{'ABCDEFGH'[i // 12]}{i % 12 + 1:02d}" for i in range(args.wells)
+                ),
+                grid_shape=tuple(args.grid),
+                n_channels=args.channels,
+                n_z=args.z_planes,
+                tile_shape=(args.tile_size, args.tile_size),
+            )
+        report = profile_conversion(
+            str(image_dir),
+            zarr_dir,
+            args.report_dir,
+            n_hot_spots=args.hot_spots,
+            **options,
+        )
+    logger.info(f"Profiling report written to {args.report_dir}.")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Structured progress events of a conversion.
+
+A `ProgressReporter` reports the phases of a conversion (parsing the
+metadata, converting the wells, writing the tables) at a fixed interval and
+when a phase finishes. Events contain the wells done, the tile and data
+throughput and the estimated remaining time of the phase. They are logged
+and can be appended to a JSON-lines file to monitor running jobs.
+
+The progress is derived from the completed Dask futures of each well, such
+that it is also reported if the workers run in other processes.
+
+Other tools can follow the phases with `observing`, e.g. to profile them
+(see `fractal_faim_ipa.profile`).
+"""
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import AbstractContextManager, ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Observers entered around every phase, set while `observing` is active
+_observers: list[Callable[[str, str], AbstractContextManager]] = []
+
+
+class ProgressReporter:
+    """Report the progress of the phases of a conversion.
+
+    Args:
+        interval: Seconds between events while a phase is running. Only the
+            final event of each phase is reported if it is not positive.
+        path: JSON-lines file the events are appended to. Events are only
+            logged if None.
+    """
+
+    def __init__(self, interval: float = 60, path: Optional[str] = None):
+        self._interval = interval
+        self._path = path
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._phase = None
+        self._plate = ""
+        self._reset(n_wells=0)
+
+    def _reset(self, n_wells: int):
+        self._n_wells = n_wells
+        self._wells_done = 0.0
+        self._n_tiles = 0.0
+        self._read_bytes = 0.0
+        self._written_bytes = 0.0
+        self._start = time.monotonic()
+
+    @contextmanager
+    def phase(
+        self, name: str, *, plate: str = "", n_wells: int = 0
+    ) -> Iterator["ProgressReporter"]:
+        """Report the progress of the phase `name` while the context is active.
+
+        Args:
+            name: Name of the phase, e.g. "parse" or "convert".
+            plate: Name of the plate the phase belongs to.
+            n_wells: Number of wells processed in the phase.
+        """
+        with self._lock:
+            self._phase = name
+            self._plate = plate
+            self._reset(n_wells)
+        self._stopped.clear()
+        ticker = None
+        if self._interval > 0:
+            ticker = threading.Thread(
+                target=self._tick, name="progress-reporter", daemon=True
+            )
+            ticker.start()
+        try:
+            with ExitStack() as stack:
+                for observer in list(_observers):
+                    stack.enter_context(observer(name, plate))
+                yield self
+        finally:
+            self._stopped.set()
+            if ticker is not None:
+                ticker.join()
+            self.emit(status="finished")
+            self._phase = None
+
+    def track(
+        self,
+        futures: Sequence,
+        *,
+        n_tiles: int,
+        read_bytes: int,
+        written_bytes: int,
+        n_wells: float = 1.0,
+    ):
+        """Count the work of a well as its futures complete.
+
+        Each future is counted as an equal share of the well.
+
+        Args:
+            futures: Futures of the writes of the well.
+            n_tiles: Number of tiles of the well.
+            read_bytes: Size of the image data of the tiles.
+            written_bytes: Uncompressed size of the written arrays.
+            n_wells: Fraction of a well the futures complete, e.g. for one of
+                several images of a well.
+        """
+        if len(futures) == 0:
+            self._add(n_wells, n_tiles, read_bytes, written_bytes)
+            return
+        share = 1 / len(futures)
+        for future in futures:
+            future.add_done_callback(
+                lambda _: self._add(
+                    share * n_wells,
+                    share * n_tiles,
+                    share * read_bytes,
+                    share * written_bytes,
+                )
+            )
+
+    def well_done(self):
+        """Count a well that was processed without Dask futures."""
+        self._add(1.0, 0, 0, 0)
+
+    def _add(
+        self, wells: float, n_tiles: float, read_bytes: float, written_bytes: float
+    ):
+        with self._lock:
+            self._wells_done += wells
+            self._n_tiles += n_tiles
+            self._read_bytes += read_bytes
+            self._written_bytes += written_bytes
+
+    def get_event(self, status: str = "running") -> dict[str, Any]:
+        """Progress of the current phase."""
+        with self._lock:
+            elapsed = time.monotonic() - self._start
+            wells_done = self._wells_done
+            event = {
+                "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "phase": self._phase,
+                "plate": self._plate,
+                "status": status,
+                "elapsed_s": round(elapsed, 1),
+                "wells_done": int(round(wells_done, 6)),
+                "wells_total": self._n_wells,
+                "tiles_per_s": _rate(self._n_tiles, elapsed),
+                "read_mb_per_s": _rate(self._read_bytes / 1e6, elapsed),
+                "written_mb_per_s": _rate(self._written_bytes / 1e6, elapsed),
+                "eta_s": None,
+            }
+        if 0 < wells_done < self._n_wells:
+            event["eta_s"] = round(
+                elapsed * (self._n_wells - wells_done) / wells_done, 1
+            )
+        return event
+
+    def emit(self, status: str = "running"):
+        """Log the progress of the current phase and append it to the file."""
+        event = self.get_event(status)
+        plate = f"{event['plate']}: " if event["plate"] else ""
+        message = f"{plate}{event['phase']} {status} after {event['elapsed_s']} s"
+        if event["wells_total"] > 0:
+            message += (
+                f", {event['wells_done']}/{event['wells_total']} wells, "
+                f"{event['tiles_per_s']} tiles/s, "
+                f"read {event['read_mb_per_s']} MB/s, "
+                f"written {event['written_mb_per_s']} MB/s"
+            )
+        if event["eta_s"] is not None:
+            message += f", ETA {event['eta_s']} s"
+        logger.info(message)
+        if self._path is not None:
+            with open(self._path, "a") as f:
+                f.write(json.dumps(event) + "\n")
+
+    def _tick(self):
+        while not self._stopped.wait(self._interval):
+            self.emit()
+
+
+@contextmanager
+def observing(observer: Callable[[str, str], AbstractContextManager]) -> Iterator:
+    """Enter `observer(phase, plate)` around every phase while active."""
+    _observers.append(observer)
+    try:
+        yield
+    finally:
+        _observers.remove(observer)
+
+
+def _rate(amount: float, seconds: float) -> float:
+    return round(amount / seconds, 2) if seconds > 0 else 0.0
@@ -0,0 +1,356 @@
+"""Guard reads of source files against slow or hung storage.
+
+On shared network file systems, a few reads sometimes take minutes or never
+return, which stalls the conversion of the whole plate. Following the active
+`ReadPolicy`, `guarded`:
+
+* abandons attempts that exceed the timeout,
+* retries failed and abandoned attempts with exponential backoff,
+* starts a duplicate read of files that take much longer than the median
+  read and uses whichever read finishes first.
+
+Reads are run in the calling thread if neither a timeout nor duplicate reads
+can apply, otherwise in a pool of at most `_MAX_READ_THREADS` threads shared
+by all reads of the process. The timeout counts from the start of a read,
+not from when it was queued. Threads of hung reads cannot be stopped: they
+are daemon threads that leave the pool when their read is abandoned and
+are replaced by a new thread. Reads that were slow, retried or duplicated
+are logged and collected, see `pop_slow_reads`.
+
+The policy and the statistics are per process. `configure` has to be called
+in every worker process, e.g. with `distributed.Client.run`.
+"""
+import logging
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Optional, TypeVar
+
+from fractal_faim_ipa.input_models import ReadPolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Number of reads the median read time is computed from, and the number of
+# reads required before duplicate reads are started
+_N_LATENCIES = 1000
+_MIN_LATENCIES = 20
+# Maximum number of threads running the reads of a process, and the seconds
+# between the checks whether a queued read has started
+_MAX_READ_THREADS = 32
+_QUEUE_POLL_INTERVAL = 0.05
+
+# Errors that will not go away when the read is repeated
+_PERMANENT_ERRORS = (
+    FileNotFoundError,
+    IsADirectoryError,
+    NotADirectoryError,
+    PermissionError,
+)
+
+_policy = ReadPolicy()
+_lock = threading.Lock()
+_latencies: deque[float] = deque(maxlen=_N_LATENCIES)
+_slow_reads: list[dict[str, Any]] = []
+
+
+def configure(policy: ReadPolicy):
+    """Set the policy of the reads of this process."""
+    global _policy
+    _policy = policy
+
+
+def get_policy() -> ReadPolicy:
+    """Policy of the reads of this process."""
+    return _policy
+
+
+def pop_slow_reads() -> list[dict[str, Any]]:
+    """Slow, retried and duplicated reads of this process since the last call.
+
+    Each read is described by its "path", the total "seconds" it took, the
+    number of "attempts", whether it was "duplicated" and the "error" if it
+    failed.
+    """
+    with _lock:
+        slow_reads = list(_slow_reads)
+        _slow_reads.clear()
+    return slow_reads
+
+
+def log_slow_reads(slow_reads: list[dict[str, Any]], plate: str, n_listed: int = 10):
+    """Log a summary of the slowest reads of a plate."""
+    if len(slow_reads) == 0:
+        return
+    slowest = sorted(slow_reads, key=lambda read: read["seconds"], reverse=True)
+    lines = [
+        f"{read['seconds']:8.1f} s, {read['attempts']} attempt(s)"
+        f"{', duplicated' if read['duplicated'] else ''}"
+        f"{', failed: ' + read['error'] if read['error'] else ''}  {read['path']}"
+        for read in slowest[:n_listed]
+    ]
+    logger.warning(
+        f"{plate}: {len(slow_reads)} slow or failed reads, the slowest:\n"
+        + "\n".join(lines)
+    )
+
+
+class _ReadFuture(Future):
+    """Future of a read, with the time at which the read started."""
+
+    def __init__(self):
+        super().__init__()
+        self.started_at: Optional[float] = None
+
+
+class _DaemonExecutor:
+    """Bounded pool of daemon threads, which do not block the exit when hung.
+
+    Threads are started on demand, up to `max_workers`, and reused for
+    further reads. Reads that are submitted while all threads are busy are
+    queued. Hung reads that are given up with `abandon` leave the pool, such
+    that they do not hold on to its threads.
+    """
+
+    def __init__(self, max_workers: int):
+        self._max_workers = max_workers
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._n_threads = 0
+        self._n_idle = 0
+        # Queued reads that no thread is reserved for
+        self._n_backlog = 0
+        self._running: set[Future] = set()
+        self._abandoned: set[Future] = set()
+
+    def submit(self, fn: Callable[..., T], *args) -> _ReadFuture:
+        """Run `fn(*args)` in a pool thread."""
+        future = _ReadFuture()
+        self._queue.put((future, fn, args))
+        with self._lock:
+            if self._n_idle > 0:
+                self._n_idle -= 1
+            elif self._n_threads < self._max_workers:
+                self._start_thread()
+            else:
+                self._n_backlog += 1
+        return future
+
+    def abandon(self, future: Future):
+        """Give up on a read, cancelling it if it has not started yet.
+
+        The thread of a running read leaves the pool once the read returns,
+        another thread takes its place in the meantime.
+        """
+        if future.cancel():
+            return
+        with self._lock:
+            if future not in self._running:
+                return
+            self._running.remove(future)
+            self._abandoned.add(future)
+            self._n_threads -= 1
+            if self._n_backlog > 0:
+                self._n_backlog -= 1
+                self._start_thread()
+
+    def _start_thread(self):
+        """Start a pool thread. Requires the lock."""
+        self._n_threads += 1
+        threading.Thread(target=self._work, name="guarded-read", daemon=True).start()
+
+    def _work(self):
+        while True:
+            future, fn, args = self._queue.get()
+            with self._lock:
+                running = future.set_running_or_notify_cancel()
+                if running:
+                    self._running.add(future)
+            if not running:
+                self._release(future)
+                continue
+            future.started_at = time.monotonic()
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                # The thread is available before the caller gets the result
+                abandoned = self._release(future)
+                future.set_exception(e)
+            else:
+                abandoned = self._release(future)
+                future.set_result(result)
+            if abandoned:
+                return
+
+    def _release(self, future: Future) -> bool:
+        """Return the thread of `future` to the pool, False if it was abandoned."""
+        with self._lock:
+            if future in self._abandoned:
+                self._abandoned.remove(future)
+                return True
+            self._running.discard(future)
+            if self._n_backlog > 0:
+                self._n_backlog -= 1
+            else:
+                self._n_idle += 1
+            return False
+
+
+_executor = _DaemonExecutor(_MAX_READ_THREADS)
+
+
+class _DuplicatedTimeoutError(TimeoutError):
+    """Timeout of an attempt for which a duplicate read was started."""
+
+
+def guarded(read: Callable[[str], T], path: str) -> T:
+    """Call `read(path)` following the active `ReadPolicy`."""
+    policy = _policy
+    start = time.monotonic()
+    duplicated = False
+    error = None
+    for attempt in range(policy.max_retries + 1):
+        if attempt > 0:
+            time.sleep(policy.backoff * 2 ** (attempt - 1))
+        attempt_start = time.monotonic()
+        try:
+            result, duplicate = _attempt(read, path, policy)
+        except _PERMANENT_ERRORS:
+            raise
+        except OSError as e:
+            # TimeoutError is an OSError
+            duplicated = duplicated or isinstance(e, _DuplicatedTimeoutError)
+            error = e
+            logger.warning(
+                f"Attempt {attempt + 1}/{policy.max_retries + 1} to read {path} "
+                f"failed: {e}"
+            )
+            continue
+        duplicated = duplicated or duplicate
+        elapsed = time.monotonic() - attempt_start
+        threshold = _get_speculation_delay(policy)
+        with _lock:
+            _latencies.append(elapsed)
+        if attempt > 0 or duplicated or (threshold is not None and elapsed > threshold):
+            _record(path, start, attempt + 1, duplicated, error=None)
+        return result
+    _record(path, start, policy.max_retries + 1, duplicated, error=str(error))
+    raise error
+
+
+def _attempt(read: Callable[[str], T], path: str, policy: ReadPolicy) -> tuple[T, bool]:
+    """Result of one attempt and whether a duplicate read was started.
+
+    The timeout and the delay of the duplicate read count from the start of
+    the read, the time a read is queued for a pool thread is not included.
+    """
+    speculation_delay = _get_speculation_delay(policy)
+    if policy.timeout is None and speculation_delay is None:
+        return read(path), False
+    first = _executor.submit(read, path)
+    pending = {first}
+    duplicated = False
+    while True:
+        deadline, speculate_at = _get_deadlines(
+            first, policy, None if duplicated else speculation_delay
+        )
+        done, pending = wait(
+            pending,
+            timeout=_get_wait_timeout(first, deadline, speculate_at),
+            return_when=FIRST_COMPLETED,
+        )
+        result = _get_result(done, pending)
+        if result is not None:
+            for other in pending:
+                _executor.abandon(other)
+            return result.result(), duplicated
+        if len(done) > 0:
+            continue
+        now = time.monotonic()
+        if speculate_at is not None and now >= speculate_at:
+            logger.warning(
+                f"Reading {path} takes {now - first.started_at:.1f} s, more "
+                f"than {policy.speculation_factor:g} times the median read "
+                "time. Starting a duplicate read."
+            )
+            pending.add(_executor.submit(read, path))
+            duplicated = True
+            continue
+        if deadline is not None and now >= deadline:
+            for future in pending:
+                _executor.abandon(future)
+            error_type = _DuplicatedTimeoutError if duplicated else TimeoutError
+            raise error_type(f"No response after {policy.timeout:g} s.")
+
+
+def _get_deadlines(
+    first: _ReadFuture, policy: ReadPolicy, speculation_delay: Optional[float]
+) -> tuple[Optional[float], Optional[float]]:
+    """Times at which an attempt times out and a duplicate read is started.
+
+    Both are None while the first read of the attempt is queued.
+    """
+    if first.started_at is None:
+        return None, None
+    deadline = None if policy.timeout is None else first.started_at + policy.timeout
+    speculate_at = (
+        None if speculation_delay is None else first.started_at + speculation_delay
+    )
+    return deadline, speculate_at
+
+
+def _get_wait_timeout(
+    first: _ReadFuture, deadline: Optional[float], speculate_at: Optional[float]
+) -> Optional[float]:
+    """Seconds to wait for the reads before the deadlines are checked again."""
+    if first.started_at is None:
+        # Check again whether the queued read has started
+        return _QUEUE_POLL_INTERVAL
+    wake_up = min((t for t in (deadline, speculate_at) if t is not None), default=None)
+    return None if wake_up is None else max(wake_up - time.monotonic(), 0)
+
+
+def _get_result(done: set[Future], pending: set[Future]) -> Optional[Future]:
+    """Finished read whose result is used, None to keep waiting."""
+    for future in done:
+        # A failed read is ignored while its duplicate may still succeed
+        if future.exception() is None or len(pending) == 0:
+            return future
+    return None
+
+
+def _get_speculation_delay(policy: ReadPolicy) -> Optional[float]:
+    """Seconds after which a duplicate read is started, None if never."""
+    if policy.speculation_factor <= 0:
+        return None
+    with _lock:
+        if len(_latencies) < _MIN_LATENCIES:
+            return None
+        median = statistics.median(_latencies)
+    return max(policy.min_speculation_delay, policy.speculation_factor * median)
+
+
+def _record(
+    path: str, start: float, attempts: int, duplicated: bool, error: Optional[str]
+):
+    seconds = time.monotonic() - start
+    if error is None:
+        logger.warning(
+            f"Reading {path} took {seconds:.1f} s and {attempts} attempt(s)"
+            f"{' with a duplicate read' if duplicated else ''}."
+        )
+    with _lock:
+        _slow_reads.append(
+            {
+                "path": str(path),
+                "seconds": round(seconds, 3),
+                "attempts": attempts,
+                "duplicated": duplicated,
+                "error": error,
+            }
+        )
@@ -0,0 +1,245 @@
+"""Sample the resources used by the phases of a conversion.
+
+A `ResourceMonitor` follows the phases of a conversion (see
+`fractal_faim_ipa.progress.observing`) and collects for each phase:
+
+* the peak resident memory of the converting process and its children,
+* the peak number of open file descriptors,
+* the CPU utilisation, in cores, of the process and its children,
+* optionally, the peak memory allocated by Python (via `tracemalloc`, which
+  slows the conversion down),
+* the peak memory, open file descriptors and CPU utilisation of each Dask
+  worker, from the system monitors of the workers.
+
+The summary is used to choose the resources requested for the task (e.g.
+`mem` and `cpus_per_task` in `dev/task_list.py`) and to compare the memory
+use of different versions.
+"""
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Optional
+
+import psutil
+
+from fractal_faim_ipa import progress
+
+if TYPE_CHECKING:
+    import distributed
+
+
+class ResourceSampler:
+    """Sample the memory and open files of this process and its children.
+
+    Args:
+        interval: Seconds between samples.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self._interval = interval
+        self._process = psutil.Process()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler")
+        # Time, resident memory in bytes and number of open file descriptors
+        self.samples: list[tuple[float, int, int]] = []
+
+    def __enter__(self) -> "ResourceSampler":
+        """Start sampling in a background thread."""
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop sampling, after a last sample."""
+        self._stopped.set()
+        self._thread.join()
+        self._sample()
+
+    def peak(self, start: float = 0, stop: float = float("inf")) -> int:
+        """Highest sampled memory in bytes between `start` and `stop`."""
+        return self._peak(1, start, stop)
+
+    def peak_open_files(self, start: float = 0, stop: float = float("inf")) -> int:
+        """Highest sampled number of open file descriptors."""
+        return self._peak(2, start, stop)
+
+    def _peak(self, index: int, start: float, stop: float) -> int:
+        return max(
+            (sample[index] for sample in self.samples if start <= sample[0] <= stop),
+            default=self.samples[-1][index] if self.samples else 0,
+        )
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self._sample()
+
+    def _sample(self):
+        rss = 0
+        n_fds = 0
+        for process in [self._process, *self._process.children(recursive=True)]:
+            try:
+                with process.oneshot():
+                    rss += process.memory_info().rss
+                    n_fds += process.num_fds()
+            except psutil.Error:
+                pass
+        self.samples.append((time.time(), rss, n_fds))
+
+
+class ResourceMonitor:
+    """Collect the resources used by each phase of a conversion.
+
+    Use as context manager around the conversion and pass it to
+    `progress.observing`, see `monitoring`.
+
+    Args:
+        interval: Seconds between the samples of the converting process.
+        trace_python_heap: Also trace the peak memory allocated by Python in
+            the converting process with `tracemalloc`.
+    """
+
+    def __init__(self, interval: float = 0.1, trace_python_heap: bool = False):
+        self._sampler = ResourceSampler(interval)
+        self._trace_python_heap = trace_python_heap
+        self._process = psutil.Process()
+        self.phases: list[dict[str, Any]] = []
+
+    def __enter__(self) -> "ResourceMonitor":
+        """Start sampling the converting process."""
+        self._sampler.__enter__()
+        if self._trace_python_heap:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop sampling the converting process."""
+        if self._trace_python_heap:
+            tracemalloc.stop()
+        self._sampler.__exit__(*exc_info)
+
+    @contextmanager
+    def __call__(self, phase: str, plate: str) -> Iterator:
+        """Context collecting the resources of the phase `phase` of `plate`."""
+        start = time.time()
+        start_cpu = self._get_cpu_seconds()
+        if self._trace_python_heap:
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            stop = time.time()
+            seconds = stop - start
+            cpu_seconds = self._get_cpu_seconds() - start_cpu
+            result = {
+                "phase": phase,
+                "plate": plate,
+                "seconds": round(seconds, 3),
+                "peak_rss_bytes": self._sampler.peak(start, stop),
+                "peak_open_files": self._sampler.peak_open_files(start, stop),
+                "cpu_cores": round(cpu_seconds / seconds, 2) if seconds > 0 else 0.0,
+                "peak_python_heap_bytes": None,
+                "workers": _get_worker_usage(start, stop),
+            }
+            if self._trace_python_heap:
+                result["peak_python_heap_bytes"] = tracemalloc.get_traced_memory()[1]
+            self.phases.append(result)
+
+    def summary(self) -> dict[str, Any]:
+        """Peaks of the whole conversion and the resources of each phase."""
+        python_heaps = [
+            phase["peak_python_heap_bytes"]
+            for phase in self.phases
+            if phase["peak_python_heap_bytes"] is not None
+        ]
+        return {
+            "peak_rss_bytes": self._sampler.peak(),
+            "peak_open_files": self._sampler.peak_open_files(),
+            "peak_python_heap_bytes": max(python_heaps, default=None),
+            "peak_worker_rss_bytes": max(
+                (
+                    worker["peak_rss_bytes"]
+                    for phase in self.phases
+                    for worker in phase["workers"].values()
+                ),
+                default=None,
+            ),
+            "phases": self.phases,
+        }
+
+    def _get_cpu_seconds(self) -> float:
+        times = self._process.cpu_times()
+        return times.user + times.system + times.children_user + times.children_system
+
+
+@contextmanager
+def monitoring(
+    enabled: bool = True, trace_python_heap: bool = False
+) -> Iterator[Optional[ResourceMonitor]]:
+    """Monitor the resources of the phases while active, if `enabled`."""
+    if not enabled:
+        yield None
+        return
+    with ResourceMonitor(trace_python_heap=trace_python_heap) as monitor:
+        with progress.observing(monitor):
+            yield monitor
+
+
+def format_summary(summary: dict[str, Any]) -> str:
+    """Human readable summary of the resources of a conversion."""
+    lines = [
+        f"Peak RSS {summary['peak_rss_bytes'] / 1e6:.0f} MB, "
+        f"peak open files {summary['peak_open_files']}"
+    ]
+    for phase in summary["phases"]:
+        line = (
+            f"{phase['plate']} {phase['phase']}: {phase['seconds']:.1f} s, "
+            f"peak RSS {phase['peak_rss_bytes'] / 1e6:.0f} MB, "
+            f"{phase['cpu_cores']} cores, {phase['peak_open_files']} open files"
+        )
+        if phase["peak_python_heap_bytes"] is not None:
+            line += f", Python heap {phase['peak_python_heap_bytes'] / 1e6:.0f} MB"
+        lines.append(line)
+        lines += [
+            f"    worker {name}: peak RSS {worker['peak_rss_bytes'] / 1e6:.0f} MB, "
+            f"{worker['cpu_cores']} cores, {worker['peak_open_files']} open files"
+            for name, worker in phase["workers"].items()
+        ]
+    return "\n".join(lines)
+
+
+def _get_worker_usage(start: float, stop: float) -> dict[str, dict[str, Any]]:
+    """Resources of the workers of the default Dask client during a phase."""
+    import distributed
+
+    try:
+        client = distributed.default_client()
+    except ValueError:
+        return {}
+    return client.run(_get_usage_of_worker, start, stop)
+
+
+def _get_usage_of_worker(
+    start: float, stop: float, dask_worker: Optional["distributed.Worker"] = None
+) -> dict[str, Any]:
+    """Peaks of the system monitor of a worker between `start` and `stop`.
+
+    The last sample before `stop` is used if the phase was shorter than the
+    interval of the monitor.
+    """
+    quantities = dask_worker.monitor.quantities
+    times = list(quantities["time"])
+    memory = list(quantities["memory"])
+    cpu = list(quantities["cpu"])
+    n_fds = list(quantities.get("num_fds", [0] * len(times)))
+    indices = [i for i, t in enumerate(times) if start <= t <= stop]
+    if len(indices) == 0:
+        indices = [i for i, t in enumerate(times) if t <= stop][-1:]
+    if len(indices) == 0:
+        return {"peak_rss_bytes": 0, "peak_open_files": 0, "cpu_cores": 0.0}
+    return {
+        "peak_rss_bytes": int(max(memory[i] for i in indices)),
+        "peak_open_files": int(max(n_fds[i] for i in indices)),
+        "cpu_cores": round(sum(cpu[i] for i in indices) / len(indices) / 100, 2),
+    }
@@ -114,6 +114,88 @@ def create_fov_ROI_table(
     return ad.AnnData(roi_table)
 
 
+def create_field_ROI_tables(plate_acquisition: PlateAcquisition):
+    """Generate the ROI tables of the per-field images of a plate.
+
+    Each field of view is its own image, its FOV_ROI_table has a single ROI
+    that covers the whole image. The position of the field in the well is
+    kept in the "x_micrometer_original" and "y_micrometer_original" columns.
+
+    Returns:
+        Per well, a list with the tables of each field, in the order of
+        `get_fields`.
+    """
+    columns = [
+        "FieldIndex",
+        "x_micrometer",
+        "y_micrometer",
+        "z_micrometer",
+        "len_x_micrometer",
+        "len_y_micrometer",
+        "len_z_micrometer",
+        "x_micrometer_original",
+        "y_micrometer_original",
+    ]
+    n_z = plate_acquisition.get_common_well_shape()[2]
+    plate_roi_tables = {}
+    for well_acquisition in plate_acquisition.get_well_acquisitions():
+        y_spacing, x_spacing = well_acquisition.get_yx_spacing()
+        z_spacing = well_acquisition.get_z_spacing()
+        if z_spacing is None:
+            z_spacing = 1
+        field_tables = []
+        for field_index, tiles in enumerate(get_fields(well_acquisition.get_tiles())):
+            tile = tiles[0]
+            roi_table = pd.DataFrame(
+                [
+                    (
+                        f"FOV_{field_index + 1}",
+                        0.0,
+                        0.0,
+                        0.0,
+                        tile.shape[-1] * x_spacing,
+                        tile.shape[-2] * y_spacing,
+                        n_z * z_spacing,
+                        tile.position.x * x_spacing,
+                        tile.position.y * y_spacing,
+                    )
+                ],
+                columns=columns,
+            ).set_index("FieldIndex")
+            # Cast the values to float to avoid anndata type issues
+            field_tables.append(
+                {"FOV_ROI_table": ad.AnnData(roi_table.astype(np.float32))}
+            )
+        plate_roi_tables[well_acquisition.name] = field_tables
+
+    return plate_roi_tables
+
+
+def get_fields(tiles: list[Tile]) -> list[list[Tile]]:
+    """Group the tiles of a well by field of view.
+
+    Tiles at the same yx position belong to the same field. The fields are
+    ordered like the ROIs of the FOV_ROI_table, the tiles of a field by
+    time point, channel and z-plane.
+    """
+    sorted_tiles = sorted(tiles, key=lambda tile: tile.path)
+    sorted_tiles = sorted(sorted_tiles, key=_extract_fov_sort_key)
+    fields: dict[tuple[int, int], list[Tile]] = {}
+    for tile in sorted_tiles:
+        fields.setdefault((tile.position.y, tile.position.x), []).append(tile)
+    return [
+        sorted(
+            field,
+            key=lambda tile: (
+                tile.position.time or 0,
+                tile.position.channel or 0,
+                tile.position.z,
+            ),
+        )
+        for field in fields.values()
+    ]
+
+
 def _extract_fov_sort_key(tile):
     """Extract the FOV site information from an MD filename."""
     filename = tile.path.split("/")[-1]
@@ -0,0 +1,69 @@
+"""Helpers to handle local paths and fsspec URLs (e.g. `s3://`) alike.
+
+Object stores are accessed through fsspec, which reuses the connections of a
+file system instance across calls and uploads large objects as concurrent
+multipart uploads. Credentials and endpoints are configured the usual way,
+e.g. with the `AWS_ACCESS_KEY_ID`, `AWS_SECRET_ACCESS_KEY` and
+`AWS_ENDPOINT_URL` environment variables for S3-compatible stores.
+"""
+import logging
+import os
+import posixpath
+from urllib.parse import urlsplit, urlunsplit
+
+import fsspec
+
+logger = logging.getLogger(__name__)
+
+
+def get_fs(url: str) -> tuple[fsspec.AbstractFileSystem, str]:
+    """File system and path within it for a local path or fsspec URL."""
+    return fsspec.core.url_to_fs(url)
+
+
+def is_url(path: str) -> bool:
+    """Whether `path` is an fsspec URL rather than a local path."""
+    return "://" in str(path)
+
+
+def join(root: str, *parts: str) -> str:
+    """Join path components to a local path or fsspec URL.
+
+    The path of URLs is joined with "/" on every platform, a query string
+    or fragment of `root` is kept at the end.
+    """
+    if not is_url(root):
+        return os.path.join(root, *parts)
+    url = urlsplit(root)
+    return urlunsplit(url._replace(path=posixpath.join(url.path, *parts)))
+
+
+def exists(url: str) -> bool:
+    """Whether a file or directory (prefix on object stores) exists."""
+    fs, path = get_fs(url)
+    return fs.exists(path)
+
+
+def makedirs(url: str):
+    """Create a directory, a no-op for prefixes on object stores."""
+    fs, path = get_fs(url)
+    fs.makedirs(path, exist_ok=True)
+
+
+def write_text(url: str, text: str):
+    """Write a text file, creating its parent directory."""
+    fs, path = get_fs(url)
+    # Paths within fsspec file systems are separated by "/" on all platforms
+    fs.makedirs(posixpath.dirname(path), exist_ok=True)
+    with fs.open(path, "w") as f:
+        f.write(text)
+
+
+def remove(url: str):
+    """Recursively delete a directory or prefix.
+
+    On object stores, the keys are deleted in concurrent batches.
+    """
+    fs, path = get_fs(url)
+    logger.info(f"Removing {url}.")
+    fs.rm(path, recursive=True)
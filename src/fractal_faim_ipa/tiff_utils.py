@@ -0,0 +1,106 @@
+"""Read TIFF files from plain paths or from within archives."""
+import io
+import math
+import mmap
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import tifffile
+from faim_ipa.io import metaseries
+
+from fractal_faim_ipa import archive_utils, prefetch, reads
+
+
+def load_metaseries_tiff_metadata(path: str) -> dict:
+    """Load the metadata of a MetaSeries TIFF, see `faim_ipa.io.metaseries`.
+
+    The metadata of recently read files is cached, as the same files are
+    inspected repeatedly while an acquisition is parsed. Reads are guarded
+    by the `reads.ReadPolicy` of the process.
+    """
+    return dict(_load_metaseries_tiff_metadata(str(path)))
+
+
+@lru_cache(maxsize=4096)
+def _load_metaseries_tiff_metadata(path: str) -> dict:
+    return reads.guarded(_read_metaseries_tiff_metadata, path)
+
+
+def _read_metaseries_tiff_metadata(path: str) -> dict:
+    with archive_utils.open_file(path) as source:
+        return metaseries.load_metaseries_tiff_metadata(source)
+
+
+def load_correction_matrix(path: str) -> np.ndarray:
+    """Load a background or illumination correction matrix as float32.
+
+    Matrices are cached, such that every process reads the matrix of a
+    channel once instead of once per tile. The returned array is shared and
+    therefore read-only.
+    """
+    return _load_correction_matrix(str(path))
+
+
+@lru_cache(maxsize=64)
+def _load_correction_matrix(path: str) -> np.ndarray:
+    with archive_utils.open_file(path) as source:
+        matrix = tifffile.imread(source).astype(np.float32)
+    matrix.setflags(write=False)
+    return matrix
+
+
+def imread(path: str) -> np.ndarray:
+    """Read the image data of a TIFF file.
+
+    ImageXpress writes single uncompressed images in one contiguous strip.
+    The data of such files is not copied, but returned as read-only view
+    of the file mapped into memory, or of the buffer of files that were
+    read ahead by an active `prefetch.Prefetcher`. Other files are decoded.
+
+    Files that are not prefetched are read following the `reads.ReadPolicy`
+    of the process, which retries slow and hung reads.
+    """
+    content = prefetch.take(path)
+    if content is not None:
+        with io.BytesIO(content) as source, tifffile.TiffFile(source) as tiff:
+            layout = _get_contiguous_layout(tiff)
+            if layout is None:
+                return tiff.asarray()
+        offset, dtype, shape = layout
+        return np.frombuffer(
+            content, dtype=dtype, count=math.prod(shape), offset=offset
+        ).reshape(shape)
+    return reads.guarded(_read_file, path)
+
+
+def _read_file(path: str) -> np.ndarray:
+    with archive_utils.open_file(path) as source, tifffile.TiffFile(source) as tiff:
+        location = archive_utils.get_location(path)
+        layout = None if location is None else _get_contiguous_layout(tiff)
+        if layout is None:
+            return tiff.asarray()
+    filename, base_offset = location
+    offset, dtype, shape = layout
+    data = np.memmap(
+        filename, dtype=dtype, mode="r", offset=base_offset + offset, shape=shape
+    ).view(np.ndarray)
+    # The mapped pages are read now, while the read is guarded, instead of
+    # when the tile is stitched
+    data.reshape(-1).view(np.uint8)[:: mmap.PAGESIZE].sum()
+    return data
+
+
+def _get_contiguous_layout(
+    tiff: tifffile.TiffFile,
+) -> Optional[tuple[int, np.dtype, tuple[int, ...]]]:
+    """Offset, data type and shape of the image data of a single page TIFF.
+
+    Returns None if the data is compressed or not stored contiguously.
+    """
+    if len(tiff.pages) != 1:
+        return None
+    page = tiff.pages.first
+    if not page.is_memmappable or page.dtype is None:
+        return None
+    return page.dataoffsets[0], page.dtype.newbyteorder(tiff.byteorder), page.shape
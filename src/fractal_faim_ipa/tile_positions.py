@@ -0,0 +1,100 @@
+"""Read the tile sizes and stage positions of an acquisition.
+
+The positions are parsed from the MetaSeries XML in the ImageDescription of
+every TIFF. Parsing is CPU-bound Python code, so with threads it uses about
+one core, however many threads read the files. With the "processes"
+executor, batches of files are parsed in worker processes. They return the
+positions as compact integer arrays instead of the metadata dictionaries.
+
+Threads are faster for small acquisitions and on storage with a high read
+latency. Processes pay off for acquisitions with many files once the files
+are read faster than one core parses them. See
+`fractal_faim_ipa.dev.benchmark_metadata` for a comparison.
+"""
+import math
+import multiprocessing
+import os
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Literal, Optional
+
+import numpy as np
+
+from fractal_faim_ipa import reads
+from fractal_faim_ipa.tiff_utils import load_metaseries_tiff_metadata
+
+MetadataExecutor = Literal["threads", "processes"]
+
+# Batches per worker, such that workers that finish early get more work
+_BATCHES_PER_WORKER = 4
+_MAX_BATCH_SIZE = 1024
+
+
+def load_tile_positions(
+    paths: Sequence[str],
+    executor: MetadataExecutor = "threads",
+    n_workers: Optional[int] = None,
+) -> np.ndarray:
+    """Tile size and stage position of each file, in pixels.
+
+    Args:
+        paths: Paths of the MetaSeries TIFF files.
+        executor: "threads" or "processes".
+        n_workers: Number of threads or processes. Defaults to the number of
+            threads of a `ThreadPoolExecutor`, or to the number of CPUs
+            available to this process.
+
+    Returns:
+        Array of shape (len(paths), 4) with the size in y and x and the
+        position in y and x of each tile.
+    """
+    paths = [str(path) for path in paths]
+    if len(paths) == 0:
+        return np.empty((0, 4), dtype=np.int64)
+    if n_workers is None:
+        n_workers = (
+            min(32, _get_n_cpus() + 4) if executor == "threads" else _get_n_cpus()
+        )
+    n_workers = min(n_workers, len(paths))
+    batch_size = min(
+        math.ceil(len(paths) / (n_workers * _BATCHES_PER_WORKER)), _MAX_BATCH_SIZE
+    )
+    batches = [paths[i : i + batch_size] for i in range(0, len(paths), batch_size)]
+    with _create_executor(executor, n_workers) as pool:
+        return np.concatenate(list(pool.map(_load_positions, batches)))
+
+
+def _create_executor(executor: MetadataExecutor, n_workers: int) -> Executor:
+    if executor == "threads":
+        return ThreadPoolExecutor(n_workers, thread_name_prefix="tile-positions")
+    if executor == "processes":
+        # Forking a process that runs threads (e.g. of a Dask client) can
+        # deadlock, the workers are started from a clean process instead
+        methods = multiprocessing.get_all_start_methods()
+        method = "forkserver" if "forkserver" in methods else "spawn"
+        return ProcessPoolExecutor(
+            n_workers,
+            mp_context=multiprocessing.get_context(method),
+            initializer=reads.configure,
+            initargs=(reads.get_policy(),),
+        )
+    raise ValueError(f"Unknown metadata executor {executor!r}")
+
+
+def _load_positions(paths: list[str]) -> np.ndarray:
+    positions = np.empty((len(paths), 4), dtype=np.int64)
+    for i, path in enumerate(paths):
+        metadata = load_metaseries_tiff_metadata(path)
+        positions[i] = (
+            metadata["pixel-size-y"],
+            metadata["pixel-size-x"],
+            int(metadata["stage-position-y"] / metadata["spatial-calibration-y"]),
+            int(metadata["stage-position-x"] / metadata["spatial-calibration-x"]),
+        )
+    return positions
+
+
+def _get_n_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
@@ -0,0 +1,118 @@
+from pathlib import Path
+
+import dask.array as da
+import numpy as np
+import pytest
+import zarr
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import tile_value, write_metaxpress_plate
+
+mode = "MetaXpress MD Stack Acquisition"
+output_name = "TimeLapse"
+
+
+def test_append_timepoints(tmp_path):
+    image_dir = tmp_path / "images"
+    zarr_root = Path(tmp_path, "zarr-files")
+    zarr_root.mkdir()
+
+    write_metaxpress_plate(image_dir, timepoints=(1,))
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(zarr_root),
+        image_dir=str(image_dir),
+        zarr_name=output_name,
+        mode=mode,
+        parallelize=False,
+        append_timepoints=True,
+    )
+    image_path = zarr_root / f"{output_name}.zarr" / "C" / "03" / "0"
+    assert da.from_zarr(str(image_path / "0")).shape == (1, 2, 3, 64, 128)
+    first_chunk = image_path / "0" / "0" / "0" / "0" / "0" / "0"
+    first_chunk_mtime = first_chunk.stat().st_mtime_ns
+
+    write_metaxpress_plate(image_dir, timepoints=(2, 3))
+    image_list_updates = convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(zarr_root),
+        image_dir=str(image_dir),
+        zarr_name=output_name,
+        mode=mode,
+        parallelize=False,
+        append_timepoints=True,
+    )["image_list_updates"]
+    assert len(image_list_updates) == 1
+
+    image = da.from_zarr(str(image_path / "0")).compute()
+    assert image.shape == (3, 2, 3, 64, 128)
+    for t in range(3):
+        # Channel 2, z-plane 3, field 2
+        assert np.all(image[t, 1, 2, :, 64:] == tile_value(t + 1, 2, 3, 2))
+    assert da.from_zarr(str(image_path / "1")).shape == (3, 2, 3, 32, 64)
+    assert da.from_zarr(str(image_path / "1"))[2, 0, 0, 0, 0].compute() == (
+        tile_value(3, 1, 1, 1)
+    )
+    # Existing time points are not rewritten
+    assert first_chunk.stat().st_mtime_ns == first_chunk_mtime
+
+
+def test_append_timepoints_requires_metaxpress(tmp_path):
+    with pytest.raises(ValueError):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(tmp_path),
+            mode="MD Stack Acquisition",
+            append_timepoints=True,
+        )
+
+
+def _convert(image_dir, zarr_root):
+    return convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(zarr_root),
+        image_dir=str(image_dir),
+        zarr_name=output_name,
+        mode=mode,
+        parallelize=False,
+        append_timepoints=True,
+    )
+
+
+def test_append_later_timepoints(tmp_path):
+    zarr_root = tmp_path / "zarr-files"
+    _convert(write_metaxpress_plate(tmp_path / "tp_1", timepoints=(1,)), zarr_root)
+    _convert(write_metaxpress_plate(tmp_path / "tp_2_3", timepoints=(2, 3)), zarr_root)
+    image_path = zarr_root / f"{output_name}.zarr" / "C" / "03" / "0"
+    image = zarr.open_group(str(image_path), mode="r")
+    assert image["0"].shape == (3, 2, 3, 64, 128)
+    assert image["0"][:, 0, 0, 0, 0].tolist() == [
+        tile_value(t, 1, 1, 1) for t in (1, 2, 3)
+    ]
+    assert image.attrs["time_points"] == {"first": 1, "n_complete": 3}
+
+
+def test_append_timepoints_with_gap(tmp_path):
+    zarr_root = tmp_path / "zarr-files"
+    _convert(write_metaxpress_plate(tmp_path / "tp_1", timepoints=(1,)), zarr_root)
+    with pytest.raises(ValueError, match="only complete up to TimePoint 1"):
+        _convert(write_metaxpress_plate(tmp_path / "tp_3", timepoints=(3,)), zarr_root)
+
+
+def test_append_timepoints_finishes_incomplete_timepoints(tmp_path):
+    zarr_root = tmp_path / "zarr-files"
+    image_dir = write_metaxpress_plate(tmp_path / "images", timepoints=(1, 2))
+    _convert(image_dir, zarr_root)
+    # Time point 2 of an interrupted conversion
+    image = zarr.open_group(
+        str(zarr_root / f"{output_name}.zarr" / "C" / "03" / "0"), mode="r+"
+    )
+    image["0"][1] = 0
+    image.attrs["time_points"] = {"first": 1, "n_complete": 1}
+
+    _convert(image_dir, zarr_root)
+    image = zarr.open_group(image.store.path, mode="r")
+    assert image["0"][:, 0, 0, 0, 0].tolist() == [
+        tile_value(t, 1, 1, 1) for t in (1, 2)
+    ]
+    assert image.attrs["time_points"] == {"first": 1, "n_complete": 2}
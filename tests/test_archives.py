@@ -0,0 +1,105 @@
+import os
+import tarfile
+import zipfile
+
+import dask.array as da
+import numpy as np
+import pytest
+import tifffile
+from fractal_faim_ipa import archive_utils
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import tile_value, write_metaxpress_plate
+from fractal_faim_ipa.tiff_utils import imread
+
+
+def _write_archive(image_dir, archive_path, compression=zipfile.ZIP_STORED):
+    if str(archive_path).lower().endswith(".tar"):
+        with tarfile.open(archive_path, "w") as tar:
+            tar.add(image_dir, arcname=".")
+    else:
+        with zipfile.ZipFile(archive_path, "w", compression=compression) as archive:
+            for root, _, filenames in os.walk(image_dir):
+                for filename in filenames:
+                    path = os.path.join(root, filename)
+                    archive.write(path, os.path.relpath(path, image_dir))
+    archive_utils.get_index.cache_clear()
+    return archive_path
+
+
+@pytest.mark.parametrize(
+    "archive_name,compression",
+    [
+        ("images.tar", None),
+        ("images.zip", zipfile.ZIP_STORED),
+        ("images.zip", zipfile.ZIP_DEFLATED),
+        ("IMAGES.TAR", None),
+        ("IMAGES.ZIP", zipfile.ZIP_STORED),
+    ],
+)
+def test_read_archive_members(tmp_path, archive_name, compression):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    archive_path = _write_archive(image_dir, tmp_path / archive_name, compression)
+
+    member = f"{archive_path}/TimePoint_1/ZStep_2/Synthetic_C03_s2_w1.TIF"
+    assert archive_utils.split_archive_path(member) == (
+        str(archive_path),
+        "TimePoint_1/ZStep_2/Synthetic_C03_s2_w1.TIF",
+    )
+    assert np.all(imread(member) == tile_value(1, 1, 2, 2))
+    with pytest.raises(FileNotFoundError):
+        imread(f"{archive_path}/TimePoint_1/missing.TIF")
+
+
+@pytest.mark.parametrize("archive_name", ["images.tar", "images.zip"])
+def test_convert_from_archive(tmp_path, archive_name):
+    image_dir = write_metaxpress_plate(tmp_path / "images", timepoints=(1, 2))
+    archive_path = _write_archive(image_dir, tmp_path / archive_name)
+
+    for name, source in [("FromDir", image_dir), ("FromArchive", archive_path)]:
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(source),
+            zarr_name=name,
+            mode="MetaXpress MD Stack Acquisition",
+            parallelize=False,
+        )
+
+    from_dir = da.from_zarr(str(tmp_path / "FromDir.zarr" / "C" / "03" / "0" / "0"))
+    from_archive = da.from_zarr(
+        str(tmp_path / "FromArchive.zarr" / "C" / "03" / "0" / "0")
+    )
+    assert from_archive.shape == (2, 2, 3, 64, 128)
+    np.testing.assert_array_equal(from_archive.compute(), from_dir.compute())
+
+
+@pytest.mark.parametrize(
+    "archive_name,compression,mapped",
+    [
+        (None, None, True),
+        ("images.tar", None, True),
+        ("images.zip", zipfile.ZIP_STORED, True),
+        ("images.zip", zipfile.ZIP_DEFLATED, False),
+    ],
+)
+def test_memory_mapped_reads(tmp_path, archive_name, compression, mapped):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    source = image_dir
+    if archive_name is not None:
+        source = _write_archive(image_dir, tmp_path / archive_name, compression)
+
+    data = imread(f"{source}/TimePoint_1/ZStep_2/Synthetic_C03_s2_w1.TIF")
+    assert data.shape == (64, 64)
+    assert np.all(data == tile_value(1, 1, 2, 2))
+    # Uncompressed files are not copied, but mapped read-only
+    assert isinstance(data.base, np.memmap) == mapped
+    assert data.flags.writeable != mapped
+
+
+def test_compressed_tiffs_are_decoded(tmp_path):
+    path = tmp_path / "compressed.tif"
+    expected = np.arange(64 * 64, dtype=np.uint16).reshape(64, 64)
+    tifffile.imwrite(path, expected, compression="zlib")
+    data = imread(str(path))
+    np.testing.assert_array_equal(data, expected)
+    assert data.flags.writeable
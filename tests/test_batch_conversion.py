@@ -0,0 +1,51 @@
+import dask.array as da
+import numpy as np
+import pytest
+from fractal_faim_ipa.convert_ome_zarr_batch import convert_ome_zarr_batch
+from fractal_faim_ipa.dev.synthetic_plate import tile_value, write_metaxpress_plate
+
+
+def test_convert_plates(tmp_path):
+    plates = []
+    for index, n_z in enumerate([3, 1]):
+        image_dir = write_metaxpress_plate(
+            tmp_path / f"images_{index}", wells=("C03", "D04"), n_z=n_z
+        )
+        plates.append({"image_dir": str(image_dir), "zarr_name": f"Plate{index}"})
+
+    image_list_updates = convert_ome_zarr_batch(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        plates=plates,
+        parallelize=False,
+    )["image_list_updates"]
+    image_list_updates.sort(key=lambda update: update["zarr_url"])
+
+    assert [update["zarr_url"] for update in image_list_updates] == [
+        f"{tmp_path}/Plate{index}.zarr/{well}/0"
+        for index in range(2)
+        for well in ["C/03", "D/04"]
+    ]
+    # The modes are detected per plate
+    assert [update["types"]["is_3D"] for update in image_list_updates] == [
+        True,
+        True,
+        False,
+        False,
+    ]
+    stack = da.from_zarr(str(tmp_path / "Plate0.zarr" / "D" / "04" / "0" / "0"))
+    assert stack.shape == (2, 3, 64, 128)
+    assert np.all(stack[1, 2, :, :64].compute() == tile_value(1, 2, 3, 1))
+    plane = da.from_zarr(str(tmp_path / "Plate1.zarr" / "C" / "03" / "0" / "0"))
+    assert np.all(plane[0, ..., 64:].compute() == tile_value(1, 1, 1, 2))
+
+
+def test_plate_names_must_be_unique(tmp_path):
+    plate = {"image_dir": str(tmp_path), "zarr_name": "Plate"}
+    with pytest.raises(ValueError):
+        convert_ome_zarr_batch(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            plates=[plate, plate],
+            mode="MetaXpress MD Stack Acquisition",
+        )
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import zarr
+from faim_ipa.stitching.tile import Tile, TilePosition
+from fractal_faim_ipa import blank_tiles
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import tile_value, write_metaxpress_plate
+
+
+@pytest.fixture
+def blank_stats(monkeypatch):
+    monkeypatch.setattr(blank_tiles, "_threshold", blank_tiles.get_threshold())
+    monkeypatch.setattr(blank_tiles, "_blank_paths", set())
+
+
+def _chunk_files(array_dir):
+    return [
+        path
+        for path in array_dir.rglob("*")
+        if path.is_file() and not path.name.startswith(".")
+    ]
+
+
+def test_blank_tiles_are_masked_when_fused(blank_stats, monkeypatch):
+    blank_tiles.configure(10)
+    assert not blank_tiles.is_blank("bright", np.full((4, 4), 10))
+    assert blank_tiles.is_blank("dark", np.full((4, 4), 9))
+    tiles = [
+        Tile(
+            path=path,
+            shape=(4, 4),
+            position=TilePosition(time=0, channel=0, z=0, y=0, x=x),
+        )
+        for path, x in [("bright", 0), ("dark", 2)]
+    ]
+    block_info = {None: {"array-location": [(0, 1), (0, 1), (0, 1), (0, 4), (0, 6)]}}
+    _, masks = blank_tiles.translate_tiles_2d(
+        block_info, (1, 4, 6), tiles, build_acquisition_mask=True
+    )
+    assert masks[1].any()
+
+    monkeypatch.setattr(
+        Tile, "load_data", lambda tile: np.zeros(tile.shape, dtype=np.uint16)
+    )
+    _, masks = blank_tiles.translate_tiles_2d(block_info, (1, 4, 6), tiles)
+    assert masks[0].any()
+    assert not masks[1].any()
+    assert blank_tiles.pop_blank_tiles() == ["dark"]
+    assert blank_tiles.pop_blank_tiles() == []
+
+
+@pytest.mark.parametrize("fov_images", [False, True])
+def test_convert_with_blank_tiles(tmp_path, blank_stats, fov_images):
+    image_dir = write_metaxpress_plate(tmp_path / "images", grid_shape=(1, 2))
+    # Channel 1 is below the threshold, channel 2 is not
+    threshold = tile_value(1, 2, 1, 1)
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        fov_images=fov_images,
+        blank_tile_threshold=threshold,
+    )
+    plate = zarr.open_group(str(tmp_path / "Plate.zarr"), mode="r")
+    image = plate["C/03/0"]
+    assert image.attrs["skipped_fovs"] == []
+    assert np.all(image["0"][0] == 0)
+    assert np.all(image["0"][1, 0, :, :64] == tile_value(1, 2, 1, 1))
+    # Only the chunks of channel 2 are written
+    array_dir = tmp_path / "Plate.zarr" / "C" / "03" / "0" / "0"
+    chunks = _chunk_files(array_dir)
+    assert len(chunks) > 0
+    assert all(path.relative_to(array_dir).parts[0] == "1" for path in chunks)
+
+    # All tiles are blank
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        zarr_name="Blank",
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        fov_images=fov_images,
+        blank_tile_threshold=tile_value(2, 0, 0, 0),
+    )
+    plate = zarr.open_group(str(tmp_path / "Blank.zarr"), mode="r")
+    if fov_images:
+        assert plate["C/03/0"].attrs["skipped_fovs"] == ["FOV_1"]
+        assert plate["C/03/1"].attrs["skipped_fovs"] == ["FOV_2"]
+    else:
+        assert plate["C/03/0"].attrs["skipped_fovs"] == ["FOV_1", "FOV_2"]
+    assert _chunk_files(tmp_path / "Blank.zarr" / "C" / "03" / "0" / "0") == []
+    assert blank_tiles.pop_blank_tiles() == []
+
+
+def test_blank_tiles_require_metaxpress(tmp_path):
+    with pytest.raises(ValueError):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(tmp_path),
+            mode="MD Stack Acquisition",
+            blank_tile_threshold=100,
+        )
@@ -0,0 +1,542 @@
+import json
+import anndata as ad
+import dask.array as da
+import distributed
+import numpy as np
+import pytest
+import tifffile
+import zarr
+from faim_ipa.hcs.acquisition import TileAlignmentOptions
+from faim_ipa.hcs.converter import NGFFPlate
+from fractal_faim_ipa import tiff_utils
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.converter import ConvertToNGFFPlate
+from fractal_faim_ipa.dev.synthetic_plate import tile_value, write_metaxpress_plate
+from fractal_faim_ipa.imagexpress_zmb import ImageXpressTile
+from fractal_faim_ipa.imagexpress_zmb.ImageXpressTile import bin_yx
+from fractal_faim_ipa.md_converter_utils import (
+    MAX_FOV_CHUNK_Z,
+    ChunkLayoutEnum,
+    ModeEnum,
+)
+
+
+def test_convert_slices_concurrently(tmp_path):
+    image_dir = write_metaxpress_plate(
+        tmp_path / "images", wells=("C03", "D04"), timepoints=(1, 2)
+    )
+    plate_acquisition = ModeEnum.MetaXpressStackAcquisition.get_plate_acquisition(
+        acquisition_dir=str(image_dir),
+        alignment=TileAlignmentOptions.GRID,
+    )
+    with distributed.Client(
+        n_workers=1, threads_per_worker=4, processes=False
+    ) as client:
+        converter = ConvertToNGFFPlate(
+            ngff_plate=NGFFPlate(
+                root_dir=str(tmp_path),
+                name="Plate",
+                layout=96,
+                order_name="order",
+                barcode="barcode",
+            ),
+            client=client,
+        )
+        plate = converter.create_zarr_plate(plate_acquisition)
+        converter.run(
+            plate=plate,
+            plate_acquisition=plate_acquisition,
+            chunks=(32, 32),
+            max_layer=2,
+        )
+
+    plate = zarr.open_group(str(tmp_path / "Plate.zarr"), mode="r")
+    for well in ["C/03/0", "D/04/0"]:
+        image = da.from_zarr(plate[f"{well}/0"]).compute()
+        assert image.shape == (2, 2, 3, 64, 128)
+        for t, c, z in np.ndindex(image.shape[:3]):
+            assert np.all(image[t, c, z, :, :64] == tile_value(t + 1, c + 1, z + 1, 1))
+            assert np.all(image[t, c, z, :, 64:] == tile_value(t + 1, c + 1, z + 1, 2))
+        assert plate[f"{well}/2"].shape == (2, 2, 3, 16, 32)
+        datasets = plate[well].attrs["multiscales"][0]["datasets"]
+        assert [dataset["path"] for dataset in datasets] == ["0", "1", "2"]
+
+
+@pytest.mark.parametrize(
+    "chunk_layout,expected_chunks",
+    [
+        ("Default", (1, 1, 1, 64, 128)),
+        ("FOV", (1, 1, 3, 64, 64)),
+        ("Well", (1, 1, 1, 64, 128)),
+    ],
+)
+def test_chunk_layout(tmp_path, chunk_layout, expected_chunks):
+    image_dir = write_metaxpress_plate(tmp_path / "images", timepoints=(1, 2))
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        chunk_layout=chunk_layout,
+    )
+    image = zarr.open_array(str(tmp_path / "Plate.zarr" / "C" / "03" / "0" / "0"))
+    assert image.chunks == expected_chunks
+    assert np.all(image[1, 0, 2, :, 64:] == tile_value(2, 1, 3, 2))
+    # Chunks are clipped to the shape of the lower resolution levels
+    level_1 = zarr.open_array(str(tmp_path / "Plate.zarr" / "C" / "03" / "0" / "1"))
+    assert level_1.chunks[-2:] == (32, min(expected_chunks[-1], 64))
+
+
+def test_fov_chunks_are_capped_in_z(tmp_path):
+    image_dir = write_metaxpress_plate(
+        tmp_path / "images", n_z=MAX_FOV_CHUNK_Z + 2, n_channels=1
+    )
+    plate_acquisition = ModeEnum.MetaXpressStackAcquisition.get_plate_acquisition(
+        acquisition_dir=str(image_dir),
+        alignment=TileAlignmentOptions.GRID,
+    )
+    _, output_chunks = ChunkLayoutEnum.FOV.get_chunks(plate_acquisition)
+    assert output_chunks == (MAX_FOV_CHUNK_Z, 64, 64)
+
+
+def test_compute_histograms(tmp_path, monkeypatch):
+    image_dir = write_metaxpress_plate(tmp_path / "images", wells=("C03", "D04"))
+    loaded_tiles = []
+    load_data = ImageXpressTile.load_data
+
+    def _load_data(self):
+        loaded_tiles.append(self.path)
+        return load_data(self)
+
+    monkeypatch.setattr(ImageXpressTile, "load_data", _load_data)
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        compute_histograms=True,
+    )
+    # The histograms are computed from the same blocks that are written, only
+    # the probing of the tile dimensions reads a few tiles a second time.
+    n_tiles = 2 * 2 * 2 * 3
+    assert len(set(loaded_tiles)) == n_tiles
+    assert len(loaded_tiles) < 2 * n_tiles
+    for well in ["C/03/0", "D/04/0"]:
+        image_path = tmp_path / "Plate.zarr" / well
+        channels = zarr.open_group(str(image_path), mode="r").attrs["omero"]["channels"]
+        for c, channel in enumerate(channels):
+            assert channel["window"]["start"] == tile_value(1, c + 1, 1, 1)
+            assert channel["window"]["end"] == tile_value(1, c + 1, 3, 2)
+        table = ad.read_zarr(str(image_path / "tables" / "intensity_histogram"))
+        assert list(table.var_names) == ["C01", "C02"]
+        counts = table[str(tile_value(1, 2, 3, 2)), "C02"].X
+        assert counts == 64 * 64
+        assert table.X.sum() == 2 * 3 * 64 * 128
+
+
+def test_compute_histograms_with_channel_gap(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images", n_channels=3)
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        query="channel != 'w2'",
+        compute_histograms=True,
+    )
+    image_path = tmp_path / "Plate.zarr" / "C" / "03" / "0"
+    channels = zarr.open_group(str(image_path), mode="r").attrs["omero"]["channels"]
+    assert [channel["active"] for channel in channels] == [True, False, True]
+    for c in [1, 3]:
+        assert channels[c - 1]["window"]["start"] == tile_value(1, c, 1, 1)
+        assert channels[c - 1]["window"]["end"] == tile_value(1, c, 3, 2)
+    table = ad.read_zarr(str(image_path / "tables" / "intensity_histogram"))
+    assert list(table.var_names) == ["C01", "C03"]
+    assert table[str(tile_value(1, 3, 3, 2)), "C03"].X == 64 * 64
+
+
+def test_write_mip(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images", timepoints=(1, 2))
+    image_list_updates = convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        write_mip=True,
+    )["image_list_updates"]
+
+    assert len(image_list_updates) == 2
+    mip_update = image_list_updates[1]
+    assert mip_update["zarr_url"] == f"{tmp_path}/Plate_mip.zarr/C/03/0"
+    assert mip_update["origin"] == image_list_updates[0]["zarr_url"]
+    assert mip_update["attributes"]["plate"] == "Plate_mip.zarr"
+    assert mip_update["types"] == {"is_3D": False}
+
+    mip_path = tmp_path / "Plate_mip.zarr" / "C" / "03" / "0"
+    mip = da.from_zarr(str(mip_path / "0")).compute()
+    assert mip.shape == (2, 2, 1, 64, 128)
+    for t, c in np.ndindex(mip.shape[:2]):
+        # The last z-plane has the highest intensities
+        assert np.all(mip[t, c, 0, :, :64] == tile_value(t + 1, c + 1, 3, 1))
+    assert da.from_zarr(str(mip_path / "2")).shape == (2, 2, 1, 16, 32)
+    multiscales = zarr.open_group(str(mip_path), mode="r").attrs["multiscales"]
+    assert multiscales[0]["datasets"][0]["coordinateTransformations"][0]["scale"] == [
+        1.0,
+        1.0,
+        1.5,
+        0.5,
+        0.5,
+    ]
+    well_roi_table = ad.read_zarr(str(mip_path / "tables" / "well_ROI_table"))
+    assert well_roi_table[:, "len_z_micrometer"].X[0, 0] == 1.5
+    assert "FOV_ROI_table" in zarr.open_group(str(mip_path / "tables"), mode="r")
+
+
+def test_write_mip_requires_3D(tmp_path):
+    with pytest.raises(ValueError):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(tmp_path),
+            mode="MetaXpress MD Single Plane Acquisition",
+            write_mip=True,
+        )
+
+
+def test_stack_and_projection_acquisition(tmp_path):
+    image_dir = write_metaxpress_plate(
+        tmp_path / "images", n_channels=3, projection_channels=(3,)
+    )
+    image_list_updates = convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack and Projection Acquisition",
+        parallelize=False,
+    )["image_list_updates"]
+
+    assert [update["zarr_url"] for update in image_list_updates] == [
+        f"{tmp_path}/Plate.zarr/C/03/0",
+        f"{tmp_path}/Plate.zarr/C/03/1",
+    ]
+    assert [update["types"]["is_3D"] for update in image_list_updates] == [
+        True,
+        False,
+    ]
+    well_path = tmp_path / "Plate.zarr" / "C" / "03"
+    well_images = zarr.open_group(str(well_path), mode="r").attrs["well"]["images"]
+    assert [image["path"] for image in well_images] == ["0", "1"]
+    stack = da.from_zarr(str(well_path / "0" / "0"))
+    assert stack.shape == (2, 3, 64, 128)
+    projection = da.from_zarr(str(well_path / "1" / "0")).compute()
+    assert projection.shape == (64, 128)
+    assert np.all(projection[:, 64:] == tile_value(1, 3, 0, 2))
+    omero = zarr.open_group(str(well_path / "1"), mode="r").attrs["omero"]
+    assert [channel["label"] for channel in omero["channels"]] == ["Channel_3"]
+    assert "FOV_ROI_table" in zarr.open_group(str(well_path / "1" / "tables"))
+
+
+def test_dry_run(tmp_path):
+    image_dir = write_metaxpress_plate(
+        tmp_path / "images", wells=("C03", "D04"), timepoints=(1, 2)
+    )
+    output = convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        write_mip=True,
+        dry_run=True,
+    )
+
+    assert output == {"image_list_updates": []}
+    assert not (tmp_path / "Plate.zarr").exists()
+    plan = json.loads((tmp_path / "Plate_plan.json").read_text())
+    assert plan["n_wells"] == 2
+    assert plan["n_tiles"] == plan["n_files"] == 2 * 2 * 2 * 3 * 2
+    assert (plan["n_timepoints"], plan["n_channels"], plan["n_z_planes"]) == (2, 2, 3)
+    assert plan["dtype"] == "uint16"
+    assert plan["shapes"]["image"][0] == [2, 2, 3, 64, 128]
+    assert plan["shapes"]["image"][3] == [2, 2, 3, 8, 16]
+    assert plan["shapes"]["mip"][0] == [2, 2, 1, 64, 128]
+    assert plan["uncompressed_bytes"] == 2 * 2 * (4 * 3 + 4) * (
+        64 * 128 + 32 * 64 + 16 * 32 + 8 * 16
+    )
+    assert 0 < plan["compressed_bytes"] < plan["uncompressed_bytes"]
+    assert plan["peak_memory_per_well_bytes"] > 0
+    assert 1 <= plan["cpus_per_task"] <= 8
+    assert plan["mem"] >= 2000
+
+
+def test_binning(tmp_path, monkeypatch):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    loaded_shapes = []
+    load_data = ImageXpressTile.load_data
+
+    def _load_data(self):
+        data = load_data(self)
+        loaded_shapes.append(data.shape)
+        return data
+
+    monkeypatch.setattr(ImageXpressTile, "load_data", _load_data)
+    for name, binning in [("Plate", 1), ("Binned", 2)]:
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(image_dir),
+            zarr_name=name,
+            mode="MetaXpress MD Stack Acquisition",
+            parallelize=False,
+            binning=binning,
+        )
+
+    # The tiles are binned before they are stitched
+    assert loaded_shapes[-1] == (32, 32)
+    image_path = tmp_path / "Plate.zarr" / "C" / "03" / "0"
+    binned_path = tmp_path / "Binned.zarr" / "C" / "03" / "0"
+    binned = da.from_zarr(str(binned_path / "0")).compute()
+    assert binned.shape == (2, 3, 32, 64)
+    np.testing.assert_array_equal(binned, da.from_zarr(str(image_path / "1")).compute())
+    multiscales = zarr.open_group(str(binned_path), mode="r").attrs["multiscales"]
+    transformations = multiscales[0]["datasets"][0]["coordinateTransformations"]
+    assert transformations[0]["scale"][-2:] == [1.0, 1.0]
+    for table_name in ["FOV_ROI_table", "well_ROI_table"]:
+        table = ad.read_zarr(str(image_path / "tables" / table_name))
+        binned_table = ad.read_zarr(str(binned_path / "tables" / table_name))
+        np.testing.assert_allclose(binned_table.X, table.X)
+
+
+def test_bin_yx():
+    data = np.arange(5 * 7, dtype=np.uint16).reshape(5, 7)
+    binned = bin_yx(data, 2)
+    assert binned.dtype == np.uint16
+    expected = data[:4, :6].reshape(2, 2, 3, 2).mean(axis=(1, 3)).astype(np.uint16)
+    np.testing.assert_array_equal(binned, expected)
+    assert bin_yx(data, 1) is data
+
+
+def test_pyramid_levels_are_not_read_back(tmp_path, monkeypatch):
+    image_dir = write_metaxpress_plate(tmp_path / "images", timepoints=(1, 2))
+
+    def _from_zarr(*args, **kwargs):
+        raise AssertionError("Pyramid levels must not be read back.")
+
+    monkeypatch.setattr(da, "from_zarr", _from_zarr)
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        write_mip=True,
+    )
+    monkeypatch.undo()
+
+    for plate_name in ["Plate.zarr", "Plate_mip.zarr"]:
+        image_group = zarr.open_group(str(tmp_path / plate_name / "C" / "03" / "0"))
+        for level in range(1, 4):
+            previous = image_group[str(level - 1)][:]
+            n_y, n_x = (s // 2 for s in previous.shape[-2:])
+            expected = (
+                previous[..., : 2 * n_y, : 2 * n_x]
+                .reshape(*previous.shape[:-2], n_y, 2, n_x, 2)
+                .mean(axis=(-3, -1))
+                .astype(previous.dtype)
+            )
+            np.testing.assert_array_equal(image_group[str(level)][:], expected)
+
+
+def test_correction_matrices(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    background_path = str(tmp_path / "background_w1.tif")
+    tifffile.imwrite(background_path, np.full((64, 64), 10, dtype=np.uint16))
+    flatfield = np.full((64, 64), 2.0, dtype=np.float32)
+    flatfield[:, 32:] = 4.0
+    flatfield_path = str(tmp_path / "flatfield.tif")
+    tifffile.imwrite(flatfield_path, flatfield)
+
+    tiff_utils._load_correction_matrix.cache_clear()
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        background_correction_matrices={"w1": background_path},
+        illumination_correction_matrices={"w1": flatfield_path, "w2": flatfield_path},
+    )
+    # Each matrix is read once, not once per tile
+    assert tiff_utils._load_correction_matrix.cache_info().misses == 2
+
+    image = da.from_zarr(str(tmp_path / "Plate.zarr" / "C" / "03" / "0" / "0"))
+    image = image.compute()
+    for z in range(3):
+        value = tile_value(1, 1, z + 1, 2)
+        assert np.all(image[0, z, :, 64:96] == (value - 10) // 2)
+        assert np.all(image[0, z, :, 96:] == (value - 10) // 4)
+        value = tile_value(1, 2, z + 1, 1)
+        assert np.all(image[1, z, :, :32] == value // 2)
+
+
+def test_correction_matrices_require_metaxpress(tmp_path):
+    with pytest.raises(ValueError):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(tmp_path),
+            mode="MD Stack Acquisition",
+            illumination_correction_matrices={"w1": str(tmp_path / "flatfield.tif")},
+        )
+
+
+def test_append_acquisition(tmp_path):
+    def convert(image_dir, **options):
+        return convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(image_dir),
+            mode="MetaXpress MD Stack Acquisition",
+            parallelize=False,
+            append_acquisition=True,
+            **options,
+        )["image_list_updates"]
+
+    cycle_1 = write_metaxpress_plate(tmp_path / "cycle_1", wells=("C03",))
+    cycle_2 = write_metaxpress_plate(
+        tmp_path / "cycle_2", wells=("C03", "D04"), n_channels=3
+    )
+    cycle_3 = write_metaxpress_plate(tmp_path / "cycle_3", wells=("D04",))
+    assert [u["zarr_url"] for u in convert(cycle_1)] == [
+        f"{tmp_path}/Plate.zarr/C/03/0"
+    ]
+    cycle_1_files = {
+        path: path.stat().st_mtime_ns
+        for path in (tmp_path / "Plate.zarr" / "C" / "03" / "0").rglob("*")
+    }
+
+    updates = convert(cycle_2)
+    assert sorted(u["zarr_url"] for u in updates) == [
+        f"{tmp_path}/Plate.zarr/C/03/1",
+        f"{tmp_path}/Plate.zarr/D/04/1",
+    ]
+    assert all(u["attributes"]["acquisition"] == 1 for u in updates)
+    (update,) = convert(cycle_3)
+    assert update["zarr_url"] == f"{tmp_path}/Plate.zarr/D/04/2"
+    assert update["attributes"] == {
+        "plate": "Plate.zarr",
+        "well": "D04",
+        "acquisition": 2,
+    }
+
+    plate = zarr.open_group(str(tmp_path / "Plate.zarr"), mode="r")
+    assert [well["path"] for well in plate.attrs["plate"]["wells"]] == ["C/03", "D/04"]
+    images = {
+        well: [image["path"] for image in plate[well].attrs["well"]["images"]]
+        for well in ["C/03", "D/04"]
+    }
+    assert images == {"C/03": ["0", "1"], "D/04": ["1", "2"]}
+    assert [
+        image["acquisition"] for image in plate["D/04"].attrs["well"]["images"]
+    ] == [1, 2]
+    assert plate.attrs["plate"]["acquisitions"] == [{"id": 0}, {"id": 1}, {"id": 2}]
+    assert plate["C/03/0/0"].shape == (2, 3, 64, 128)
+    assert plate["C/03/1/0"].shape == (3, 3, 64, 128)
+    assert np.all(plate["C/03/1/0"][2, 0, :, :64] == tile_value(1, 3, 1, 1))
+    assert "FOV_ROI_table" in plate["D/04/2/tables"]
+    # The first cycle is not rewritten
+    assert cycle_1_files == {
+        path: path.stat().st_mtime_ns
+        for path in (tmp_path / "Plate.zarr" / "C" / "03" / "0").rglob("*")
+    }
+
+
+def test_append_acquisition_outside_of_layout(tmp_path):
+    def convert(image_dir):
+        return convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(image_dir),
+            mode="MetaXpress MD Stack Acquisition",
+            parallelize=False,
+            append_acquisition=True,
+        )
+
+    convert(write_metaxpress_plate(tmp_path / "cycle_1", wells=("C03",)))
+    cycle_2 = write_metaxpress_plate(tmp_path / "cycle_2", wells=("D04", "C13"))
+    with pytest.raises(ValueError, match="Well C13 is not part of the layout"):
+        convert(cycle_2)
+    plate = zarr.open_group(str(tmp_path / "Plate.zarr"), mode="r")
+    assert [well["path"] for well in plate.attrs["plate"]["wells"]] == ["C/03"]
+
+
+def test_append_acquisition_does_not_overwrite(tmp_path):
+    with pytest.raises(ValueError):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(tmp_path),
+            mode="MetaXpress MD Stack Acquisition",
+            append_acquisition=True,
+            overwrite=True,
+        )
+
+
+def test_fov_images(tmp_path):
+    image_dir = write_metaxpress_plate(
+        tmp_path / "images", wells=("C03", "D04"), grid_shape=(1, 2)
+    )
+    image_list_updates = convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        fov_images=True,
+        write_mip=True,
+    )["image_list_updates"]
+    images = [u for u in image_list_updates if "origin" not in u]
+    assert sorted((u["zarr_url"], u["attributes"]["fov"]) for u in images) == [
+        (f"{tmp_path}/Plate.zarr/{well}/{field}", f"FOV_{int(field) + 1}")
+        for well in ["C/03", "D/04"]
+        for field in ["0", "1"]
+    ]
+    assert len(image_list_updates) == 8
+
+    plate = zarr.open_group(str(tmp_path / "Plate.zarr"), mode="r")
+    assert plate.attrs["plate"]["field_count"] == 2
+    assert [image["path"] for image in plate["C/03"].attrs["well"]["images"]] == [
+        "0",
+        "1",
+    ]
+    for field in range(2):
+        image = plate[f"C/03/{field}/0"]
+        assert image.shape == (2, 3, 64, 64)
+        assert np.all(image[1, 2] == tile_value(1, 2, 3, field + 1))
+        roi_table = ad.read_zarr(
+            str(tmp_path / "Plate.zarr" / "C" / "03" / str(field) / "tables")
+            + "/FOV_ROI_table"
+        )
+        assert roi_table.obs_names.tolist() == [f"FOV_{field + 1}"]
+        roi = roi_table[0].to_df().iloc[0]
+        assert roi["x_micrometer"] == 0
+        assert roi["len_x_micrometer"] == 64 * 0.5
+        assert roi["len_z_micrometer"] == 3 * 1.5
+        assert roi["x_micrometer_original"] == field * 64 * 0.5
+    mip_plate = zarr.open_group(str(tmp_path / "Plate_mip.zarr"), mode="r")
+    assert mip_plate["D/04/1/0"].shape == (2, 1, 64, 64)
+
+
+def test_fov_images_can_not_be_appended(tmp_path):
+    with pytest.raises(ValueError):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(tmp_path),
+            mode="MetaXpress MD Stack Acquisition",
+            fov_images=True,
+            append_acquisition=True,
+        )
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+# Importing a task, e.g. to build the manifest or to validate its arguments,
+# must not import the converter dependencies
+IMPORT_TIME_BUDGET_S = 1.0
+HEAVY_MODULES = {
+    "anndata",
+    "dask",
+    "distributed",
+    "faim_ipa",
+    "fractal_tasks_core.tables",
+    "pandas",
+    "zarr",
+}
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["fractal_faim_ipa.convert_ome_zarr", "fractal_faim_ipa.convert_ome_zarr_batch"],
+)
+def test_task_import_time(module):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, {module}; print(sorted(set(sys.modules) & {HEAVY_MODULES}))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+    # Lines are formatted as "import time: self [us] | cumulative | package"
+    cumulative_us = {
+        fields[2].strip(): int(fields[1])
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+        and len(fields := line.split("|")) == 3
+        and fields[1].strip().isdigit()
+    }
+    assert cumulative_us[module] / 1e6 < IMPORT_TIME_BUDGET_S
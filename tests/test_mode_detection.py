@@ -0,0 +1,60 @@
+import json
+import tarfile
+from os.path import join
+from pathlib import Path
+
+import pytest
+from fractal_faim_ipa import archive_utils
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import write_metaxpress_plate
+from fractal_faim_ipa.md_converter_utils import ModeEnum, detect_mode
+
+ROOT_DIR = Path(__file__).parent
+
+
+@pytest.mark.parametrize(
+    "plate_kwargs,expected_mode",
+    [
+        ({}, ModeEnum.MetaXpressStackAcquisition),
+        (
+            {"n_channels": 3, "projection_channels": (3,)},
+            ModeEnum.MetaXpressMixedAcquisition,
+        ),
+        ({"n_z": 1}, ModeEnum.MetaXpressSinglePlaneAcquisition_as3D),
+    ],
+)
+def test_detect_metaxpress_mode(tmp_path, plate_kwargs, expected_mode):
+    image_dir = write_metaxpress_plate(tmp_path / "images", **plate_kwargs)
+    assert detect_mode(str(image_dir)) == expected_mode
+
+    archive_path = tmp_path / "images.tar"
+    with tarfile.open(archive_path, "w") as tar:
+        tar.add(image_dir, arcname=".")
+    archive_utils.get_index.cache_clear()
+    assert detect_mode(str(archive_path)) == expected_mode
+
+
+def test_detect_md_mode():
+    image_dir = join(ROOT_DIR.parent, "resources", "Projection-Mix")
+    # Channel 3 is only available as projection, channel 4 in the first z-step
+    assert detect_mode(image_dir) == ModeEnum.MixedAcquisition
+
+
+def test_detect_mode_without_images(tmp_path):
+    (tmp_path / "empty").mkdir()
+    with pytest.raises(ValueError):
+        detect_mode(str(tmp_path))
+
+
+def test_auto_mode(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="auto",
+        write_mip=True,
+        dry_run=True,
+    )
+    plan = json.loads((tmp_path / "Plate_plan.json").read_text())
+    assert plan["n_z_planes"] == 3
@@ -0,0 +1,51 @@
+import dask.array as da
+import numpy as np
+import pytest
+import zarr
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import tile_value, write_metaxpress_plate
+
+moto_server = pytest.importorskip("moto.server")
+s3fs = pytest.importorskip("s3fs")
+
+bucket = "plates"
+
+
+@pytest.fixture
+def s3_endpoint(monkeypatch):
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    endpoint_url = f"http://{host}:{port}"
+    monkeypatch.setenv("AWS_ENDPOINT_URL", endpoint_url)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    s3fs.S3FileSystem.clear_instance_cache()
+    s3fs.S3FileSystem().mkdir(bucket)
+    yield endpoint_url
+    s3fs.S3FileSystem.clear_instance_cache()
+    server.stop()
+
+
+def test_convert_to_s3(tmp_path, s3_endpoint):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    zarr_dir = f"s3://{bucket}/zarr-files"
+
+    for overwrite in [False, True]:
+        image_list_updates = convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=zarr_dir,
+            image_dir=str(image_dir),
+            mode="MetaXpress MD Stack Acquisition",
+            parallelize=False,
+            overwrite=overwrite,
+        )["image_list_updates"]
+
+    zarr_url = image_list_updates[0]["zarr_url"]
+    assert zarr_url == f"{zarr_dir}/Plate.zarr/C/03/0"
+    image_group = zarr.open_group(zarr.storage.FSStore(zarr_url), mode="r")
+    image = da.from_zarr(image_group["0"]).compute()
+    assert image.shape == (2, 3, 64, 128)
+    assert np.all(image[1, 2, :, :64] == tile_value(1, 2, 3, 1))
+    assert "FOV_ROI_table" in image_group["tables"]
@@ -0,0 +1,107 @@
+import logging
+import threading
+from contextlib import nullcontext
+
+import distributed
+
+import numpy as np
+import zarr
+from fractal_faim_ipa import archive_utils, prefetch
+from faim_ipa.hcs.converter import NGFFPlate
+from faim_ipa.hcs.acquisition import TileAlignmentOptions
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.converter import ConvertToNGFFPlate
+from fractal_faim_ipa.dev.synthetic_plate import tile_value, write_metaxpress_plate
+from fractal_faim_ipa.md_converter_utils import ModeEnum
+
+
+def test_prefetcher_memory_cap(tmp_path, monkeypatch):
+    paths = []
+    for index in range(6):
+        path = tmp_path / f"file_{index}"
+        path.write_bytes(bytes([index]) * 1000)
+        paths.append(str(path))
+    reading = []
+    release = threading.Event()
+    read_bytes = archive_utils.read_bytes
+
+    def _read_bytes(path):
+        reading.append(path)
+        release.wait()
+        return read_bytes(path)
+
+    monkeypatch.setattr(archive_utils, "read_bytes", _read_bytes)
+    with prefetch.prefetching(paths, max_bytes=2500) as prefetcher:
+        # Only as many files as fit into the buffer are read ahead
+        assert sorted(reading) == paths[:2]
+        # Files that are not scheduled yet are not waited for
+        assert prefetch.take(paths[3]) is None
+        release.set()
+        assert prefetch.take(paths[0]) == bytes([0]) * 1000
+        assert prefetch.take(paths[1]) == bytes([1]) * 1000
+        assert prefetch.take(paths[2]) == bytes([2]) * 1000
+        assert prefetch.take(paths[4]) == bytes([4]) * 1000
+    assert paths[3] not in reading
+    assert prefetcher.n_hits == 4
+    assert prefetch.take(paths[5]) is None
+
+
+def test_convert_with_prefetching(tmp_path, caplog):
+    image_dir = write_metaxpress_plate(tmp_path / "images", wells=("C03", "D04"))
+    with caplog.at_level(logging.INFO, logger=prefetch.logger.name):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(image_dir),
+            mode="MetaXpress MD Stack Acquisition",
+            parallelize=False,
+            prefetch_mb=1,
+        )
+    image = zarr.open_array(str(tmp_path / "Plate.zarr" / "D" / "04" / "0" / "0"))
+    assert np.all(image[1, 2, :, 64:] == tile_value(1, 2, 3, 2))
+    # Every tile is read ahead, only the probing of the tile dimensions and
+    # data types reads a few of them again
+    messages = [r.getMessage() for r in caplog.records if "Prefetched" in r.msg]
+    assert messages[0].startswith(f"Prefetched {2 * 2 * 2 * 3} files")
+
+
+def test_convert_in_parallel_without_prefetching(tmp_path, caplog):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    with caplog.at_level(logging.INFO):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(image_dir),
+            mode="MetaXpress MD Stack Acquisition",
+            parallelize=True,
+            prefetch_mb=1,
+        )
+    image = zarr.open_array(str(tmp_path / "Plate.zarr" / "C" / "03" / "0" / "0"))
+    assert np.all(image[1, 2, :, 64:] == tile_value(1, 2, 3, 2))
+    # Parallel workers would take the tiles out of order, which leaves most
+    # of them to be read directly
+    assert any("single Dask worker thread" in r.getMessage() for r in caplog.records)
+    assert not any("Prefetched" in r.getMessage() for r in caplog.records)
+
+
+def test_no_prefetching_with_worker_threads(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    plate_acquisition = ModeEnum.MetaXpressStackAcquisition.get_plate_acquisition(
+        acquisition_dir=str(image_dir),
+        alignment=TileAlignmentOptions.GRID,
+    )
+    tiles = plate_acquisition.get_well_acquisitions()[0].get_tiles()
+    with distributed.Client(
+        n_workers=1, threads_per_worker=2, processes=False
+    ) as client:
+        converter = ConvertToNGFFPlate(
+            ngff_plate=NGFFPlate(
+                root_dir=str(tmp_path),
+                name="Plate",
+                layout=96,
+                order_name="order",
+                barcode="barcode",
+            ),
+            client=client,
+        )
+        assert isinstance(converter._prefetch(tiles, 1_000_000), nullcontext)
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+from fractal_faim_ipa.dev.synthetic_plate import write_metaxpress_plate
+from fractal_faim_ipa.profile import main, profile_conversion
+
+
+def test_profile_conversion(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    report_dir = tmp_path / "report"
+    report = profile_conversion(
+        str(image_dir),
+        str(tmp_path / "zarr"),
+        str(report_dir),
+        n_hot_spots=5,
+        write_mip=True,
+    )
+
+    assert report["options"] == {
+        "write_mip": True,
+        "mode": "auto",
+        "parallelize": False,
+    }
+    assert [phase["phase"] for phase in report["phases"]] == [
+        "parse",
+        "convert",
+        "tables",
+    ]
+    convert = report["phases"][1]
+    assert 0 < len(convert["functions"]) <= 5
+    assert any(task["name"] == "assemble_chunk" for task in convert["tasks"])
+    assert convert["peak_rss_bytes"] > 0
+    assert (report_dir / convert["stats"]).exists()
+    with open(report_dir / "report.json") as f:
+        assert json.load(f) == report
+    assert "== Plate convert" in (report_dir / "report.txt").read_text()
+    assert (tmp_path / "zarr" / "Plate_mip.zarr").exists()
+
+
+def test_profile_requires_one_source(tmp_path):
+    with pytest.raises(SystemExit):
+        main([str(tmp_path), "--synthetic"])
+    with pytest.raises(SystemExit):
+        main([])
+
+
+@pytest.mark.parametrize("n_wells", [0, 97])
+def test_profile_checks_number_of_wells(n_wells):
+    with pytest.raises(SystemExit):
+        main(["--synthetic", "--wells", str(n_wells)])
@@ -0,0 +1,58 @@
+import json
+import time
+from concurrent.futures import Future
+
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import write_metaxpress_plate
+from fractal_faim_ipa.progress import ProgressReporter
+
+
+def _read_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_progress_events(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images", wells=("C03", "D04"))
+    progress_file = tmp_path / "progress.jsonl"
+    convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        progress_interval=0,
+        progress_file=str(progress_file),
+    )
+
+    events = _read_events(progress_file)
+    assert [event["phase"] for event in events] == ["parse", "convert", "tables"]
+    assert all(event["status"] == "finished" for event in events)
+    assert all(event["plate"] == "Plate" for event in events)
+    convert = events[1]
+    assert convert["wells_done"] == convert["wells_total"] == 2
+    assert convert["tiles_per_s"] > 0
+    assert convert["read_mb_per_s"] > 0
+    assert convert["written_mb_per_s"] > convert["read_mb_per_s"]
+    assert convert["eta_s"] is None
+
+
+def test_progress_of_running_phase(tmp_path):
+    progress_file = tmp_path / "progress.jsonl"
+    progress = ProgressReporter(interval=0.05, path=str(progress_file))
+    futures = [Future(), Future()]
+    with progress.phase("convert", n_wells=2):
+        progress.track(futures, n_tiles=4, read_bytes=4000, written_bytes=8000)
+        futures[0].set_result(None)
+        event = progress.get_event()
+        assert event["wells_done"] == 0
+        assert event["eta_s"] is not None
+        progress.track([], n_tiles=4, read_bytes=4000, written_bytes=8000)
+        time.sleep(0.2)
+    futures[1].set_result(None)
+
+    events = _read_events(progress_file)
+    assert len(events) >= 3
+    assert events[0]["status"] == "running"
+    assert events[-1]["status"] == "finished"
+    assert events[-1]["wells_done"] == 1
@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pytest
+import zarr
+from fractal_faim_ipa import reads, tiff_utils
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import tile_value, write_metaxpress_plate
+from fractal_faim_ipa.input_models import ReadPolicy
+
+
+@pytest.fixture
+def read_stats(monkeypatch):
+    monkeypatch.setattr(reads, "_policy", reads.get_policy())
+    monkeypatch.setattr(reads, "_latencies", deque(maxlen=reads._N_LATENCIES))
+    monkeypatch.setattr(reads, "_slow_reads", [])
+    monkeypatch.setattr(reads, "_executor", reads._DaemonExecutor(4))
+
+
+def _hang_first_read(read, hanging_path, release):
+    """Wrap `read` such that the first read of `hanging_path` hangs."""
+    calls = []
+
+    def _read(path):
+        calls.append(path)
+        if path == hanging_path and calls.count(path) == 1:
+            release.wait()
+        return read(path)
+
+    return _read, calls
+
+
+def _read_thread(path):
+    return threading.get_ident()
+
+
+def test_reads_without_timeout_run_inline(read_stats):
+    reads.configure(ReadPolicy(timeout=None, speculation_factor=0))
+    assert reads.guarded(_read_thread, "a") == threading.get_ident()
+    assert reads._executor._n_threads == 0
+
+
+def test_read_threads_are_reused(read_stats):
+    reads.configure(ReadPolicy(timeout=30, speculation_factor=0))
+    threads = {reads.guarded(_read_thread, str(i)) for i in range(10)}
+    assert len(threads) == 1
+    assert threading.get_ident() not in threads
+
+    # Concurrent reads are bounded by the size of the pool
+    release = threading.Event()
+    started = []
+
+    def _read(path):
+        started.append(path)
+        release.wait()
+        return path
+
+    guards = [
+        threading.Thread(target=reads.guarded, args=(_read, str(i))) for i in range(6)
+    ]
+    for guard in guards:
+        guard.start()
+    while len(started) < 4:
+        release.wait(0.01)
+    assert len(started) == 4
+    release.set()
+    for guard in guards:
+        guard.join()
+    assert sorted(started) == [str(i) for i in range(6)]
+    assert reads._executor._n_threads == 4
+
+
+def test_more_hung_reads_than_pool_threads(read_stats, monkeypatch):
+    monkeypatch.setattr(reads, "_executor", reads._DaemonExecutor(2))
+    reads.configure(ReadPolicy(timeout=0.2, backoff=0, speculation_factor=0))
+    release = threading.Event()
+    calls = []
+
+    def _read(path):
+        calls.append(path)
+        # The first read of every file hangs
+        if calls.count(path) == 1:
+            release.wait()
+        return path.upper()
+
+    paths = ["a", "b", "c", "d"]
+    assert [reads.guarded(_read, path) for path in paths] == ["A", "B", "C", "D"]
+    assert [read["attempts"] for read in reads.pop_slow_reads()] == [2] * 4
+    # The hung reads do not count towards the threads of the pool
+    assert reads._executor._n_threads <= 2
+    release.set()
+
+
+def test_timeout_excludes_queued_time(read_stats, monkeypatch):
+    monkeypatch.setattr(reads, "_executor", reads._DaemonExecutor(1))
+    reads.configure(ReadPolicy(timeout=0.5, backoff=0, speculation_factor=0))
+
+    def _read(path):
+        time.sleep(float(path))
+        return path
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(reads.guarded(_read, "0.4")))
+    first.start()
+    while reads._executor._n_threads == 0:
+        time.sleep(0.01)
+    # Waits for the first read to free the only thread, which takes longer
+    # than the timeout together with the read itself
+    results.append(reads.guarded(_read, "0.3"))
+    first.join()
+    assert sorted(results) == ["0.3", "0.4"]
+    assert reads.pop_slow_reads() == []
+
+
+def test_timeout_and_retry(read_stats):
+    reads.configure(ReadPolicy(timeout=0.2, backoff=0, speculation_factor=0))
+    release = threading.Event()
+    read, calls = _hang_first_read(str.upper, "a", release)
+    assert reads.guarded(read, "a") == "A"
+    release.set()
+    assert calls[:2] == ["a", "a"]
+    (slow_read,) = reads.pop_slow_reads()
+    assert slow_read["path"] == "a"
+    assert slow_read["attempts"] == 2
+    assert slow_read["seconds"] >= 0.2
+    assert not slow_read["duplicated"]
+    assert reads.pop_slow_reads() == []
+
+
+def test_retries_are_bounded(read_stats):
+    reads.configure(
+        ReadPolicy(timeout=0.05, max_retries=2, backoff=0, speculation_factor=0)
+    )
+    release = threading.Event()
+    with pytest.raises(TimeoutError):
+        reads.guarded(lambda path: release.wait(), "a")
+    release.set()
+    (slow_read,) = reads.pop_slow_reads()
+    assert slow_read["attempts"] == 3
+    assert "No response" in slow_read["error"]
+
+
+def test_missing_files_are_not_retried(read_stats):
+    calls = []
+
+    def read(path):
+        calls.append(path)
+        raise FileNotFoundError(path)
+
+    with pytest.raises(FileNotFoundError):
+        reads.guarded(read, "a")
+    assert calls == ["a"]
+
+
+def test_duplicate_reads_of_stragglers(read_stats):
+    reads.configure(
+        ReadPolicy(timeout=30, speculation_factor=10, min_speculation_delay=0.05)
+    )
+    for _ in range(reads._MIN_LATENCIES):
+        reads.guarded(str.upper, "fast")
+    release = threading.Event()
+    read, calls = _hang_first_read(str.upper, "slow", release)
+    # The duplicate read returns long before the timeout of the first read
+    assert reads.guarded(read, "slow") == "SLOW"
+    release.set()
+    assert calls == ["slow", "slow"]
+    (slow_read,) = reads.pop_slow_reads()
+    assert slow_read["path"] == "slow"
+    assert slow_read["attempts"] == 1
+    assert slow_read["duplicated"]
+    assert slow_read["seconds"] < 30
+
+
+def test_convert_with_hung_read(tmp_path, monkeypatch, read_stats, caplog):
+    image_dir = write_metaxpress_plate(tmp_path / "images", wells=("C03",))
+    hanging_path = str(sorted(image_dir.glob("**/ZStep_1/*_C03_s2_w1*"))[0])
+    release = threading.Event()
+    read_file, calls = _hang_first_read(tiff_utils._read_file, hanging_path, release)
+    monkeypatch.setattr(tiff_utils, "_read_file", read_file)
+    with caplog.at_level(logging.WARNING, logger=reads.logger.name):
+        convert_ome_zarr(
+            zarr_urls=[],
+            zarr_dir=str(tmp_path),
+            image_dir=str(image_dir),
+            mode="MetaXpress MD Stack Acquisition",
+            parallelize=False,
+            read_policy={"timeout": 1, "backoff": 0},
+        )
+    release.set()
+    assert calls.count(hanging_path) >= 2
+    image = zarr.open_array(str(tmp_path / "Plate.zarr" / "C" / "03" / "0" / "0"))
+    assert np.all(image[0, 0, :, 64:] == tile_value(1, 1, 1, 2))
+    summary = [r.getMessage() for r in caplog.records if "slowest" in r.msg]
+    assert len(summary) == 1
+    assert hanging_path in summary[0]
@@ -0,0 +1,51 @@
+import json
+
+from fractal_faim_ipa import progress
+from fractal_faim_ipa.convert_ome_zarr import convert_ome_zarr
+from fractal_faim_ipa.dev.synthetic_plate import write_metaxpress_plate
+from fractal_faim_ipa.resources import format_summary
+
+
+def test_resource_summary(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images", wells=("C03", "D04"))
+    result = convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        sample_resources=True,
+        trace_python_heap=True,
+    )
+    assert list(result) == ["image_list_updates"]
+    assert len(result["image_list_updates"]) == 2
+    summary = json.loads((tmp_path / "Plate_resources.json").read_text())
+    assert summary["peak_rss_bytes"] > 0
+    assert summary["peak_open_files"] > 0
+    assert summary["peak_python_heap_bytes"] > 0
+    assert summary["peak_worker_rss_bytes"] > 0
+    phases = summary["phases"]
+    assert [phase["phase"] for phase in phases] == ["parse", "convert", "tables"]
+    for phase in phases:
+        assert phase["plate"] == "Plate"
+        assert 0 < phase["peak_rss_bytes"] <= summary["peak_rss_bytes"]
+        assert phase["peak_python_heap_bytes"] > 0
+    (worker,) = phases[1]["workers"].values()
+    assert worker["peak_rss_bytes"] > 0
+    assert worker["peak_open_files"] > 0
+    assert "Plate convert" in format_summary(summary)
+    assert progress._observers == []
+
+
+def test_resources_are_not_sampled_by_default(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path / "images")
+    result = convert_ome_zarr(
+        zarr_urls=[],
+        zarr_dir=str(tmp_path),
+        image_dir=str(image_dir),
+        mode="MetaXpress MD Stack Acquisition",
+        parallelize=False,
+        dry_run=True,
+    )
+    assert result == {"image_list_updates": []}
+    assert not (tmp_path / "Plate_resources.json").exists()
@@ -0,0 +1,17 @@
+from fractal_faim_ipa import storage_utils
+
+
+def test_join():
+    assert storage_utils.join("s3://bucket/prefix", "Plate.zarr") == (
+        "s3://bucket/prefix/Plate.zarr"
+    )
+    assert storage_utils.join("https://host/data?sig=a%2Fb", "Plate.zarr", "C") == (
+        "https://host/data/Plate.zarr/C?sig=a%2Fb"
+    )
+    assert storage_utils.join("/data", "Plate.zarr") == "/data/Plate.zarr"
+
+
+def test_write_text(tmp_path):
+    path = tmp_path / "new" / "dir" / "plan.json"
+    storage_utils.write_text(str(path), "{}")
+    assert path.read_text() == "{}"
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from faim_ipa.hcs.acquisition import TileAlignmentOptions
+from fractal_faim_ipa.dev import benchmark_metadata
+from fractal_faim_ipa.dev.synthetic_plate import write_metaxpress_plate
+from fractal_faim_ipa.md_converter_utils import ModeEnum
+from fractal_faim_ipa.tile_positions import load_tile_positions
+
+
+@pytest.mark.parametrize("executor", ["threads", "processes"])
+def test_load_tile_positions(tmp_path, executor):
+    image_dir = write_metaxpress_plate(
+        tmp_path, wells=("C03", "D04"), grid_shape=(2, 3), n_z=1
+    )
+    paths = sorted(str(path) for path in image_dir.glob("**/*_s*_w1.TIF"))
+    positions = load_tile_positions(paths, executor=executor, n_workers=2)
+    assert positions.dtype == np.int64
+    assert positions.shape == (12, 4)
+    assert np.all(positions[:, :2] == 64)
+    # C03 s1 to s6, then D04 s1 to s6, on a grid of 2 x 3 tiles
+    assert positions[:6, 2].tolist() == [0, 0, 0, 64, 64, 64]
+    assert positions[:6, 3].tolist() == [0, 64, 128, 0, 64, 128]
+    assert np.all(positions[6:, 3] == positions[:6, 3] + 10 * 64)
+    assert load_tile_positions([], executor=executor).shape == (0, 4)
+
+
+def test_plate_with_process_executor(tmp_path):
+    image_dir = write_metaxpress_plate(tmp_path, wells=("C03", "D04"))
+
+    def get_tiles(executor):
+        plate_acquisition = ModeEnum.MetaXpressStackAcquisition.get_plate_acquisition(
+            acquisition_dir=str(image_dir),
+            alignment=TileAlignmentOptions.GRID,
+            metadata_executor=executor,
+        )
+        return [
+            (tile.path, tile.shape, tile.position)
+            for well in plate_acquisition.get_well_acquisitions()
+            for tile in well.get_tiles()
+        ]
+
+    assert get_tiles("processes") == get_tiles("threads")
+
+
+def test_benchmark_metadata():
+    results = benchmark_metadata.main(["--wells", "1", "--repeats", "1"])
+    assert [result["executor"] for result in results] == ["threads", "processes"]
+    assert all(result["n_tiles"] == 9 * 2 * 5 for result in results)
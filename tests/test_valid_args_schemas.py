@@ -4,6 +4,7 @@ from pathlib import Path
 import fractal_faim_ipa
 import pytest
 from devtools import debug
+from fractal_faim_ipa.dev.create_manifest import CUSTOM_PYDANTIC_MODELS
 from fractal_tasks_core.dev.lib_args_schemas import (
     create_schema_for_single_task,
 )
@@ -57,7 +58,9 @@ def test_args_schemas_are_up_to_date():
                 old_schema = TASK_LIST[ind_task].get(f"args_schema_{kind}", None)
                 assert old_schema is not None
                 new_schema = create_schema_for_single_task(
-                    task[key], package=PACKAGE_NAME
+                    task[key],
+                    package=PACKAGE_NAME,
+                    custom_pydantic_models=CUSTOM_PYDANTIC_MODELS,
                 )
                 # The following step is required because some arguments may
                 # have a default which has a non-JSON type (e.g. a tuple),